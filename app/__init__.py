@@ -41,6 +41,23 @@ def create_app(config_name='default'):
             print(f"❌ MongoDB Atlas fallback failed: {e2}")
             app.db = None
     
+    # Background certificate rendering (production runs tools/certificate_worker.py)
+    if app.db is not None and app.config.get('CERTIFICATE_WORKER_PROCESSES'):
+        from app.services.certificate_queue import CertificateWorker
+        app.certificate_worker = CertificateWorker(app.db, processes=app.config['CERTIFICATE_WORKER_PROCESSES'])
+        app.certificate_worker.start()
+    
+    # Outbox email delivery (production runs tools/email_dispatcher.py)
+    if app.db is not None and app.config.get('EMAIL_DISPATCHER_IN_APP'):
+        from app.services.email_outbox import EmailDispatcher
+        app.email_dispatcher = EmailDispatcher(app.db)
+        app.email_dispatcher.start()
+    
+    # Persistent tier of the AI helper response cache
+    if app.db is not None:
+        from app.services.llm_cache import llm_response_cache
+        llm_response_cache.attach(app.db)
+    
     # Register blueprints
     from app.routes.auth_routes import auth_bp
     from app.routes.student_routes import student_bp
@@ -48,6 +65,7 @@ def create_app(config_name='default'):
     from app.routes.admin_routes import admin_bp
     from app.routes.payment_routes import payment_bp
     from app.routes.ai_routes import ai_bp
+    from app.routes.verification_routes import verification_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(student_bp, url_prefix='/api/student')
@@ -55,6 +73,7 @@ def create_app(config_name='default'):
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
     app.register_blueprint(payment_bp, url_prefix='/api/payment')
     app.register_blueprint(ai_bp, url_prefix='/api/ai')
+    app.register_blueprint(verification_bp, url_prefix='/api/verify')
     
     # HTML routes (serving existing HTML files)
     @app.route('/')
@@ -148,16 +167,24 @@ def create_app(config_name='default'):
     @app.route('/certificate/<certificate_id>')
     def view_certificate(certificate_id):
         """View certificate as HTML page"""
+        from flask import make_response, request
         from app.services.certificate_service import CertificateService
-        from bson import ObjectId
         
+        # Unknown ids are rejected by the verification Bloom filter; known
+        # ones are served from the in-process certificate cache
         cert_service = CertificateService(db)
+        if not cert_service.verify_certificate(certificate_id)[0]:
+            return "Certificate not found", 404
         success, certificate = cert_service.get_certificate(certificate_id)
         
         if not success or not certificate:
             return "Certificate not found", 404
         
-        return render_template('certificate.html', certificate=certificate)
+        response = make_response(render_template('certificate.html', certificate=certificate))
+        response.add_etag()
+        response.cache_control.public = True
+        response.cache_control.max_age = 60
+        return response.make_conditional(request)
     
     @app.route('/test-dashboard')
     def test_dashboard():
@@ -25,10 +25,31 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'pdf', 'mp4', 'mp3', 'doc', 'docx', 'ppt', 'pptx'}
+    
+    # Certificate rendering: processes for the in-app worker (0 = run tools/certificate_worker.py instead)
+    CERTIFICATE_WORKER_PROCESSES = int(os.getenv('CERTIFICATE_WORKER_PROCESSES', '0'))
+    
+    # Certificate downloads: '' (Flask streams), 'x-sendfile' or 'x-accel' (nginx)
+    FILE_SENDFILE_MODE = os.getenv('FILE_SENDFILE_MODE', '')
+    FILE_ACCEL_PREFIX = os.getenv('FILE_ACCEL_PREFIX', '/protected/')
+    FILE_ACCEL_ROOT = os.getenv('FILE_ACCEL_ROOT', os.getcwd())
+    
+    # Email outbox: SMTP_HOST/SMTP_PORT/SMTP_USERNAME/SMTP_PASSWORD/SMTP_USE_TLS,
+    # MAIL_FROM and EMAIL_RATE_PER_SECOND are read by the dispatcher.
+    # Run it in-app (1) or as tools/email_dispatcher.py (0)
+    EMAIL_DISPATCHER_IN_APP = os.getenv('EMAIL_DISPATCHER_IN_APP', '0') == '1'
+    
+    # LLM calls: GROQ_API_BASE, LLM_MAX_CONNECTIONS, LLM_MAX_CONCURRENCY and
+    # LLM_MAX_RETRIES are read by app/services/llm_client.py;
+    # LLM_CACHE_MAX_MB and LLM_CACHE_TTL_SECONDS by app/services/llm_cache.py
+    
+    # Chat retrieval over course materials: MATERIAL_INDEX_DIR, RAG_TOP_K and
+    # RAG_TOKEN_BUDGET are read by app/services/material_index.py
 
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
+    CERTIFICATE_WORKER_PROCESSES = int(os.getenv('CERTIFICATE_WORKER_PROCESSES', '1'))
 
 class ProductionConfig(Config):
     """Production configuration"""
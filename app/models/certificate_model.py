@@ -5,9 +5,11 @@ Requires admin approval before email delivery
 """
 from datetime import datetime
 from bson import ObjectId
+from app.utils.ids import certificate_number
 
 class Certificate:
     def __init__(self, db):
+        self.db = db
         self.collection = db['certificates']
         self._create_indexes()
     
@@ -121,10 +123,8 @@ class Certificate:
     
     def _generate_certificate_number(self):
         """Generate unique certificate number"""
-        # Format: CERT-YYYYMMDD-XXXX
-        date_str = datetime.utcnow().strftime('%Y%m%d')
-        count = self.collection.count_documents({}) + 1
-        return f"CERT-{date_str}-{count:04d}"
+        # Format: CERT-YYYYMMDD-NNNNNNN (shared counter with CertificateService)
+        return certificate_number(self.db)
     
     def _serialize(self, cert):
         """Convert ObjectId to string"""
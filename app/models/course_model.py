@@ -15,6 +15,7 @@ class Course:
         self.collection.create_index("status")
         self.collection.create_index([("title", "text"), ("description", "text")])
         self.collection.create_index("tags")
+        self.collection.create_index("updated_at")  # incremental recommender refresh
     
     def create(self, title, description, instructor_id, price=0, tags=[], **kwargs):
         """
@@ -51,16 +52,25 @@ class Course:
         result = self.collection.insert_one(course_data)
         return result.inserted_id
     
-    def find_by_id(self, course_id):
-        """Find course by ID"""
+    def find_by_id(self, course_id, projection=None):
+        """Find course by ID (optionally only the projected fields)"""
         try:
-            course = self.collection.find_one({"_id": ObjectId(course_id)})
+            course = self.collection.find_one({"_id": ObjectId(course_id)}, projection)
             if course:
                 course['_id'] = str(course['_id'])
             return course
         except:
             return None
     
+    def find_by_ids(self, course_ids, projection=None, filters=None):
+        """Find several courses with one $in query; returns {course_id: course}"""
+        oids = [ObjectId(c) for c in course_ids if ObjectId.is_valid(str(c))]
+        courses = {}
+        for course in self.collection.find({"_id": {"$in": oids}, **(filters or {})}, projection):
+            course['_id'] = str(course['_id'])
+            courses[course['_id']] = course
+        return courses
+    
     def get_all_courses(self, filters=None, skip=0, limit=50):
         """
         Get courses with optional filters
@@ -135,7 +145,7 @@ class Course:
         """Unpublish course (instructor action)"""
         return self.update(course_id, {"is_published": False})
     
-    def enroll_student(self, course_id, student_id):
+    def enroll_student(self, course_id, student_id, session=None):
         """Add student to course"""
         try:
             result = self.collection.update_one(
@@ -144,6 +154,25 @@ class Course:
                     "$addToSet": {"students": str(student_id)},
                     "$inc": {"total_enrollments": 1},
                     "$set": {"updated_at": datetime.utcnow()}
+                },
+                session=session
+            )
+            return result.modified_count > 0
+        except:
+            return False
+    
+    def enroll_students(self, course_id, student_ids):
+        """Add many students to a course with a single $inc of the enrollment counter"""
+        student_ids = [str(s) for s in student_ids]
+        if not student_ids:
+            return False
+        try:
+            result = self.collection.update_one(
+                {"_id": ObjectId(course_id)},
+                {
+                    "$addToSet": {"students": {"$each": student_ids}},
+                    "$inc": {"total_enrollments": len(student_ids)},
+                    "$set": {"updated_at": datetime.utcnow()}
                 }
             )
             return result.modified_count > 0
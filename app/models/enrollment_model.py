@@ -3,6 +3,8 @@ Enrollment Model - Handles student course enrollments
 """
 from datetime import datetime
 from bson import ObjectId
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 class Enrollment:
     def __init__(self, db):
@@ -16,26 +18,35 @@ class Enrollment:
         self.collection.create_index("course_id")
         self.collection.create_index("status")
     
-    def enroll(self, student_id, course_id, payment_id=None):
+    def enroll(self, student_id, course_id, payment_id=None, session=None):
         """
         Enroll student in a course
+        Relies on the unique (student_id, course_id) index rather than a
+        separate existence check, so it costs one round trip and cannot race.
         Args:
             student_id: Student's user ID
             course_id: Course ID
             payment_id: Payment record ID (if paid course)
+            session: Optional ClientSession for transactional writes
         Returns:
             ObjectId of enrollment or None if already enrolled
+        Raises:
+            DuplicateKeyError when already enrolled inside a session (the
+            server has aborted the transaction; the caller must end it)
         """
-        # Check if already enrolled
-        existing = self.collection.find_one({
-            "student_id": str(student_id),
-            "course_id": str(course_id)
-        })
+        enrollment_data = self._build_enrollment(student_id, course_id, payment_id)
         
-        if existing:
+        try:
+            result = self.collection.insert_one(enrollment_data, session=session)
+        except DuplicateKeyError:
+            if session is not None:
+                raise
             return None
-        
-        enrollment_data = {
+        return result.inserted_id
+    
+    def _build_enrollment(self, student_id, course_id, payment_id=None):
+        """Build a new enrollment document"""
+        return {
             "student_id": str(student_id),
             "course_id": str(course_id),
             "payment_id": str(payment_id) if payment_id else None,
@@ -47,9 +58,48 @@ class Enrollment:
             "completed_at": None,
             "last_accessed": datetime.utcnow()
         }
+    
+    def bulk_enroll(self, student_ids, course_id, payment_id=None):
+        """
+        Enroll many students in one course with a single unordered bulk_write
+        Args:
+            student_ids: List of student IDs (already deduplicated)
+            course_id: Course ID
+            payment_id: Payment record ID shared by the cohort (optional)
+        Returns:
+            Tuple (list of enrolled student IDs, dict of student ID -> error reason)
+        """
+        student_ids = [str(s) for s in student_ids]
+        if not student_ids:
+            return [], {}
         
-        result = self.collection.insert_one(enrollment_data)
-        return result.inserted_id
+        requests = [
+            InsertOne(self._build_enrollment(student_id, course_id, payment_id))
+            for student_id in student_ids
+        ]
+        
+        failed = {}
+        try:
+            self.collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                student_id = student_ids[error['index']]
+                # 11000 = unique (student_id, course_id) index hit by a concurrent enroll
+                failed[student_id] = 'already_enrolled' if error.get('code') == 11000 else 'failed'
+        
+        enrolled = [s for s in student_ids if s not in failed]
+        return enrolled, failed
+    
+    def get_enrolled_student_ids(self, course_id, student_ids):
+        """Return the subset of student_ids already enrolled in a course (one query)"""
+        cursor = self.collection.find(
+            {
+                "course_id": str(course_id),
+                "student_id": {"$in": [str(s) for s in student_ids]}
+            },
+            {"student_id": 1, "_id": 0}
+        )
+        return {doc["student_id"] for doc in cursor}
     
     def find_by_id(self, enrollment_id):
         """Find enrollment by ID"""
@@ -72,6 +122,13 @@ class Enrollment:
             enrollment['_id'] = str(enrollment['_id'])
         return enrollments
     
+    def get_student_course_ids(self, student_id, status=None):
+        """Return the course ids a student is enrolled in (ids only)"""
+        query = {"student_id": str(student_id)}
+        if status:
+            query["status"] = status
+        return [doc["course_id"] for doc in self.collection.find(query, {"course_id": 1, "_id": 0})]
+    
     def get_course_enrollments(self, course_id):
         """Get all enrollments for a course"""
         enrollments = list(self.collection.find({"course_id": str(course_id)}).sort("enrolled_at", -1))
@@ -199,10 +256,10 @@ class Enrollment:
             "average_progress": round(avg_progress, 2)
         }
     
-    def delete(self, enrollment_id):
+    def delete(self, enrollment_id, session=None):
         """Delete enrollment record"""
         try:
-            result = self.collection.delete_one({"_id": ObjectId(enrollment_id)})
+            result = self.collection.delete_one({"_id": ObjectId(enrollment_id)}, session=session)
             return result.deleted_count > 0
         except:
             return False
@@ -3,8 +3,7 @@ Payment Model - Handles course payments (Demo implementation)
 """
 from datetime import datetime
 from bson import ObjectId
-import random
-import string
+from app.utils.ids import time_ordered_id
 
 class Payment:
     def __init__(self, db):
@@ -20,9 +19,7 @@ class Payment:
     
     def _generate_transaction_id(self):
         """Generate unique transaction ID"""
-        timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
-        random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        return f"TXN{timestamp}{random_str}"
+        return time_ordered_id('TXN')
     
     def create(self, student_id, course_id, amount, payment_method="demo", status="completed"):
         """
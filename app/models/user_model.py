@@ -84,6 +84,22 @@ class User:
             user['_id'] = str(user['_id'])
         return user
     
+    def find_by_emails(self, emails):
+        """
+        Resolve many users by email in one query
+        Returns:
+            Dictionary of email -> {_id, email, role, is_active}
+        """
+        users = self.collection.find(
+            {"email": {"$in": list(emails)}},
+            {"email": 1, "role": 1, "is_active": 1}
+        )
+        result = {}
+        for user in users:
+            user['_id'] = str(user['_id'])
+            result[user['email']] = user
+        return result
+    
     def update(self, user_id, updates):
         """Update user information"""
         try:
@@ -131,13 +147,25 @@ class User:
         except:
             return False
     
-    def add_enrolled_course(self, user_id, course_id):
+    def add_enrolled_course(self, user_id, course_id, session=None):
         """Add course to student's enrolled list"""
         try:
             result = self.collection.update_one(
                 {"_id": ObjectId(user_id)},
-                {"$addToSet": {"enrolled_courses": str(course_id)}}
+                {"$addToSet": {"enrolled_courses": str(course_id)}},
+                session=session
             )
             return result.modified_count > 0
         except:
             return False
+    
+    def add_enrolled_course_many(self, user_ids, course_id):
+        """Add a course to many students' enrolled lists with one update_many"""
+        try:
+            result = self.collection.update_many(
+                {"_id": {"$in": [ObjectId(u) for u in user_ids]}},
+                {"$addToSet": {"enrolled_courses": str(course_id)}}
+            )
+            return result.modified_count
+        except:
+            return 0
@@ -2,16 +2,23 @@
 Admin Routes
 Handles admin-specific operations
 """
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from app.utils.jwt_helper import role_required, get_current_user
+from app.utils.pagination import parse_limit
+from app.utils.upload_parser import iter_request_emails, iter_ndjson
 from app.models.user_model import User
 from app.models.course_model import Course
 from app.models.enrollment_model import Enrollment
 from app.models.payment_model import Payment
-from app.services.certificate_service import CertificateService
+from app.services.certificate_service import CertificateService, BULK_RUN_IN_PROGRESS
+from app.services.certificate_store import certificate_store
+from app.services.certificate_verification import certificate_verifier
+from app.services.llm_client import llm_client
+from app.services.llm_cache import llm_response_cache
 from app.services.payment_service import PaymentService
 from app.services.analytics_service import AnalyticsService
 from app.services.exam_service import ExamService
+from app.services.enrollment_service import EnrollmentService
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -201,18 +208,23 @@ def get_dashboard_data():
     return jsonify({
         'success': True,
         'analytics': analytics if success else {},
-        'pending_certificates': pending_certificates
+        'pending_certificates': pending_certificates['pending']
     }), 200
 
 # Certificate Management Routes
 @admin_bp.route('/certificates/pending', methods=['GET'])
 @role_required('admin')
 def get_pending_certificates():
-    """Get all submissions pending certificate approval"""
+    """Get submissions pending certificate approval (optional limit/cursor paging)"""
+    limit = request.args.get('limit')
+    
     certificate_service = CertificateService(current_app.db)
-    success, pending = certificate_service.get_pending_approvals()
+    success, result = certificate_service.get_pending_approvals(
+        limit=parse_limit(limit) if limit else None,
+        cursor=request.args.get('cursor')
+    )
     
-    return jsonify({'success': success, 'pending': pending}), 200
+    return jsonify({'success': success, 'pending': result['pending'], 'next_cursor': result['next_cursor']}), 200
 
 @admin_bp.route('/certificates/generate', methods=['POST'])
 @role_required('admin')
@@ -232,6 +244,87 @@ def generate_certificate():
     else:
         return jsonify({'success': False, 'error': result}), 400
 
+@admin_bp.route('/certificates/bulk', methods=['POST'])
+@role_required('admin')
+def bulk_issue_certificates():
+    """Issue certificates to every uncertified passer of an exam or course"""
+    current_user = get_current_user()
+    data = request.get_json() or {}
+    
+    certificate_service = CertificateService(current_app.db)
+    success, run_id = certificate_service.start_bulk_issue(
+        current_user['user_id'],
+        exam_id=data.get('exam_id'),
+        course_id=data.get('course_id')
+    )
+    if not success:
+        status = 409 if run_id == BULK_RUN_IN_PROGRESS else 400
+        return jsonify({'success': False, 'error': run_id}), status
+    
+    # Issuing can take minutes; poll GET /certificates/bulk/<run_id> for progress
+    success, result = certificate_service.run_bulk_issue_in_background(run_id)
+    if not success:
+        return jsonify({'success': False, 'run_id': run_id, 'error': result}), 409
+    return jsonify({'success': True, 'run_id': run_id}), 202
+
+@admin_bp.route('/certificates/bulk/<run_id>', methods=['GET'])
+@role_required('admin')
+def get_bulk_issue_progress(run_id):
+    """Get issuance and render progress of a bulk run"""
+    certificate_service = CertificateService(current_app.db)
+    success, result = certificate_service.get_bulk_issue_progress(run_id)
+    
+    if success:
+        return jsonify({'success': True, 'run': result}), 200
+    else:
+        return jsonify({'success': False, 'error': result}), 404
+
+@admin_bp.route('/certificates/bulk/<run_id>/resume', methods=['POST'])
+@role_required('admin')
+def resume_bulk_issue(run_id):
+    """Resume an interrupted bulk run"""
+    certificate_service = CertificateService(current_app.db)
+    success, result = certificate_service.get_bulk_issue_progress(run_id)
+    if not success:
+        return jsonify({'success': False, 'error': result}), 404
+    if result.get('status') == 'completed':
+        return jsonify({'success': True, 'run': result}), 200
+    
+    success, result = certificate_service.run_bulk_issue_in_background(run_id)
+    if not success:
+        return jsonify({'success': False, 'error': result}), 409
+    return jsonify({'success': True, 'run_id': run_id}), 202
+
+@admin_bp.route('/certificates/store', methods=['GET'])
+@role_required('admin')
+def get_certificate_store_stats():
+    """Get certificate PDF store hit rate and disk usage (this process)"""
+    return jsonify({'success': True, 'store': certificate_store.stats()}), 200
+
+@admin_bp.route('/certificates/verification/stats', methods=['GET'])
+@role_required('admin')
+def get_certificate_verification_stats():
+    """Get verification filter and cache counters (this process)"""
+    return jsonify({'success': True, 'verification': certificate_verifier.stats()}), 200
+
+@admin_bp.route('/ai/stats', methods=['GET'])
+@role_required('admin')
+def get_ai_stats():
+    """Get LLM call latency, token usage, circuit breaker state and response cache hit rate (this process)"""
+    return jsonify({'success': True, 'llm': llm_client.stats(), 'cache': llm_response_cache.stats()}), 200
+
+@admin_bp.route('/certificates/<certificate_id>/status', methods=['GET'])
+@role_required('admin')
+def get_certificate_status(certificate_id):
+    """Get a certificate's PDF render and email status"""
+    certificate_service = CertificateService(current_app.db)
+    success, result = certificate_service.get_render_status(certificate_id)
+    
+    if success:
+        return jsonify({'success': True, 'status': result}), 200
+    else:
+        return jsonify({'success': False, 'error': result}), 404
+
 @admin_bp.route('/certificates/<certificate_id>/revoke', methods=['POST'])
 @role_required('admin')
 def revoke_certificate(certificate_id):
@@ -397,6 +490,18 @@ def get_all_enrollments():
         'per_page': per_page
     }), 200
 
+@admin_bp.route('/courses/<course_id>/bulk-enroll', methods=['POST'])
+@role_required('admin')
+def bulk_enroll(course_id):
+    """
+    Enroll a cohort from a CSV/JSON list of emails
+    Streams one NDJSON result line per input row, then a summary line
+    """
+    enrollment_service = EnrollmentService(current_app.db)
+    rows = enrollment_service.bulk_enroll(course_id, iter_request_emails(request))
+    
+    return Response(stream_with_context(iter_ndjson(rows)), mimetype='application/x-ndjson')
+
 @admin_bp.route('/stats', methods=['GET'])
 @role_required('admin')
 def get_admin_stats():
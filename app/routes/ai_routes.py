@@ -3,14 +3,21 @@ AI Routes - Groq AI Integration for Course Assistant
 """
 from flask import Blueprint, request, jsonify, current_app
 from app.utils.jwt_helper import token_required, get_current_user
+from app.services.llm_client import llm_client, LLMError, LLMTimeoutError
+from app.services.material_index import material_retriever, format_context
+from app.utils.sse import sse_response
 import os
-import requests
 
 ai_bp = Blueprint('ai', __name__)
 
 # Groq API configuration
 GROQ_API_KEY = os.getenv('GROQ_API_KEY', '')  # Set this in your .env file
-GROQ_API_URL = 'https://api.groq.com/openai/v1/chat/completions'
+CHAT_PARAMS = {
+    'model': 'llama-3.1-8b-instant',  # Fast, efficient, and free model
+    'temperature': 0.7,
+    'max_tokens': 512,  # Reduced for more concise responses
+    'timeout': (5, 12)
+}
 
 @ai_bp.route('/chat', methods=['POST'])
 @token_required
@@ -21,8 +28,11 @@ def chat():
     {
         "message": "User's question",
         "course_id": "course_id",
-        "context": "course_learning"
+        "context": "course_learning",
+        "stream": false
     }
+    With "stream": true the reply is sent as Server-Sent Events
+    (token events, then done) while it is generated.
     """
     try:
         data = request.get_json()
@@ -43,9 +53,16 @@ def chat():
                     # Handle both ObjectId and string formats
                     if isinstance(course_id, str) and len(course_id) == 24:
                         course_id = ObjectId(course_id)
-                    course = db.courses.find_one({'_id': course_id})
+                    course = db.courses.find_one({'_id': course_id}, {'title': 1, 'description': 1})
                     if course:
                         course_context = f"Course: {course.get('title', '')}\nDescription: {course.get('description', '')}\n"
+                        # Most relevant excerpts of the course materials (local index, no API calls)
+                        excerpts = material_retriever.retrieve(db, str(course['_id']), user_message)
+                        if excerpts:
+                            course_context += (
+                                "\nRelevant course material (base your answer on it when it applies):\n"
+                                f"{format_context(excerpts)}\n"
+                            )
                 except Exception as e:
                     # Ignore course context errors (fallback to no context)
                     print(f"Course context error: {e}")
@@ -105,61 +122,41 @@ Related Questions:
 
 Always follow this format exactly."""
         
+        messages = [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_message}
+        ]
+        if data.get('stream'):
+            return sse_response(_stream_chat(messages))
+        
         # Call Groq AI API
         try:
-            response = requests.post(
-                GROQ_API_URL,
-                headers={
-                    'Authorization': f'Bearer {GROQ_API_KEY}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'llama-3.1-8b-instant',  # Fast, efficient, and free model
-                    'messages': [
-                        {'role': 'system', 'content': system_prompt},
-                        {'role': 'user', 'content': user_message}
-                    ],
-                    'temperature': 0.7,
-                    'max_tokens': 512  # Reduced for more concise responses
-                },
-                timeout=12
-            )
-
-            # If non-200, log details and return a helpful fallback response
-            if response.status_code != 200:
-                try:
-                    resp_text = response.text
-                except Exception:
-                    resp_text = '<unreadable response>'
-                print(f"Groq API returned status {response.status_code}: {resp_text}")
-
-                # Provide a useful offline fallback that still helps the student
-                fallback = (
-                    "I can't reach the AI service right now, but here are a few suggestions:\n"
-                    "1) Re-check the course materials and module where this topic appears.\n"
-                    "2) Look at related lectures or the recommended readings.\n"
-                    "3) Try asking a more focused question (one concept at a time).\n"
-                    "4) If it's urgent, contact your instructor with details.\n\n"
-                    f"(Debug: Groq API status {response.status_code})"
-                )
-
-                return jsonify({'success': True, 'response': fallback}), 200
-
-            groq_data = response.json()
-            # Be defensive when parsing
-            ai_response = ''
-            try:
-                ai_response = groq_data.get('choices', [])[0].get('message', {}).get('content', '')
-            except Exception:
-                ai_response = groq_data.get('choices', [])[0]['message']['content'] if groq_data.get('choices') else ''
+            result = llm_client.chat(messages, **CHAT_PARAMS)
 
+            ai_response = result.content
             if not ai_response:
                 ai_response = "I got a blank response from the AI service. Try rephrasing your question."
 
             return jsonify({'success': True, 'response': ai_response}), 200
 
-        except requests.exceptions.Timeout:
+        except LLMTimeoutError:
             return jsonify({'success': True, 'response': "The AI request timed out. Try asking a shorter question or try again in a moment."}), 200
+        except LLMError as api_error:
+            # Log details and return a helpful fallback response
+            print(f"Groq API Error: {api_error}")
+
+            # Provide a useful offline fallback that still helps the student
+            fallback = (
+                "I can't reach the AI service right now, but here are a few suggestions:\n"
+                "1) Re-check the course materials and module where this topic appears.\n"
+                "2) Look at related lectures or the recommended readings.\n"
+                "3) Try asking a more focused question (one concept at a time).\n"
+                "4) If it's urgent, contact your instructor with details."
+            )
+            if api_error.status_code:
+                fallback += f"\n\n(Debug: Groq API status {api_error.status_code})"
+
+            return jsonify({'success': True, 'response': fallback}), 200
         except Exception as api_error:
             # Log the exception for debugging and return a helpful fallback
             print(f"Groq API Error: {api_error}")
@@ -171,3 +168,25 @@ Always follow this format exactly."""
             'success': False,
             'message': 'Internal server error'
         }), 500
+
+
+def _stream_chat(messages):
+    """Yield response chunks from Groq AI, ending with a fallback note on errors"""
+    stream = llm_client.stream_chat(messages, **CHAT_PARAMS)
+    received = False
+    try:
+        for chunk in stream:
+            received = True
+            yield chunk
+        if not received:
+            yield "I got a blank response from the AI service. Try rephrasing your question."
+    except LLMTimeoutError:
+        yield ("\n\n(The response was cut off. Try asking again.)" if received else
+               "The AI request timed out. Try asking a shorter question or try again in a moment.")
+    except LLMError as api_error:
+        print(f"Groq API Error: {api_error}")
+        yield ("\n\n(The response was cut off. Try asking again.)" if received else
+               "I can't reach the AI service right now. Re-check the course materials, try a more "
+               "focused question, or contact your instructor if it's urgent.")
+    finally:
+        stream.close()
@@ -2,11 +2,16 @@
 Instructor Routes
 Handles instructor-specific operations
 """
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from app.utils.jwt_helper import role_required, get_current_user
+from app.utils.pagination import parse_limit
+from app.utils.upload_parser import iter_request_emails, iter_ndjson, iter_csv
 from app.services.course_service import CourseService
 from app.services.enrollment_service import EnrollmentService
-from app.services.exam_service import ExamService
+from app.services.exam_service import ExamService, SUBMISSION_SORT_FIELDS
+from app.services.grading_service import GradingService
+from app.services.item_analysis_service import ItemAnalysisService
+from app.services.question_bank_service import QuestionBankService
 from app.services.certificate_service import CertificateService
 from app.services.liveclass_service import LiveClassService
 from app.services.attendance_service import AttendanceService
@@ -185,6 +190,27 @@ def get_course_students(course_id):
         'students': students
     }), 200
 
+@instructor_bp.route('/courses/<course_id>/bulk-enroll', methods=['POST'])
+@role_required('instructor')
+def bulk_enroll(course_id):
+    """
+    Enroll a cohort from a CSV/JSON list of emails
+    Streams one NDJSON result line per input row, then a summary line
+    """
+    current_user = get_current_user()
+    
+    # Verify instructor owns this course
+    course_service = CourseService(current_app.db)
+    course = course_service.get_course(course_id)
+    
+    if not course or course['instructor_id'] != current_user['user_id']:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    enrollment_service = EnrollmentService(current_app.db)
+    rows = enrollment_service.bulk_enroll(course_id, iter_request_emails(request))
+    
+    return Response(stream_with_context(iter_ndjson(rows)), mimetype='application/x-ndjson')
+
 @instructor_bp.route('/courses/<course_id>/students/<student_id>/videos', methods=['GET'])
 @role_required('instructor')
 def get_student_video_progress(course_id, student_id):
@@ -298,6 +324,62 @@ def create_exam():
     else:
         return jsonify({'success': False, 'error': result}), 400
 
+@instructor_bp.route('/exams/<exam_id>', methods=['PUT'])
+@role_required('instructor')
+def update_exam(exam_id):
+    """Update an exam (questions, answer key, schedule)"""
+    current_user = get_current_user()
+    data = request.get_json()
+    
+    exam_service = ExamService(current_app.db)
+    success, message = exam_service.update_exam(exam_id, current_user['user_id'], data)
+    
+    if success:
+        return jsonify({'success': True, 'message': message}), 200
+    else:
+        return jsonify({'success': False, 'error': message}), 400
+
+@instructor_bp.route('/question-banks', methods=['POST'])
+@role_required('instructor')
+def create_question_bank():
+    """Create a question bank (questions tagged with topic and difficulty)"""
+    current_user = get_current_user()
+    data = request.get_json()
+    
+    bank_service = QuestionBankService(current_app.db)
+    success, result = bank_service.create_bank(current_user['user_id'], data)
+    
+    if success:
+        return jsonify({'success': True, 'bank_id': result}), 201
+    else:
+        return jsonify({'success': False, 'error': result}), 400
+
+@instructor_bp.route('/question-banks', methods=['GET'])
+@role_required('instructor')
+def get_question_banks():
+    """List the instructor's question banks"""
+    current_user = get_current_user()
+    
+    bank_service = QuestionBankService(current_app.db)
+    success, banks = bank_service.get_instructor_banks(current_user['user_id'])
+    
+    return jsonify({'success': success, 'banks': banks}), 200
+
+@instructor_bp.route('/question-banks/<bank_id>/questions', methods=['POST'])
+@role_required('instructor')
+def add_bank_questions(bank_id):
+    """Add questions to a question bank"""
+    current_user = get_current_user()
+    data = request.get_json()
+    
+    bank_service = QuestionBankService(current_app.db)
+    success, message = bank_service.add_questions(bank_id, current_user['user_id'], data.get('questions', []))
+    
+    if success:
+        return jsonify({'success': True, 'message': message}), 200
+    else:
+        return jsonify({'success': False, 'error': message}), 400
+
 @instructor_bp.route('/courses/<course_id>/exams', methods=['GET'])
 @role_required('instructor')
 def get_course_exams(course_id):
@@ -324,11 +406,103 @@ def schedule_live_class_legacy():
 @instructor_bp.route('/exams/<exam_id>/submissions', methods=['GET'])
 @role_required('instructor')
 def get_exam_submissions(exam_id):
-    """Get all submissions for an exam"""
+    """
+    Get submissions for an exam
+    Query params: sort (submitted_at|score), order (asc|desc), limit, cursor,
+    include_answers. Without limit every submission is returned.
+    """
+    limit = request.args.get('limit')
+    
+    exam_service = ExamService(current_app.db)
+    success, result = exam_service.get_exam_submissions(
+        exam_id,
+        sort_by=request.args.get('sort', 'submitted_at'),
+        descending=request.args.get('order', 'desc') != 'asc',
+        limit=parse_limit(limit) if limit else None,
+        cursor=request.args.get('cursor'),
+        include_answers=request.args.get('include_answers') in ('1', 'true')
+    )
+    
+    if success:
+        return jsonify({
+            'success': True,
+            'submissions': result['submissions'],
+            'next_cursor': result['next_cursor']
+        }), 200
+    else:
+        return jsonify({'success': False, 'error': result}), 400
+
+@instructor_bp.route('/exams/<exam_id>/submissions/export', methods=['GET'])
+@role_required('instructor')
+def export_exam_submissions(exam_id):
+    """Stream an exam's results as CSV (sort/order as for the listing)"""
+    sort_by = request.args.get('sort', 'submitted_at')
+    if sort_by not in SUBMISSION_SORT_FIELDS:
+        return jsonify({'success': False, 'error': f'Invalid sort field: {sort_by}'}), 400
+    
     exam_service = ExamService(current_app.db)
-    success, submissions = exam_service.get_exam_submissions(exam_id)
+    rows = exam_service.iter_exam_submissions(
+        exam_id, sort_by, descending=request.args.get('order', 'desc') != 'asc'
+    )
+    columns = [
+        ('Student', 'student_name'), ('Email', 'student_email'),
+        ('Marks Obtained', 'marks_obtained'), ('Total Marks', 'total_marks'),
+        ('Passed', 'passed'), ('Submitted At', 'submitted_at'), ('Certificate ID', 'certificate_id')
+    ]
+    
+    return Response(
+        stream_with_context(iter_csv(rows, columns)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=exam_{exam_id}_results.csv'}
+    )
+
+@instructor_bp.route('/exams/<exam_id>/regrade', methods=['POST'])
+@role_required('instructor')
+def regrade_exam(exam_id):
+    """Regrade all submissions of an exam against its current answer key"""
+    current_user = get_current_user()
     
-    return jsonify({'success': success, 'submissions': submissions}), 200
+    # Verify instructor owns the exam's course
+    exam_service = ExamService(current_app.db)
+    found, exam = exam_service.get_exam(exam_id)
+    if not found:
+        return jsonify({'success': False, 'error': 'Exam not found'}), 404
+    
+    course = CourseService(current_app.db).get_course(exam['course_id'])
+    if not course or course['instructor_id'] != current_user['user_id']:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    grading_service = GradingService(current_app.db)
+    success, result = grading_service.regrade_exam(exam_id)
+    
+    if success:
+        return jsonify({'success': True, 'summary': result}), 200
+    else:
+        return jsonify({'success': False, 'error': result}), 400
+
+@instructor_bp.route('/exams/<exam_id>/item-analysis', methods=['GET'])
+@role_required('instructor')
+def get_exam_item_analysis(exam_id):
+    """Get per-question difficulty, discrimination and answer distribution"""
+    current_user = get_current_user()
+    
+    # Verify instructor owns the exam's course (the distribution reveals the answer key)
+    exam_service = ExamService(current_app.db)
+    found, exam = exam_service.get_exam(exam_id)
+    if not found:
+        return jsonify({'success': False, 'error': 'Exam not found'}), 404
+    
+    course = CourseService(current_app.db).get_course(exam['course_id'])
+    if not course or course['instructor_id'] != current_user['user_id']:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    item_analysis_service = ItemAnalysisService(current_app.db)
+    success, result = item_analysis_service.get_item_statistics(exam_id)
+    
+    if success:
+        return jsonify({'success': True, 'statistics': result}), 200
+    else:
+        return jsonify({'success': False, 'error': result}), 404
 
 @instructor_bp.route('/submissions/<submission_id>/grade', methods=['POST'])
 @role_required('instructor')
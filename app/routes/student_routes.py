@@ -2,17 +2,20 @@
 Student Routes
 Handles student-specific operations
 """
-from flask import Blueprint, request, jsonify, current_app, send_file
-import os
+from flask import Blueprint, request, jsonify, current_app, send_file, Response
 from app.utils.jwt_helper import role_required, get_current_user
+from app.utils.file_serving import send_versioned_file
+from app.utils.sse import sse_response
 from app.services.course_service import CourseService
 from app.services.enrollment_service import EnrollmentService
 from app.services.chatbot_service import chatbot_service
-from app.services.recommendation_service import recommendation_service
+from app.services.student_recommendations import StudentRecommendationService
+from app.services.skill_matcher import skill_matcher
 from app.services.attendance_service import AttendanceService
 from app.services.exam_service import ExamService
 from app.services.certificate_service import CertificateService
 from app.services.certificate_service import CertificateService
+from app.services.certificate_store import certificate_store
 from app.services.liveclass_service import LiveClassService
 from app.services.payment_service import PaymentService
 from app.services.analytics_service import AnalyticsService
@@ -159,11 +162,17 @@ def drop_course(course_id):
 @student_bp.route('/chatbot', methods=['POST'])
 @role_required('student')
 def chatbot():
-    """AI chatbot for course assistance"""
+    """
+    AI chatbot for course assistance
+    With "stream": true the reply is sent as Server-Sent Events while it is generated
+    """
     data = request.get_json()
     message = data.get('message', '')
     context = data.get('context')
     
+    if data.get('stream'):
+        return sse_response(chatbot_service.stream_response(message, context))
+    
     response = chatbot_service.get_response(message, context)
     
     return jsonify({
@@ -174,35 +183,41 @@ def chatbot():
 @student_bp.route('/recommendations', methods=['GET'])
 @role_required('student')
 def get_recommendations():
-    """Get AI-powered course recommendations based on enrollment history"""
+    """Get course recommendations (precomputed nightly, scored live for new students)"""
     current_user = get_current_user()
     
     course_service = CourseService(current_app.db)
-    enrollment_service = EnrollmentService(current_app.db)
-    
-    # Get enrolled courses
-    enrollments = enrollment_service.get_student_enrollments(current_user['user_id'])
-    enrolled_course_ids = [e.get('course_id') for e in enrollments if 'course_id' in e]
     
-    enrolled_courses = []
-    for course_id in enrolled_course_ids:
-        course = course_service.get_course(course_id)
-        if course:
-            enrolled_courses.append(course)
+    # Content similarity across the catalog plus "students also took" neighbors. Stored
+    # lists can name courses unpublished since, so the full list is fetched to fill 5
+    recommended_ids = StudentRecommendationService(current_app.db).get_recommendations(current_user['user_id'])
+    recommendations = course_service.get_courses(recommended_ids, published_only=True)[:5]
     
-    # Get all available courses
-    all_courses = course_service.get_all_published_courses(1, 50)
+    return jsonify({
+        'success': True,
+        'recommendations': recommendations
+    }), 200
+
+@student_bp.route('/skill-matches', methods=['GET'])
+@role_required('student')
+def get_skill_matches():
+    """Courses teaching the given skills (?skills=python,machine learning)"""
+    skills = [s.strip() for s in request.args.get('skills', '').split(',') if s.strip()]
+    if not skills:
+        return jsonify({'success': False, 'error': 'skills is required'}), 400
     
-    # Get recommendations based on enrollment history
-    recommendations = recommendation_service.get_enrollment_based_recommendations(
-        enrolled_courses,
-        all_courses,
-        count=5
-    )
+    matches = skill_matcher.match(current_app.db, skills[:20], count=10)
+    courses = {
+        str(course['_id']): course
+        for course in CourseService(current_app.db).get_courses([course_id for course_id, _, _ in matches])
+    }
     
     return jsonify({
         'success': True,
-        'recommendations': recommendations
+        'matches': [
+            {'course': courses[course_id], 'relevance_score': matched, 'match_score': score}
+            for course_id, matched, score in matches if course_id in courses
+        ]
     }), 200
 
 @student_bp.route('/analytics', methods=['GET'])
@@ -435,39 +450,31 @@ def get_course_exams_for_student(course_id):
 @student_bp.route('/exams', methods=['GET'])
 @role_required('student')
 def get_student_exams():
-    """Get all exams for enrolled courses"""
+    """Get all exams for enrolled courses, with the student's submission status"""
     current_user = get_current_user()
     course_id = request.args.get('course_id')
     
-    exam_service = ExamService(current_app.db)
-    
     if course_id:
-        success, exams = exam_service.get_course_exams(course_id, include_questions=False)
+        course_ids = [course_id]
     else:
-        # Get all exams for enrolled courses
         enrollment_service = EnrollmentService(current_app.db)
-        enrollments = enrollment_service.get_student_enrollments(current_user['user_id'])
-        course_ids = [e.get('course_id') for e in enrollments if 'course_id' in e]
-        
-        all_exams = []
-        for cid in course_ids:
-            success, exams = exam_service.get_course_exams(cid, include_questions=False)
-            if success:
-                all_exams.extend(exams)
-        exams = all_exams
-        success = True
+        course_ids = enrollment_service.get_student_course_ids(current_user['user_id'])
+    
+    exam_service = ExamService(current_app.db)
+    success, exams = exam_service.get_student_exams(current_user['user_id'], course_ids)
     
     return jsonify({'success': success, 'exams': exams}), 200
 
 @student_bp.route('/exams/<exam_id>', methods=['GET'])
 @role_required('student')
 def get_exam_details(exam_id):
-    """Get exam details with questions"""
+    """Get exam details with questions (answers stripped, served from the snapshot cache)"""
+    current_user = get_current_user()
     exam_service = ExamService(current_app.db)
-    success, exam = exam_service.get_exam(exam_id)
+    body = exam_service.get_student_exam_json(exam_id, current_user['user_id'])
     
-    if success:
-        return jsonify({'success': True, 'exam': exam}), 200
+    if body:
+        return Response(body, status=200, mimetype='application/json')
     else:
         return jsonify({'success': False, 'error': 'Exam not found'}), 404
 
@@ -482,7 +489,8 @@ def submit_exam(exam_id):
     success, result = exam_service.submit_exam(
         exam_id,
         current_user['user_id'],
-        data.get('answers', {})
+        data.get('answers', {}),
+        use_draft=bool(data.get('use_draft', False))
     )
     
     if success:
@@ -490,6 +498,37 @@ def submit_exam(exam_id):
     else:
         return jsonify({'success': False, 'error': result}), 400
 
+@student_bp.route('/exams/<exam_id>/draft', methods=['PUT'])
+@role_required('student')
+def save_exam_draft(exam_id):
+    """Autosave answer deltas ({"answers": {"<question index>": answer}, "seq": n})"""
+    current_user = get_current_user()
+    data = request.get_json() or {}
+    
+    exam_service = ExamService(current_app.db)
+    success, result = exam_service.save_draft_answers(
+        exam_id,
+        current_user['user_id'],
+        data.get('answers'),
+        data.get('seq', 0)
+    )
+    
+    if success:
+        return jsonify({'success': True, 'saved': result}), 200
+    else:
+        return jsonify({'success': False, 'error': result}), 400
+
+@student_bp.route('/exams/<exam_id>/draft', methods=['GET'])
+@role_required('student')
+def get_exam_draft(exam_id):
+    """Get autosaved answers for the current attempt"""
+    current_user = get_current_user()
+    
+    exam_service = ExamService(current_app.db)
+    answers = exam_service.get_draft_answers(exam_id, current_user['user_id'])
+    
+    return jsonify({'success': True, 'answers': answers}), 200
+
 @student_bp.route('/submissions', methods=['GET'])
 @role_required('student')
 def get_student_submissions():
@@ -551,27 +590,42 @@ def get_certificate(certificate_id):
         return jsonify({'success': False, 'error': 'Certificate not found'}), 404
 
 
+@student_bp.route('/certificates/<certificate_id>/status', methods=['GET'])
+@role_required('student')
+def get_certificate_status(certificate_id):
+    """Get whether a certificate's PDF is ready"""
+    current_user = get_current_user()
+    certificate_service = CertificateService(current_app.db)
+    success, result = certificate_service.get_render_status(certificate_id)
+    
+    if success and result['student_id'] == current_user['user_id']:
+        return jsonify({'success': True, 'status': result}), 200
+    else:
+        return jsonify({'success': False, 'error': 'Certificate not found'}), 404
+
 @student_bp.route('/certificates/<certificate_id>/download', methods=['GET'])
 @role_required('student')
 def download_certificate(certificate_id):
     """Download certificate PDF"""
+    current_user = get_current_user()
     certificate_service = CertificateService(current_app.db)
-    success, certificate = certificate_service.get_certificate(certificate_id)
+    certificate = certificate_service.find_certificate(certificate_id)
 
-    if not success:
+    if not certificate or str(certificate['student_id']) != current_user['user_id']:
         return jsonify({'success': False, 'error': 'Certificate not found'}), 404
 
-    file_path = certificate.get('file_path') or certificate.get('certificate_path')
-    if not file_path or not os.path.exists(file_path):
-        # Attempt to render/generate PDF on demand
-        cert_service = CertificateService(current_app.db)
-        success_render, result = cert_service.render_certificate_pdf(certificate_id)
-        if not success_render:
-            return jsonify({'success': False, 'error': 'Certificate file not available and rendering failed'}), 404
-        file_path = result
+    # Served from the certificate store; rendered again if it was evicted
+    success_render, result = certificate_service.render_certificate_pdf(certificate['_id'], certificate)
+    if not success_render:
+        return jsonify({'success': False, 'error': 'Certificate file not available and rendering failed'}), 404
+    file_path = result
 
     try:
-        return send_file(file_path, as_attachment=True, download_name=f"{certificate.get('certificate_id')}.pdf", mimetype='application/pdf')
+        return send_versioned_file(
+            file_path,
+            f"{certificate.get('certificate_id')}.pdf",
+            certificate_store.version_for(certificate)
+        )
     except Exception as e:
         current_app.logger.error(f"Error sending certificate file: {e}")
         return jsonify({'success': False, 'error': 'Failed to send certificate file'}), 500
@@ -591,10 +645,10 @@ def get_course_certificate(course_id):
             'course_id': ObjectId(course_id)
         })
         
-        if certificate:
-            # Certificate exists, try to send it
-            file_path = certificate.get('file_path') or certificate.get('certificate_path')
-            if file_path and os.path.exists(file_path):
+        if certificate and (certificate.get('file_path') or certificate.get('certificate_path')):
+            # Certificate was rendered before; the store re-renders it if evicted
+            success_render, file_path = certificate_service.render_certificate_pdf(certificate['_id'], certificate)
+            if success_render:
                 return send_file(file_path, as_attachment=True, 
                                download_name=f"certificate_{course_id}.pdf", 
                                mimetype='application/pdf')
@@ -0,0 +1,22 @@
+"""
+Verification Routes
+Public certificate verification (no login required)
+"""
+from flask import Blueprint, jsonify, current_app
+from app.services.certificate_service import CertificateService
+
+verification_bp = Blueprint('verification', __name__)
+
+@verification_bp.route('/<certificate_id>', methods=['GET'])
+def verify_certificate(certificate_id):
+    """Verify a certificate by its certificate number or id"""
+    certificate_service = CertificateService(current_app.db)
+    success, result = certificate_service.verify_certificate(certificate_id)
+
+    if success:
+        response = jsonify({'success': True, 'valid': result['valid'], 'certificate': result})
+        response.cache_control.public = True
+        response.cache_control.max_age = 60
+        return response, 200
+    else:
+        return jsonify({'success': False, 'valid': False, 'error': result}), 404
@@ -0,0 +1,90 @@
+"""
+Certificate Lookup Cache
+In-process LRU of certificate documents for the read-heavy paths (public
+verification page, PDF downloads). A certificate is reachable by its _id
+or by its certificate number, so every document is cached under both.
+
+Entries expire after `ttl_seconds`, so changes made by other processes
+show up within that window; CertificateService invalidates entries it
+changes itself.
+"""
+import threading
+import time
+from collections import OrderedDict
+from bson import ObjectId
+
+
+class CertificateLookupCache:
+    def __init__(self, max_entries=10000, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (document, loaded_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _keys(certificate):
+        return (str(certificate['_id']), certificate.get('certificate_id'))
+
+    def get(self, certificate_id, loader):
+        """
+        Certificate document by _id or certificate number
+        Args:
+            loader: Called with the id on a miss; returns the document or None
+        """
+        key = str(certificate_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        certificate = loader(certificate_id)
+        if certificate is not None:
+            self.put(certificate)
+        return certificate
+
+    def put(self, certificate):
+        now = time.monotonic()
+        with self._lock:
+            for key in self._keys(certificate):
+                if key:
+                    self._entries[key] = (certificate, now)
+                    self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, certificate_id):
+        """Drop a certificate (by either id) from the cache"""
+        with self._lock:
+            entry = self._entries.pop(str(certificate_id), None)
+            if entry is not None:
+                for key in self._keys(entry[0]):
+                    self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+def load_certificate(collection, certificate_id):
+    """Find a certificate by _id, falling back to the certificate number"""
+    if ObjectId.is_valid(certificate_id):
+        certificate = collection.find_one({'_id': ObjectId(certificate_id)})
+        if certificate:
+            return certificate
+    return collection.find_one({'certificate_id': str(certificate_id)})
+
+
+# Create singleton instance (one cache per worker process)
+certificate_lookup_cache = CertificateLookupCache()
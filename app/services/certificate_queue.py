@@ -0,0 +1,258 @@
+"""
+Certificate Queue
+Mongo-backed job queue for rendering certificate PDFs off the request thread.
+
+generate_certificate writes the certificate record and enqueues a job in
+`certificate_jobs`; a CertificateWorker claims jobs with an atomic
+find_one_and_update lease, renders the PDFs in a ProcessPoolExecutor and
+records the outcome. Failed renders are retried with exponential backoff;
+a job whose worker died is picked up again once its lease expires.
+
+The job state is mirrored onto the certificate document as
+`render_status` (queued | running | done | failed).
+"""
+import os
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from app.services.certificate_store import CertificateStore, certificate_store
+from app.utils.logger import log_error, log_info
+
+MAX_ATTEMPTS = 5
+LEASE_SECONDS = 300
+RETRY_BASE_SECONDS = 10
+
+_indexed_databases = set()
+
+
+class CertificateJobQueue:
+    def __init__(self, db):
+        self.db = db
+        self.job_collection = db['certificate_jobs']
+        self.certificate_collection = db['certificates']
+        self._create_indexes()
+
+    def _create_indexes(self):
+        key = (id(self.db.client), self.db.name)
+        if key in _indexed_databases:
+            return
+        self.job_collection.create_index([('certificate_id', 1)], unique=True)
+        self.job_collection.create_index([('status', 1), ('run_after', 1)])
+        _indexed_databases.add(key)
+
+    def enqueue(self, certificate_ids):
+        """
+        Queue (or re-queue) render jobs for certificates
+        Args:
+            certificate_ids: Certificate _id or a list of them
+        """
+        if not isinstance(certificate_ids, (list, tuple, set)):
+            certificate_ids = [certificate_ids]
+        now = datetime.now()
+        requests = [
+            UpdateOne(
+                {'certificate_id': ObjectId(cid)},
+                {
+                    '$set': {
+                        'status': 'queued', 'run_after': now, 'attempts': 0,
+                        'error': None, 'finished_at': None, 'updated_at': now
+                    },
+                    '$setOnInsert': {'created_at': now}
+                },
+                upsert=True
+            )
+            for cid in certificate_ids
+        ]
+        if requests:
+            self.job_collection.bulk_write(requests, ordered=False)
+            self.certificate_collection.update_many(
+                {'_id': {'$in': [ObjectId(cid) for cid in certificate_ids]}},
+                {'$set': {'render_status': 'queued'}}
+            )
+        return len(requests)
+
+    def claim(self, worker_id, limit):
+        """Lease up to `limit` runnable jobs (queued, or running with an expired lease)"""
+        jobs = []
+        for _ in range(limit):
+            now = datetime.now()
+            job = self.job_collection.find_one_and_update(
+                {'$or': [
+                    {'status': 'queued', 'run_after': {'$lte': now}},
+                    {'status': 'running', 'locked_until': {'$lt': now}}
+                ]},
+                {
+                    '$set': {
+                        'status': 'running',
+                        'locked_by': worker_id,
+                        'locked_until': now + timedelta(seconds=LEASE_SECONDS),
+                        'started_at': now,
+                        'updated_at': now
+                    },
+                    '$inc': {'attempts': 1}
+                },
+                sort=[('run_after', 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                break
+            jobs.append(job)
+
+        if jobs:
+            self.certificate_collection.update_many(
+                {'_id': {'$in': [job['certificate_id'] for job in jobs]}},
+                {'$set': {'render_status': 'running'}}
+            )
+        return jobs
+
+    def complete(self, job, file_path):
+        now = datetime.now()
+        self.job_collection.update_one(
+            {'_id': job['_id']},
+            {'$set': {'status': 'done', 'finished_at': now, 'updated_at': now, 'error': None}}
+        )
+        self.certificate_collection.update_one(
+            {'_id': job['certificate_id']},
+            {'$set': {
+                'render_status': 'done',
+                'render_attempts': job.get('attempts', 1),
+                'render_error': None,
+                'rendered_at': now,
+                'file_path': file_path
+            }}
+        )
+
+    def fail(self, job, error):
+        """Record a failed attempt; retry with backoff until MAX_ATTEMPTS"""
+        now = datetime.now()
+        attempts = job.get('attempts', 1)
+        if attempts >= MAX_ATTEMPTS:
+            status, changes = 'failed', {'finished_at': now}
+        else:
+            status = 'queued'
+            changes = {'run_after': now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))}
+
+        self.job_collection.update_one(
+            {'_id': job['_id']},
+            {'$set': dict(changes, status=status, error=str(error), updated_at=now)}
+        )
+        self.certificate_collection.update_one(
+            {'_id': job['certificate_id']},
+            {'$set': {'render_status': status, 'render_attempts': attempts, 'render_error': str(error)}}
+        )
+
+    def get_status(self, certificate_id):
+        """Render job status for a certificate (by _id)"""
+        job = self.job_collection.find_one({'certificate_id': ObjectId(certificate_id)})
+        if not job:
+            return None
+        return {
+            'status': job['status'],
+            'attempts': job.get('attempts', 0),
+            'error': job.get('error'),
+            'queued_at': job['created_at'].isoformat() if job.get('created_at') else None,
+            'next_attempt_at': job['run_after'].isoformat() if job['status'] == 'queued' and job.get('run_after') else None,
+            'finished_at': job['finished_at'].isoformat() if job.get('finished_at') else None
+        }
+
+
+def _render_job(certificate_data, file_path):
+    """Runs in a worker process: render one PDF into the store or raise"""
+    if not CertificateStore.render(certificate_data, file_path):
+        raise RuntimeError('Certificate PDF was not written')
+    return file_path
+
+
+class CertificateWorker:
+    """
+    Claims render jobs and renders them in a process pool
+    Database access stays in the parent; child processes only draw PDFs.
+    """
+    def __init__(self, db, processes=None, batch_size=None, poll_interval=2.0):
+        self.db = db
+        self.queue = CertificateJobQueue(db)
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size or self.processes * 4
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._pool = None
+        self._stop = threading.Event()
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes)
+        return self._pool
+
+    def run_once(self):
+        """Claim and render one batch; returns the number of jobs processed"""
+        jobs = self.queue.claim(self.worker_id, self.batch_size)
+        if not jobs:
+            return 0
+
+        certificates = {
+            cert['_id']: cert for cert in self.queue.certificate_collection.find(
+                {'_id': {'$in': [job['certificate_id'] for job in jobs]}}
+            )
+        }
+
+        pool = self._get_pool()
+        futures = []
+        for job in jobs:
+            cert = certificates.get(job['certificate_id'])
+            if not cert:
+                self.queue.fail(dict(job, attempts=MAX_ATTEMPTS), 'Certificate not found')
+                continue
+            futures.append((job, cert, pool.submit(_render_job, cert, certificate_store.path_for(cert))))
+
+        for job, cert, future in futures:
+            try:
+                file_path = future.result()
+            except BrokenProcessPool as e:
+                # A child died; start a fresh pool for the next batch
+                self._pool = None
+                self.queue.fail(job, e)
+                continue
+            except Exception as e:
+                log_error(f"Render failed for {cert.get('certificate_id')}: {e}", "certificate_queue.run_once")
+                self.queue.fail(job, e)
+                continue
+
+            certificate_store.record(file_path)
+            self.queue.complete(job, file_path)
+            if cert.get('submission_id'):
+                self.db['exam_submissions'].update_one(
+                    {'_id': cert['submission_id']},
+                    {'$set': {'certificate_path': file_path}}
+                )
+
+        return len(jobs)
+
+    def run_forever(self):
+        log_info(f"Certificate worker {self.worker_id} started ({self.processes} processes)")
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                log_error(str(e), "certificate_queue.run_forever")
+                processed = 0
+            if not processed:
+                self._stop.wait(self.poll_interval)
+        self.shutdown()
+
+    def start(self):
+        """Run the worker loop in a daemon thread"""
+        thread = threading.Thread(target=self.run_forever, name='certificate-worker', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
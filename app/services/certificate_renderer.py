@@ -0,0 +1,215 @@
+"""
+Certificate Renderer
+Draws certificate PDFs. Kept free of database access so it can run inside
+worker processes (see certificate_queue).
+"""
+import hashlib
+import os
+import threading
+from collections import namedtuple
+
+# PDF generation library (reportlab). If not installed, the minimal fallback writer is used.
+try:
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    REPORTLAB_AVAILABLE = True
+except Exception:
+    REPORTLAB_AVAILABLE = False
+
+CERTIFICATES_DIR = os.path.join(os.getcwd(), 'certificates')
+TEMPLATE_PATH = os.path.join(os.getcwd(), 'static', 'certificate_templates', 'certificate_template.png')
+TEMPLATE_CACHE_DIR = os.path.join(CERTIFICATES_DIR, '.template_cache')
+
+# The template is drawn at most at this resolution; reportlab embeds JPEG
+# files as-is, so encoding it once avoids a decode + zlib pass per PDF.
+TEMPLATE_DPI = 200
+TEMPLATE_JPEG_QUALITY = 85
+
+Background = namedtuple('Background', ['image_path', 'x', 'y', 'width', 'height', 'version'])
+
+_background = None
+_background_lock = threading.Lock()
+
+
+def get_background(page_size):
+    """
+    Template background for a page size, prepared once per process
+    The PNG is decoded, fitted to the page (keeping its aspect ratio),
+    downscaled to TEMPLATE_DPI and written as a JPEG next to the
+    certificates. Rebuilt when the template file changes.
+    Returns: Background or None if the template is missing or unreadable
+    """
+    global _background
+    try:
+        stat = os.stat(TEMPLATE_PATH)
+    except OSError:
+        return None
+
+    key = (stat.st_mtime, stat.st_size, tuple(page_size))
+    cached = _background
+    if cached and cached[0] == key:
+        return cached[1]
+
+    with _background_lock:
+        if _background and _background[0] == key:
+            return _background[1]
+        try:
+            background = _prepare_background(stat, page_size)
+        except Exception as e:
+            print(f"[CertificateRenderer] Error preparing template image: {e}")
+            return None
+        _background = (key, background)
+        return background
+
+
+def _prepare_background(stat, page_size):
+    from PIL import Image
+
+    width, height = page_size
+    version = hashlib.sha256(
+        f"{stat.st_mtime}:{stat.st_size}:{width}x{height}:{TEMPLATE_DPI}:{TEMPLATE_JPEG_QUALITY}".encode('utf-8')
+    ).hexdigest()[:16]
+    image_path = os.path.join(TEMPLATE_CACHE_DIR, f"{version}.jpg")
+
+    img = Image.open(TEMPLATE_PATH)
+    img_width, img_height = img.size
+
+    # Fit to the page while maintaining aspect ratio, centered
+    scale = min(width / img_width, height / img_height)
+    new_width = img_width * scale
+    new_height = img_height * scale
+    x = (width - new_width) / 2
+    y = (height - new_height) / 2
+
+    if not os.path.exists(image_path):
+        target = (round(new_width / 72 * TEMPLATE_DPI), round(new_height / 72 * TEMPLATE_DPI))
+        if target[0] < img_width:
+            img = img.resize(target, Image.LANCZOS)
+        if img.mode != 'RGB':
+            # JPEG has no alpha: flatten onto white
+            flattened = Image.new('RGB', img.size, (255, 255, 255))
+            flattened.paste(img, mask=img.convert('RGBA').split()[-1])
+            img = flattened
+
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{image_path}.{os.getpid()}.tmp"
+        img.save(tmp_path, 'JPEG', quality=TEMPLATE_JPEG_QUALITY, optimize=True)
+        os.replace(tmp_path, image_path)
+
+    return Background(image_path, x, y, new_width, new_height, version)
+
+
+def template_version():
+    """Identifier of the current template rendering (changes when the template does)"""
+    background = get_background(A4) if REPORTLAB_AVAILABLE else None
+    return background.version if background else 'plain'
+
+
+def render_certificate(certificate_data, file_path):
+    """
+    Render a certificate PDF to file_path
+    Returns: True if the file was written
+    """
+    if REPORTLAB_AVAILABLE:
+        create_pdf(certificate_data, file_path)
+        return os.path.exists(file_path)
+    return create_simple_pdf(file_path, certificate_data)
+
+
+def create_pdf(certificate_data, file_path):
+    """Create a professional PDF certificate with template background"""
+    if not REPORTLAB_AVAILABLE:
+        # Use fallback minimal PDF generator
+        return create_simple_pdf(file_path, certificate_data)
+
+    from reportlab.lib.colors import HexColor, black
+
+    c = canvas.Canvas(file_path, pagesize=A4)
+    width, height = A4  # 595.27 x 841.89 points
+
+    # Template background, pre-scaled and JPEG-encoded once per process
+    background = get_background(A4)
+    if background:
+        c.drawImage(background.image_path, background.x, background.y,
+                    width=background.width, height=background.height)
+    else:
+        # Solid background if template not found
+        c.setFillColor(HexColor('#F5F5DC'))
+        c.rect(0, 0, width, height, fill=1)
+
+    # Student Name - positioned to match template (adjust Y position as needed)
+    c.setFillColor(black)
+    c.setFont('Helvetica-Bold', 32)
+    # Center horizontally, position at ~45% from top
+    c.drawCentredString(width/2, height * 0.45, certificate_data.get('student_name', '').upper())
+
+    # Award text - positioned below name
+    course_title = certificate_data.get('course_title', '')
+    issued_date = certificate_data.get('issued_date')
+    year = issued_date.year if issued_date else 2025
+
+    award_text = f'"Awarded in recognition of outstanding performance in the'
+    c.setFont('Helvetica', 13)
+    c.drawCentredString(width/2, height * 0.38, award_text)
+
+    completion_text = f'completion of the {course_title} course on {year}.'
+    c.drawCentredString(width/2, height * 0.35, completion_text)
+
+    # Save PDF
+    c.showPage()
+    c.save()
+
+    return True
+
+
+def create_simple_pdf(file_path, certificate_data):
+    """Fallback minimal PDF writer that writes plain text to a PDF using Type1 fonts.
+    This is intentionally minimal and avoids external deps.
+    """
+    try:
+        title = 'Certificate of Completion'
+        name = certificate_data.get('student_name', '')
+        course = certificate_data.get('course_title', '')
+        score = f"Score: {certificate_data.get('marks_obtained')}/{certificate_data.get('total_marks')} ({certificate_data.get('percentage')}%)"
+        issued = certificate_data.get('issued_date').strftime('%Y-%m-%d') if certificate_data.get('issued_date') else ''
+
+        text = f"{title}\n\n{name}\n\nhas successfully completed the course:\n{course}\n\n{score}\nIssued: {issued}\nCertificate ID: {certificate_data.get('certificate_id')}"
+
+        # Build very simple PDF with single text block
+        content_stream = "BT\n/F1 14 Tf\n50 700 Td\n(%s) Tj\nET\n" % text.replace('(', '\\(').replace(')', '\\)')
+        content_bytes = content_stream.encode('utf-8')
+
+        objs = []
+        # Obj 1: Catalog
+        objs.append(b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+        # Obj 2: Pages
+        objs.append(b"2 0 obj\n<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n")
+        # Obj 3: Page
+        media = b"[0 0 595 842]"
+        objs.append(b"3 0 obj\n<< /Type /Page /Parent 2 0 R /Resources << /Font << /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> >> >> /MediaBox " + media + b" /Contents 4 0 R >>\nendobj\n")
+        # Obj 4: Contents
+        objs.append(b"4 0 obj\n<< /Length %d >>\nstream\n" % len(content_bytes) + content_bytes + b"\nendstream\nendobj\n")
+
+        # Build xref
+        body = b""
+        offsets = []
+        for o in objs:
+            offsets.append(len(body))
+            body += o
+
+        xref_pos = len(body)
+        xref = b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+        for off in offsets:
+            xref += b"%010d 00000 n \n" % off
+
+        trailer = b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n" % (len(objs) + 1, xref_pos)
+
+        pdf_bytes = b"%PDF-1.1\n" + body + xref + trailer
+
+        with open(file_path, 'wb') as f:
+            f.write(pdf_bytes)
+
+        return True
+    except Exception as e:
+        print(f"[CertificateRenderer] simple PDF generation failed: {e}")
+        return False
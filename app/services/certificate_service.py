@@ -2,19 +2,31 @@
 Certificate Service
 Handles e-certificate generation and email delivery
 """
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
 import base64
 from io import BytesIO
 import os
+import threading
+import uuid
+from app.services import certificate_renderer
+from app.services.certificate_queue import CertificateJobQueue
+from app.services.certificate_store import certificate_store
+from app.services.certificate_lookup_cache import certificate_lookup_cache, load_certificate
+from app.services.certificate_verification import certificate_verifier
+from app.services.id_service import IdService
+from app.services.email_outbox import EmailOutbox
+from app.utils.transactions import run_in_transaction
+from app.utils.pagination import paginate
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
-# PDF generation library (reportlab). If not installed, PDF generation will fail gracefully.
-try:
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import A4
-    REPORTLAB_AVAILABLE = True
-except Exception:
-    REPORTLAB_AVAILABLE = False
+BULK_BATCH_SIZE = 500
+BULK_LEASE_SECONDS = 300   # renewed after every batch; an expired run can be resumed
+BULK_RUN_IN_PROGRESS = 'Bulk run already in progress'
+APP_BASE_URL = os.getenv('APP_BASE_URL', 'http://localhost:5000')
+
+_indexed_databases = set()
 
 class CertificateService:
     def __init__(self, db):
@@ -23,6 +35,35 @@ class CertificateService:
         self.submission_collection = db['exam_submissions']
         self.users_collection = db['users']
         self.courses_collection = db['courses']
+        self.job_queue = CertificateJobQueue(db)
+        self.id_service = IdService(db)
+        self.outbox = EmailOutbox(db)
+        self._create_indexes()
+    
+    def _create_indexes(self):
+        # Services are built per request; only the first one per process creates indexes
+        key = (id(self.db.client), self.db.name)
+        if key in _indexed_databases:
+            return
+        # One certificate per submission, however many runs or admins issue it
+        self.certificate_collection.create_index(
+            [('submission_id', 1)], unique=True,
+            partialFilterExpression={'submission_id': {'$type': 'objectId'}}
+        )
+        # Pending-approval queue, newest first
+        self.submission_collection.create_index([
+            ('certificate_generated', 1), ('passed', 1), ('graded', 1), ('submitted_at', -1), ('_id', -1)
+        ])
+        # Bulk issuance walks an exam's / course's uncertified passers in _id order
+        self.submission_collection.create_index([('exam_id', 1), ('certificate_generated', 1), ('passed', 1), ('_id', 1)])
+        self.submission_collection.create_index([('course_id', 1), ('certificate_generated', 1), ('passed', 1), ('_id', 1)])
+        self.certificate_collection.create_index([('bulk_run_id', 1), ('render_status', 1)])
+        # At most one running bulk run per exam / course
+        self.db['certificate_bulk_runs'].create_index(
+            [('scope_field', 1), ('scope_id', 1)], unique=True,
+            partialFilterExpression={'status': 'running'}
+        )
+        _indexed_databases.add(key)
         
     def generate_certificate(self, submission_id, admin_id):
         """Generate certificate after admin approval"""
@@ -51,27 +92,20 @@ class CertificateService:
             if not student or not course:
                 return False, 'Student or course not found'
             
-            # Generate certificate ID
-            cert_id = f"CERT-{datetime.now().strftime('%Y%m%d')}-{str(submission['student_id'])[-6:]}"
-            
-            certificate_doc = {
-                'certificate_id': cert_id,
-                'submission_id': ObjectId(submission_id),
-                'student_id': submission['student_id'],
-                'course_id': submission['course_id'],
-                'student_name': student['name'],
-                'student_email': student['email'],
-                'course_title': course['title'],
-                'marks_obtained': submission['marks_obtained'],
-                'total_marks': submission['total_marks'],
-                'percentage': round((submission['marks_obtained'] / submission['total_marks']) * 100, 2),
-                'issued_date': datetime.now(),
-                'admin_id': ObjectId(admin_id),
-                'status': 'active',
-                'email_sent': False
-            }
+            certificate_doc = self._build_certificate_doc(submission, student, course, admin_id)
             
-            result = self.certificate_collection.insert_one(certificate_doc)
+            # The certificate and its email are written together; the email
+            # dispatcher delivers it later
+            def write_certificate(session):
+                result = self.certificate_collection.insert_one(certificate_doc, session=session)
+                self.outbox.enqueue(self._certificate_email(certificate_doc), session=session)
+                return result
+            
+            try:
+                result = run_in_transaction(self.db.client, write_certificate)
+            except DuplicateKeyError:
+                return False, 'Certificate already generated'
+            certificate_verifier.put(certificate_doc)
             
             # Update submission
             self.submission_collection.update_one(
@@ -85,234 +119,385 @@ class CertificateService:
                 }
             )
 
-            # Create PDF certificate file (if reportlab available)
-            try:
-                certs_dir = os.path.join(os.getcwd(), 'certificates')
-                os.makedirs(certs_dir, exist_ok=True)
-                pdf_filename = f"{cert_id}.pdf"
-                file_path = os.path.join(certs_dir, pdf_filename)
-
-                if REPORTLAB_AVAILABLE:
-                    self._create_pdf(certificate_doc, file_path)
-                    # Update certificate doc with file path
-                    self.certificate_collection.update_one(
-                        {'_id': result.inserted_id},
-                        {'$set': {'file_path': file_path}}
-                    )
-                    # Update submission with certificate path as well
-                    self.submission_collection.update_one(
-                        {'_id': ObjectId(submission_id)},
-                        {'$set': {'certificate_path': file_path}}
-                    )
-                else:
-                    # reportlab not available, leave file_path empty and still return certificate id
-                    file_path = None
-
-            except Exception as e:
-                print(f"[CertificateService] Error creating PDF: {e}")
-                file_path = None
-
-            # Send email (placeholder - implement with actual email service)
-            self._send_certificate_email(student['email'], certificate_doc)
+            # PDF rendering is done by the certificate worker
+            self.job_queue.enqueue(result.inserted_id)
 
             return True, str(result.inserted_id)
             
         except Exception as e:
             return False, f'Error generating certificate: {str(e)}'
     
-    def _send_certificate_email(self, email, certificate_data):
-        """Send certificate via email"""
+    def _build_certificate_doc(self, submission, student, course, admin_id):
+        """Certificate record for a passed submission"""
+        return {
+            'certificate_id': self.id_service.certificate_number(),
+            'submission_id': submission['_id'],
+            'student_id': submission['student_id'],
+            'course_id': submission['course_id'],
+            'student_name': student['name'],
+            'student_email': student['email'],
+            'course_title': course['title'],
+            'marks_obtained': submission['marks_obtained'],
+            'total_marks': submission['total_marks'],
+            'percentage': round((submission['marks_obtained'] / submission['total_marks']) * 100, 2),
+            'issued_date': datetime.now(),
+            'admin_id': ObjectId(admin_id),
+            'status': 'active',
+            'render_status': 'queued',
+            'email_sent': False
+        }
+    
+    def start_bulk_issue(self, admin_id, exam_id=None, course_id=None):
+        """
+        Start a bulk issuance run for every passed, uncertified submission
+        of an exam or a course
+        Returns: Tuple (success, run_id or error message)
+        """
         try:
-            # This is a placeholder - implement with actual email service (SMTP, SendGrid, etc.)
-            print(f"Sending certificate to {email}")
-            print(f"Certificate ID: {certificate_data['certificate_id']}")
+            if bool(exam_id) == bool(course_id):
+                return False, 'Provide either exam_id or course_id'
+            scope_field, scope_id = ('exam_id', exam_id) if exam_id else ('course_id', course_id)
+            if not ObjectId.is_valid(scope_id):
+                return False, f'Invalid {scope_field}'
+            
+            now = datetime.now()
+            result = self.db['certificate_bulk_runs'].insert_one({
+                'admin_id': ObjectId(admin_id),
+                'scope_field': scope_field,
+                'scope_id': ObjectId(scope_id),
+                'status': 'running',
+                'last_submission_id': None,
+                'issued': 0,
+                'skipped': 0,
+                'created_at': now,
+                'updated_at': now,
+                'finished_at': None
+            })
+            return True, str(result.inserted_id)
             
-            # Update certificate status
-            self.certificate_collection.update_one(
-                {'certificate_id': certificate_data['certificate_id']},
+        except DuplicateKeyError:
+            return False, BULK_RUN_IN_PROGRESS
+        except Exception as e:
+            return False, f'Error starting bulk issuance: {str(e)}'
+    
+    def claim_bulk_issue(self, run_id):
+        """
+        Lease a bulk run for this caller
+        A run leased by a live thread or process is refused; one whose lease
+        expired (its worker died) can be claimed again.
+        Returns: Tuple (success, lease or error message)
+        """
+        try:
+            now = datetime.now()
+            lease = uuid.uuid4().hex
+            run = self.db['certificate_bulk_runs'].find_one_and_update(
                 {
-                    '$set': {
-                        'email_sent': True,
-                        'email_sent_at': datetime.now()
-                    }
-                }
+                    '_id': ObjectId(run_id),
+                    'status': {'$ne': 'completed'},
+                    '$or': [{'lease': None}, {'locked_until': {'$lt': now}}]
+                },
+                {'$set': {
+                    'status': 'running',
+                    'lease': lease,
+                    'locked_until': now + timedelta(seconds=BULK_LEASE_SECONDS),
+                    'error': None,
+                    'updated_at': now
+                }}
             )
+            if run:
+                return True, lease
+            if not self.db['certificate_bulk_runs'].find_one({'_id': ObjectId(run_id)}, {'_id': 1}):
+                return False, 'Bulk run not found'
+            return False, BULK_RUN_IN_PROGRESS
             
-            return True
-            
+        except DuplicateKeyError:
+            # Another run for the same exam / course is running
+            return False, BULK_RUN_IN_PROGRESS
         except Exception as e:
-            print(f"Error sending email: {str(e)}")
-            return False
-
-    def _create_pdf(self, certificate_data, file_path):
-        """Create a professional PDF certificate with template background"""
-        if not REPORTLAB_AVAILABLE:
-            # Use fallback minimal PDF generator
-            return self._create_simple_pdf(file_path, certificate_data)
-
-        from reportlab.lib.units import inch
-        from reportlab.lib.colors import HexColor, black, white
-        from reportlab.lib.utils import ImageReader
-        from PIL import Image
-
-        c = canvas.Canvas(file_path, pagesize=A4)
-        width, height = A4  # 595.27 x 841.89 points
-
-        # Try to use template image as background
-        template_path = os.path.join(os.getcwd(), 'static', 'certificate_templates', 'certificate_template.png')
-        
-        if os.path.exists(template_path):
-            # Draw template image as background - fit to A4 size
-            try:
-                # Get image dimensions to maintain aspect ratio
-                img = Image.open(template_path)
-                img_width, img_height = img.size
-                
-                # Calculate scaling to fit A4 while maintaining aspect ratio
-                scale_w = width / img_width
-                scale_h = height / img_height
-                scale = min(scale_w, scale_h)
-                
-                new_width = img_width * scale
-                new_height = img_height * scale
+            return False, f'Error claiming bulk run: {str(e)}'
+    
+    def run_bulk_issue(self, run_id, batch_size=BULK_BATCH_SIZE, progress=None, lease=None):
+        """
+        Issue certificates for a bulk run, one batch at a time
+        Each batch is one submission query, one $in query each for students,
+        courses and existing certificates, an insert_many and a bulk_write;
+        the new certificates are handed to the render queue so the PDFs are
+        drawn by the certificate workers' process pools. The run records the
+        last submission _id after every batch, so an interrupted run resumes
+        where it stopped.
+        Args:
+            progress: Optional callback receiving the run document after each batch
+            lease: Lease from claim_bulk_issue (claimed here when omitted)
+        Returns: Tuple (success, run progress dict or error message)
+        """
+        runs = self.db['certificate_bulk_runs']
+        try:
+            if lease is None:
+                run = runs.find_one({'_id': ObjectId(run_id)}, {'status': 1})
+                if run and run['status'] == 'completed':
+                    return self.get_bulk_issue_progress(run_id)
+                success, lease = self.claim_bulk_issue(run_id)
+                if not success:
+                    return False, lease
+            run = runs.find_one({'_id': ObjectId(run_id), 'lease': lease})
+            if not run:
+                return False, BULK_RUN_IN_PROGRESS
+            
+            while True:
+                query = {
+                    run['scope_field']: run['scope_id'],
+                    'certificate_generated': False,
+                    'passed': True,
+                    'graded': True
+                }
+                if run.get('last_submission_id'):
+                    query['_id'] = {'$gt': run['last_submission_id']}
                 
-                # Center the image on page
-                x = (width - new_width) / 2
-                y = (height - new_height) / 2
+                submissions = list(self.submission_collection.find(
+                    query,
+                    {'student_id': 1, 'course_id': 1, 'marks_obtained': 1, 'total_marks': 1}
+                ).sort('_id', 1).limit(batch_size))
+                if not submissions:
+                    break
                 
-                c.drawImage(template_path, x, y, width=new_width, height=new_height, preserveAspectRatio=True, mask='auto')
-            except Exception as e:
-                print(f"[CertificateService] Error loading template image: {e}")
-                # Fall back to solid background
-                c.setFillColor(HexColor('#F5F5DC'))
-                c.rect(0, 0, width, height, fill=1)
-        else:
-            print(f"[CertificateService] Template not found at: {template_path}")
-            # Solid background if template not found
-            c.setFillColor(HexColor('#F5F5DC'))
-            c.rect(0, 0, width, height, fill=1)
-
-        # Student Name - positioned to match template (adjust Y position as needed)
-        c.setFillColor(black)
-        c.setFont('Helvetica-Bold', 32)
-        # Center horizontally, position at ~45% from top
-        c.drawCentredString(width/2, height * 0.45, certificate_data.get('student_name', '').upper())
-
-        # Award text - positioned below name
-        course_title = certificate_data.get('course_title', '')
-        issued_date = certificate_data.get('issued_date')
-        year = issued_date.year if issued_date else 2025
+                issued, skipped = self._issue_batch(run, submissions)
+                now = datetime.now()
+                run = runs.find_one_and_update(
+                    {'_id': run['_id'], 'lease': lease},
+                    {
+                        '$set': {
+                            'last_submission_id': submissions[-1]['_id'],
+                            'locked_until': now + timedelta(seconds=BULK_LEASE_SECONDS),
+                            'updated_at': now
+                        },
+                        '$inc': {'issued': issued, 'skipped': skipped}
+                    },
+                    return_document=ReturnDocument.AFTER
+                )
+                if not run:
+                    # The lease expired and another worker took the run over
+                    return False, 'Bulk run lease lost'
+                if progress:
+                    progress(run)
+            
+            now = datetime.now()
+            runs.update_one(
+                {'_id': run['_id'], 'lease': lease},
+                {
+                    '$set': {'status': 'completed', 'finished_at': now, 'updated_at': now},
+                    '$unset': {'lease': '', 'locked_until': ''}
+                }
+            )
+            return self.get_bulk_issue_progress(run_id)
+            
+        except Exception as e:
+            runs.update_one(
+                {'_id': ObjectId(run_id), 'lease': lease},
+                {
+                    '$set': {'status': 'interrupted', 'error': str(e), 'updated_at': datetime.now()},
+                    '$unset': {'lease': '', 'locked_until': ''}
+                }
+            )
+            return False, f'Error issuing certificates: {str(e)}'
+    
+    def run_bulk_issue_in_background(self, run_id):
+        """
+        Claim a bulk run and issue it in a daemon thread
+        Progress is polled with get_bulk_issue_progress; a run cut short by a
+        restart stays resumable from its last batch once its lease expires.
+        Returns: Tuple (success, run_id or error message)
+        """
+        success, lease = self.claim_bulk_issue(run_id)
+        if not success:
+            return False, lease
+        threading.Thread(
+            target=self.run_bulk_issue, args=(run_id,), kwargs={'lease': lease},
+            name=f'certificate-bulk-{run_id}', daemon=True
+        ).start()
+        return True, run_id
+    
+    def _issue_batch(self, run, submissions):
+        """Create certificate records for one batch of submissions; returns (issued, skipped)"""
+        students = {
+            user['_id']: user for user in self.users_collection.find(
+                {'_id': {'$in': list({sub['student_id'] for sub in submissions})}},
+                {'name': 1, 'email': 1}
+            )
+        }
+        courses = {
+            course['_id']: course for course in self.courses_collection.find(
+                {'_id': {'$in': list({sub['course_id'] for sub in submissions})}},
+                {'title': 1}
+            )
+        }
+        # Certificates left behind by a run that stopped between insert and update
+        existing = {
+            cert['submission_id']: cert for cert in self.certificate_collection.find(
+                {'submission_id': {'$in': [sub['_id'] for sub in submissions]}},
+                {'submission_id': 1, 'certificate_id': 1, 'student_name': 1, 'student_email': 1, 'course_title': 1}
+            )
+        }
         
-        award_text = f'"Awarded in recognition of outstanding performance in the'
-        c.setFont('Helvetica', 13)
-        c.drawCentredString(width/2, height * 0.38, award_text)
+        docs = []
+        skipped = 0
+        for sub in submissions:
+            student = students.get(sub['student_id'])
+            course = courses.get(sub['course_id'])
+            if sub['_id'] in existing:
+                continue
+            if not student or not course or not sub.get('total_marks'):
+                skipped += 1
+                continue
+            doc = self._build_certificate_doc(sub, student, course, run['admin_id'])
+            doc['bulk_run_id'] = run['_id']
+            docs.append(doc)
         
-        completion_text = f'completion of the {course_title} course on {year}.'
-        c.drawCentredString(width/2, height * 0.35, completion_text)
-
-        # Save PDF
-        c.showPage()
-        c.save()
+        certificate_ids = {submission_id: cert['_id'] for submission_id, cert in existing.items()}
+        if docs:
+            try:
+                self.certificate_collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # Keep the records that made it in; the others stay uncertified for a later run.
+                # 11000: the submission was certified meanwhile (single issue or another run)
+                failed = {error['index'] for error in e.details.get('writeErrors', [])}
+                skipped += len(failed)
+                docs = [doc for i, doc in enumerate(docs) if i not in failed]
+            certificate_ids.update((doc['submission_id'], doc['_id']) for doc in docs)
+            certificate_verifier.add_many(docs)
         
-        return True
-        c.setFont('Helvetica', 9)
-        cert_id_text = f"Certificate ID: {certificate_data.get('certificate_id')}"
-        c.drawCentredString(width/2, 18, cert_id_text)
+        # Already-queued emails are skipped by their dedupe key
+        self.outbox.enqueue_many([self._certificate_email(cert) for cert in list(existing.values()) + docs])
         
-        # Issue date
-        if issued_date:
-            c.setFillColor(dark_gray)
-            c.setFont('Helvetica-Oblique', 8)
-            c.drawRightString(width - 50, 18, f"Issued: {issued_date.strftime('%B %d, %Y')}")
-
-        c.showPage()
-        c.save()
-
-    def _create_simple_pdf(self, file_path, certificate_data):
-        """Fallback minimal PDF writer that writes plain text to a PDF using Type1 fonts.
-        This is intentionally minimal and avoids external deps.
+        if certificate_ids:
+            self.submission_collection.bulk_write([
+                UpdateOne(
+                    {'_id': submission_id},
+                    {'$set': {
+                        'certificate_generated': True,
+                        'admin_approved': True,
+                        'certificate_id': str(cert_id)
+                    }}
+                )
+                for submission_id, cert_id in certificate_ids.items()
+            ], ordered=False)
+            self.job_queue.enqueue(list(certificate_ids.values()))
+        
+        return len(certificate_ids), skipped
+    
+    def get_bulk_issue_progress(self, run_id):
+        """
+        Progress of a bulk issuance run, including how many PDFs are rendered
+        Returns: Tuple (success, progress dict or error message)
         """
         try:
-            title = 'Certificate of Completion'
-            name = certificate_data.get('student_name', '')
-            course = certificate_data.get('course_title', '')
-            score = f"Score: {certificate_data.get('marks_obtained')}/{certificate_data.get('total_marks')} ({certificate_data.get('percentage')}%)"
-            issued = certificate_data.get('issued_date').strftime('%Y-%m-%d') if certificate_data.get('issued_date') else ''
-
-            text = f"{title}\n\n{name}\n\nhas successfully completed the course:\n{course}\n\n{score}\nIssued: {issued}\nCertificate ID: {certificate_data.get('certificate_id')}"
-
-            # Build very simple PDF with single text block
-            content_stream = "BT\n/F1 14 Tf\n50 700 Td\n(%s) Tj\nET\n" % text.replace('(', '\(').replace(')', '\)')
-            content_bytes = content_stream.encode('utf-8')
-
-            objs = []
-            # Obj 1: Catalog
-            objs.append(b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
-            # Obj 2: Pages
-            objs.append(b"2 0 obj\n<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n")
-            # Obj 3: Page
-            media = b"[0 0 595 842]"
-            objs.append(b"3 0 obj\n<< /Type /Page /Parent 2 0 R /Resources << /Font << /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> >> >> /MediaBox " + media + b" /Contents 4 0 R >>\nendobj\n")
-            # Obj 4: Contents
-            objs.append(b"4 0 obj\n<< /Length %d >>\nstream\n" % len(content_bytes) + content_bytes + b"\nendstream\nendobj\n")
-
-            # Build xref
-            body = b""
-            offsets = []
-            for o in objs:
-                offsets.append(len(body))
-                body += o
-
-            xref_pos = len(body)
-            xref = b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
-            for off in offsets:
-                xref += b"%010d 00000 n \n" % off
-
-            trailer = b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n" % (len(objs) + 1, xref_pos)
-
-            pdf_bytes = b"%PDF-1.1\n" + body + xref + trailer
+            run = self.db['certificate_bulk_runs'].find_one({'_id': ObjectId(run_id)})
+            if not run:
+                return False, 'Bulk run not found'
+            
+            render = {
+                row['_id'] or 'unknown': row['count'] for row in self.certificate_collection.aggregate([
+                    {'$match': {'bulk_run_id': run['_id']}},
+                    {'$group': {'_id': '$render_status', 'count': {'$sum': 1}}}
+                ])
+            }
+            remaining = self.submission_collection.count_documents({
+                run['scope_field']: run['scope_id'],
+                'certificate_generated': False,
+                'passed': True,
+                'graded': True
+            })
+            return True, {
+                'run_id': str(run['_id']),
+                run['scope_field']: str(run['scope_id']),
+                'status': run['status'],
+                'issued': run.get('issued', 0),
+                'skipped': run.get('skipped', 0),
+                'remaining': remaining,
+                'render': render,
+                'error': run.get('error'),
+                'created_at': run['created_at'].isoformat(),
+                'finished_at': run['finished_at'].isoformat() if run.get('finished_at') else None
+            }
+            
+        except Exception as e:
+            return False, f'Error loading bulk run: {str(e)}'
+    
+    def get_render_status(self, certificate_id):
+        """
+        Get a certificate's PDF render status
+        Returns: Tuple (success, status dict or error message)
+        """
+        try:
+            if ObjectId.is_valid(certificate_id):
+                cert = self.certificate_collection.find_one({'_id': ObjectId(certificate_id)})
+            else:
+                cert = self.certificate_collection.find_one({'certificate_id': certificate_id})
+            if not cert:
+                return False, 'Certificate not found'
+            
+            status = self.job_queue.get_status(cert['_id']) or {'status': cert.get('render_status', 'done' if cert.get('file_path') else 'not_queued')}
+            status.update({
+                'certificate_id': cert.get('certificate_id'),
+                'student_id': str(cert.get('student_id')),
+                'email_sent': cert.get('email_sent', False),
+                'email': self.outbox.get_status(cert['_id']),
+                'download_ready': bool(cert.get('file_path')),
+                'download_version': certificate_store.version_for(cert) if cert.get('file_path') else None
+            })
+            return True, status
+            
+        except Exception as e:
+            return False, f'Error loading certificate status: {str(e)}'
+    
+    def _certificate_email(self, certificate):
+        """Outbox message delivering a certificate (PDF attached at send time)"""
+        number = certificate['certificate_id']
+        text = (
+            f"Dear {certificate.get('student_name', 'student')},\n\n"
+            f"Congratulations on completing {certificate.get('course_title', 'your course')}!\n"
+            f"Your certificate ({number}) is attached.\n\n"
+            f"Anyone can verify it at {APP_BASE_URL}/certificate/{number}\n"
+        )
+        return EmailOutbox.build(
+            certificate['student_email'],
+            f"Your certificate for {certificate.get('course_title', 'your course')}",
+            text,
+            kind='certificate',
+            ref_id=certificate['_id'],
+            dedupe_key=f"certificate:{certificate['_id']}",
+            attachments=[{'kind': 'certificate_pdf', 'ref_id': certificate['_id'], 'filename': f"{number}.pdf"}]
+        )
 
-            with open(file_path, 'wb') as f:
-                f.write(pdf_bytes)
+    def _create_pdf(self, certificate_data, file_path):
+        """Create a professional PDF certificate with template background"""
+        return certificate_renderer.create_pdf(certificate_data, file_path)
 
-            return True
-        except Exception as e:
-            print(f"[CertificateService] simple PDF generation failed: {e}")
-            return False
+    def _create_simple_pdf(self, file_path, certificate_data):
+        """Fallback minimal PDF writer (no external deps)"""
+        return certificate_renderer.create_simple_pdf(file_path, certificate_data)
 
-    def render_certificate_pdf(self, certificate_id):
+    def render_certificate_pdf(self, certificate_id, certificate=None):
         """Ensure a PDF file exists for a certificate; create on-demand if missing.
+        Files live in the size-capped certificate store, so a PDF may have been
+        evicted since it was last rendered.
         Returns tuple (success, file_path_or_error)
         """
         try:
-            cert = self.certificate_collection.find_one({'_id': ObjectId(certificate_id)})
+            cert = certificate or self.certificate_collection.find_one({'_id': ObjectId(certificate_id)})
             if not cert:
                 return False, 'Certificate not found'
 
-            file_path = cert.get('file_path')
-            if file_path and os.path.exists(file_path):
-                return True, file_path
-
-            # Otherwise create a file
-            certs_dir = os.path.join(os.getcwd(), 'certificates')
-            os.makedirs(certs_dir, exist_ok=True)
-            pdf_filename = f"{cert.get('certificate_id')}.pdf"
-            file_path = os.path.join(certs_dir, pdf_filename)
-
-            # call _create_pdf or fallback
-            created = False
-            if REPORTLAB_AVAILABLE:
-                # _create_pdf returns None when successful (reportlab), so check file existence
-                self._create_pdf(cert, file_path)
-                created = os.path.exists(file_path)
-            else:
-                created = self._create_simple_pdf(file_path, cert)
-
-            if created:
-                self.certificate_collection.update_one({'_id': cert['_id']}, {'$set': {'file_path': file_path}})
-                return True, file_path
-            else:
+            file_path = certificate_store.get_or_render(cert)
+            if not file_path:
                 return False, 'Failed to create certificate PDF'
+
+            if cert.get('file_path') != file_path:
+                self.certificate_collection.update_one(
+                    {'_id': cert['_id']},
+                    {'$set': {'file_path': file_path, 'render_status': 'done', 'rendered_at': datetime.now()}}
+                )
+                certificate_lookup_cache.invalidate(cert['_id'])
+            return True, file_path
         except Exception as e:
             print(f"[CertificateService] render_certificate_pdf error: {e}")
             return False, str(e)
@@ -337,17 +522,35 @@ class CertificateService:
         except Exception as e:
             return False, []
     
+    def find_certificate(self, certificate_id):
+        """Raw certificate document by _id or certificate number (cached; do not modify)"""
+        return certificate_lookup_cache.get(
+            certificate_id, lambda cid: load_certificate(self.certificate_collection, cid)
+        )
+    
+    def verify_certificate(self, certificate_id):
+        """
+        Public verification of a certificate by _id or certificate number
+        Unknown ids are rejected by an in-memory Bloom filter without a query.
+        Returns: Tuple (success, payload or error message)
+        """
+        try:
+            payload = certificate_verifier.verify(self.certificate_collection, certificate_id)
+            if payload is None:
+                return False, 'Certificate not found'
+            return True, payload
+            
+        except Exception as e:
+            return False, f'Error verifying certificate: {str(e)}'
+    
     def get_certificate(self, certificate_id):
         """Get certificate by ID"""
         try:
-            if ObjectId.is_valid(certificate_id):
-                cert = self.certificate_collection.find_one({'_id': ObjectId(certificate_id)})
-            else:
-                cert = self.certificate_collection.find_one({'certificate_id': certificate_id})
-            
+            cert = self.find_certificate(certificate_id)
             if not cert:
                 return False, None
             
+            cert = dict(cert)
             cert['_id'] = str(cert['_id'])
             cert['submission_id'] = str(cert['submission_id'])
             cert['student_id'] = str(cert['student_id'])
@@ -360,20 +563,40 @@ class CertificateService:
         except Exception as e:
             return False, None
     
-    def get_pending_approvals(self):
-        """Get submissions pending certificate approval"""
+    def get_pending_approvals(self, limit=None, cursor=None):
+        """
+        Get submissions pending certificate approval
+        Keyset-paginated (newest first); students and courses are joined with
+        one $in query each per page.
+        Returns:
+            Tuple (success, {'pending': [...], 'next_cursor': str or None})
+        """
         try:
             # Find passed submissions without certificates
-            submissions = list(self.submission_collection.find({
-                'passed': True,
-                'graded': True,
-                'certificate_generated': False
-            }))
+            submissions, next_cursor = paginate(
+                self.submission_collection,
+                {'passed': True, 'graded': True, 'certificate_generated': False},
+                'submitted_at', True, limit, cursor,
+                {'student_id': 1, 'course_id': 1, 'marks_obtained': 1, 'total_marks': 1, 'submitted_at': 1}
+            )
+            
+            students = {
+                user['_id']: user for user in self.users_collection.find(
+                    {'_id': {'$in': list({sub['student_id'] for sub in submissions})}},
+                    {'name': 1, 'email': 1}
+                )
+            }
+            courses = {
+                course['_id']: course for course in self.courses_collection.find(
+                    {'_id': {'$in': list({sub['course_id'] for sub in submissions})}},
+                    {'title': 1}
+                )
+            }
             
             pending = []
             for sub in submissions:
-                student = self.users_collection.find_one({'_id': sub['student_id']})
-                course = self.courses_collection.find_one({'_id': sub['course_id']})
+                student = students.get(sub['student_id'])
+                course = courses.get(sub['course_id'])
                 
                 pending.append({
                     'submission_id': str(sub['_id']),
@@ -387,15 +610,15 @@ class CertificateService:
                     'submitted_at': sub['submitted_at'].isoformat()
                 })
             
-            return True, pending
+            return True, {'pending': pending, 'next_cursor': next_cursor}
             
         except Exception as e:
-            return False, []
+            return False, {'pending': [], 'next_cursor': None}
     
     def revoke_certificate(self, certificate_id, admin_id, reason):
         """Revoke a certificate"""
         try:
-            result = self.certificate_collection.update_one(
+            cert = self.certificate_collection.find_one_and_update(
                 {'_id': ObjectId(certificate_id)},
                 {
                     '$set': {
@@ -404,10 +627,15 @@ class CertificateService:
                         'revoked_at': datetime.now(),
                         'revocation_reason': reason
                     }
-                }
+                },
+                return_document=ReturnDocument.AFTER
             )
             
-            if result.modified_count > 0:
+            certificate_lookup_cache.invalidate(certificate_id)
+            
+            if cert:
+                # Verifiers see "revoked" straight away
+                certificate_verifier.put(cert)
                 return True, 'Certificate revoked successfully'
             else:
                 return False, 'Certificate not found'
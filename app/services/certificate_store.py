@@ -0,0 +1,173 @@
+"""
+Certificate Store
+Size-capped disk cache of rendered certificate PDFs.
+
+Files are named after the certificate _id and the template version
+(`<shard>/<_id>-<version>.pdf`), so a template change makes new keys and
+the old files age out. The file mtime is the LRU clock: hits refresh it,
+and when the store grows past its cap the least recently used files are
+deleted until it is back under the low-water mark. An evicted certificate
+is simply rendered again on its next download.
+
+PDFs are written to a temp file in the same directory and renamed into
+place, so readers never see a partial file, even with several processes
+rendering the same certificate.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.services import certificate_renderer
+
+STORE_DIR = os.path.join(certificate_renderer.CERTIFICATES_DIR, 'store')
+MAX_BYTES = int(os.getenv('CERTIFICATE_CACHE_MAX_MB', '1024')) * 1024 * 1024
+LOW_WATER = 0.9
+TOUCH_INTERVAL_SECONDS = 60
+
+
+class CertificateStore:
+    def __init__(self, root=STORE_DIR, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._files = None  # OrderedDict path -> size, least recently used first
+        self._bytes = 0
+        self._render_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def version_for(self, certificate):
+        """Content key of a certificate's PDF (_id + template version); usable as an ETag"""
+        return f"{certificate['_id']}-{certificate_renderer.template_version()}"
+
+    def path_for(self, certificate):
+        """Store path for a certificate document"""
+        return os.path.join(self.root, str(certificate['_id'])[-2:], f"{self.version_for(certificate)}.pdf")
+
+    def get(self, certificate):
+        """Path of the stored PDF, or None (counts as a miss)"""
+        path = self.path_for(certificate)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        now = time.time()
+        if now - mtime > TOUCH_INTERVAL_SECONDS:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        with self._lock:
+            self.hits += 1
+            if self._files is not None and path in self._files:
+                self._files.move_to_end(path)
+        return path
+
+    def get_or_render(self, certificate):
+        """
+        Path of the certificate's PDF, rendering it if it is not stored
+        Returns: path or None if rendering failed
+        """
+        path = self.get(certificate)
+        if path:
+            return path
+
+        # One render per file in this process; concurrent requests wait for it
+        path = self.path_for(certificate)
+        with self._lock:
+            render_lock = self._render_locks.setdefault(path, threading.Lock())
+        try:
+            with render_lock:
+                if not os.path.exists(path):
+                    if not self.render(certificate, path):
+                        return None
+                    self.record(path)
+        finally:
+            with self._lock:
+                self._render_locks.pop(path, None)
+        return path
+
+    @staticmethod
+    def render(certificate, path):
+        """Render to a temp file next to `path` and rename it into place (safe in worker processes)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if not certificate_renderer.render_certificate(certificate, tmp_path):
+                return False
+            os.replace(tmp_path, path)
+            return True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def record(self, path):
+        """Account for a newly written file and evict if over the cap"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            self._load_index()
+            self._bytes += size - self._files.pop(path, 0)
+            self._files[path] = size
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _load_index(self):
+        if self._files is not None:
+            return
+        self._files, self._bytes = self._scan()
+
+    def _scan(self):
+        entries = []
+        if os.path.isdir(self.root):
+            for shard in os.scandir(self.root):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.pdf'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.path, stat.st_size))
+        entries.sort()
+        files = OrderedDict((path, size) for _, path, size in entries)
+        return files, sum(files.values())
+
+    def _evict(self):
+        # Other processes write to the same directory: recount before deleting
+        self._files, self._bytes = self._scan()
+        target = self.max_bytes * LOW_WATER
+        while self._files and self._bytes > target:
+            path, size = self._files.popitem(last=False)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._bytes -= size
+            self.evictions += 1
+            self.evicted_bytes += size
+
+    def stats(self):
+        """Hit rate and disk usage (counters are per process)"""
+        with self._lock:
+            self._files, self._bytes = self._scan()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'evicted_bytes': self.evicted_bytes,
+                'files': len(self._files),
+                'bytes_stored': self._bytes,
+                'max_bytes': self.max_bytes,
+                'template_version': certificate_renderer.template_version()
+            }
+
+
+certificate_store = CertificateStore()
@@ -0,0 +1,225 @@
+"""
+Certificate Verification
+Answers public "is this certificate genuine?" lookups from memory.
+
+- A Bloom filter holds every issued certificate's _id and certificate
+  number. An id that is not in the filter was never issued, so the lookup
+  is rejected without a database query. Ids issued by other processes are
+  picked up by an incremental load of recent certificates, at most once
+  every `refresh_interval` seconds.
+- Public verification payloads of real certificates are kept in an LRU
+  (with a TTL so revocations made by other processes show up).
+
+Revocation in this process replaces the cached payload and keeps the id in
+the filter, so a revoked certificate verifies as "revoked" rather than
+"not found".
+
+Every write to the live filter happens under `_lock` (setting a bit is a
+read-modify-write, and a lost bit is a permanent false "not found"). A
+rebuild scans into a private filter and replays ids added by `put` during
+the scan before swapping it in.
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from bson import ObjectId
+from app.services.certificate_lookup_cache import load_certificate
+
+# Certificates inserted slightly out of _id order are still caught by the
+# incremental load
+REFRESH_OVERLAP = timedelta(minutes=2)
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def verification_payload(certificate):
+    """Public fields of a certificate shown to verifiers"""
+    issued = certificate.get('issued_date')
+    revoked_at = certificate.get('revoked_at')
+    return {
+        'valid': certificate.get('status', 'active') != 'revoked',
+        'status': certificate.get('status', 'active'),
+        'certificate_id': certificate.get('certificate_id'),
+        'student_name': certificate.get('student_name'),
+        'course_title': certificate.get('course_title'),
+        'percentage': certificate.get('percentage'),
+        'issued_date': issued.isoformat() if hasattr(issued, 'isoformat') else issued,
+        'revoked_at': revoked_at.isoformat() if hasattr(revoked_at, 'isoformat') else revoked_at
+    }
+
+
+class CertificateVerifier:
+    def __init__(self, max_payloads=50000, payload_ttl=300, refresh_interval=5.0, error_rate=0.001):
+        self.max_payloads = max_payloads
+        self.payload_ttl = payload_ttl
+        self.refresh_interval = refresh_interval
+        self.error_rate = error_rate
+        self._bloom = None
+        self._high_water = None  # newest _id loaded into the filter
+        self._rebuild_keys = None  # keys put while a rebuild scans, replayed into the new filter
+        self._refreshed_at = 0.0
+        self._payloads = OrderedDict()  # key -> (payload, cached_at)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.rejected = 0
+        self.payload_hits = 0
+        self.db_lookups = 0
+
+    def verify(self, collection, certificate_id):
+        """
+        Verification payload for an id (_id or certificate number), or None
+        """
+        key = str(certificate_id)
+        self._ensure_loaded(collection)
+
+        payload = self._cached_payload(key)
+        if payload is not None:
+            return payload
+
+        if key not in self._bloom:
+            # Possibly issued by another process since the last refresh
+            if not self._refresh(collection) or key not in self._bloom:
+                with self._lock:
+                    self.rejected += 1
+                return None
+
+        with self._lock:
+            self.db_lookups += 1
+        certificate = load_certificate(collection, key)
+        if not certificate:
+            return None
+        return self.put(certificate)
+
+    def put(self, certificate):
+        """Add an issued (or updated) certificate to the filter and payload cache"""
+        payload = verification_payload(certificate)
+        keys = [k for k in (str(certificate['_id']), certificate.get('certificate_id')) if k]
+        now = time.monotonic()
+        with self._lock:
+            if self._bloom is not None:
+                for key in keys:
+                    if key not in self._bloom:
+                        self._bloom.add(key)
+            if self._rebuild_keys is not None:
+                self._rebuild_keys.extend(keys)
+            for key in keys:
+                self._payloads[key] = (payload, now)
+                self._payloads.move_to_end(key)
+            while len(self._payloads) > self.max_payloads:
+                self._payloads.popitem(last=False)
+        return payload
+
+    def add_many(self, certificates):
+        for certificate in certificates:
+            self.put(certificate)
+
+    def _cached_payload(self, key):
+        with self._lock:
+            entry = self._payloads.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] >= self.payload_ttl:
+                del self._payloads[key]
+                return None
+            self._payloads.move_to_end(key)
+            self.payload_hits += 1
+            return entry[0]
+
+    def _ensure_loaded(self, collection):
+        if self._bloom is not None:
+            return
+        with self._load_lock:
+            if self._bloom is None:
+                self._rebuild(collection)
+
+    def _rebuild(self, collection):
+        """Load every certificate id into a filter sized for twice the current count"""
+        with self._lock:
+            self._rebuild_keys = []
+        total = collection.estimated_document_count()
+        bloom = BloomFilter(max(100000, total * 2), self.error_rate)
+        high_water = None
+        for cert in collection.find({}, {'certificate_id': 1}):
+            bloom.add(str(cert['_id']))
+            if cert.get('certificate_id'):
+                bloom.add(cert['certificate_id'])
+            if high_water is None or cert['_id'] > high_water:
+                high_water = cert['_id']
+        with self._lock:
+            for key in self._rebuild_keys:
+                if key not in bloom:
+                    bloom.add(key)
+            self._rebuild_keys = None
+            self._bloom = bloom
+            self._high_water = high_water
+            self._refreshed_at = time.monotonic()
+
+    def _refresh(self, collection):
+        """Load certificates issued since the last load; returns False if rate-limited"""
+        if time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return False
+        with self._load_lock:
+            if time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return True
+            if self._bloom.count > self._bloom.capacity:
+                self._rebuild(collection)
+                return True
+
+            query = {}
+            if self._high_water is not None:
+                query = {'_id': {'$gt': ObjectId.from_datetime(self._high_water.generation_time - REFRESH_OVERLAP)}}
+            high_water = self._high_water
+            keys = []
+            for cert in collection.find(query, {'certificate_id': 1}):
+                keys.append(str(cert['_id']))
+                if cert.get('certificate_id'):
+                    keys.append(cert['certificate_id'])
+                if high_water is None or cert['_id'] > high_water:
+                    high_water = cert['_id']
+            with self._lock:
+                for key in keys:
+                    if key not in self._bloom:
+                        self._bloom.add(key)
+                self._high_water = high_water
+                self._refreshed_at = time.monotonic()
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'filter_entries': self._bloom.count if self._bloom else 0,
+                'filter_bytes': len(self._bloom.bits) if self._bloom else 0,
+                'cached_payloads': len(self._payloads),
+                'payload_hits': self.payload_hits,
+                'rejected': self.rejected,
+                'db_lookups': self.db_lookups
+            }
+
+
+# Create singleton instance (one verifier per worker process)
+certificate_verifier = CertificateVerifier()
@@ -2,27 +2,27 @@
 Chatbot Service - AI-powered chatbot using Groq LLM API (Llama 3.3-70B)
 Provides conversational assistance for course queries
 """
-import requests
 import os
+from app.services.llm_client import llm_client, LLMError, LLMTimeoutError
+from app.services.llm_cache import llm_response_cache, make_key
 from app.utils.logger import log_error, log_info
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_API_BASE = "https://api.groq.com/openai/v1/chat/completions"
 MODEL = "llama-3.3-70b-versatile"
 
 class ChatbotService:
     def __init__(self):
         self.api_key = GROQ_API_KEY
         self.model = MODEL
-        self.base_url = GROQ_API_BASE
     
-    def get_response(self, user_message, context=None, conversation_history=None):
+    def get_response(self, user_message, context=None, conversation_history=None, cache=False):
         """
         Get AI response from Groq API
         Args:
             user_message: User's question/message
             context: Additional context (course info, user profile, etc.)
             conversation_history: List of previous messages for context
+            cache: Serve repeated prompts from the response cache
         Returns:
             AI response text or error message
         """
@@ -31,60 +31,80 @@ class ChatbotService:
             return "Sorry, the AI service is not configured properly."
         
         try:
-            # Build system prompt
-            system_prompt = self._build_system_prompt(context)
+            messages = self._build_messages(user_message, context, conversation_history)
             
-            # Build messages array
-            messages = [{"role": "system", "content": system_prompt}]
+            params = {"temperature": 0.7, "max_tokens": 1024, "top_p": 1}
             
-            # Add conversation history if provided
-            if conversation_history:
-                messages.extend(conversation_history)
-            
-            # Add current user message
-            messages.append({"role": "user", "content": user_message})
-            
-            # Make API request
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1024,
-                "top_p": 1,
-                "stream": False
-            }
-            
-            log_info(f"Chatbot request: {user_message[:50]}...")
-            
-            response = requests.post(
-                self.base_url,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                ai_message = data['choices'][0]['message']['content']
+            def complete():
+                log_info(f"Chatbot request: {user_message[:50]}...")
+                result = llm_client.chat(messages, model=self.model, **params)
                 log_info("Chatbot response generated successfully")
-                return ai_message
-            else:
-                log_error(f"Groq API error: {response.status_code} - {response.text}", "chatbot_service")
-                return "Sorry, I'm having trouble processing your request. Please try again."
+                return result.content
+            
+            if cache:
+                return llm_response_cache.get_or_compute(make_key(self.model, messages, **params), complete)
+            return complete()
         
-        except requests.exceptions.Timeout:
+        except LLMTimeoutError:
             log_error("Groq API timeout", "chatbot_service")
             return "Sorry, the request timed out. Please try again."
         
+        except LLMError as e:
+            log_error(f"Groq API error: {e}", "chatbot_service")
+            return "Sorry, I'm having trouble processing your request. Please try again."
+        
         except Exception as e:
             log_error(str(e), "chatbot_service")
             return "Sorry, an error occurred while processing your request."
     
+    def stream_response(self, user_message, context=None, conversation_history=None):
+        """
+        Stream the AI response from Groq API
+        Yields:
+            Response text chunks as they are generated (error text on failure)
+        """
+        if not self.api_key:
+            log_error("Groq API key not configured", "chatbot_service")
+            yield "Sorry, the AI service is not configured properly."
+            return
+        
+        messages = self._build_messages(user_message, context, conversation_history)
+        log_info(f"Chatbot stream request: {user_message[:50]}...")
+        
+        stream = llm_client.stream_chat(
+            messages,
+            model=self.model,
+            temperature=0.7,
+            max_tokens=1024,
+            top_p=1
+        )
+        received = False
+        try:
+            for chunk in stream:
+                received = True
+                yield chunk
+        except LLMTimeoutError:
+            log_error("Groq API timeout", "chatbot_service")
+            yield "\n\n(The response was cut off. Please try again.)" if received else \
+                "Sorry, the request timed out. Please try again."
+        except LLMError as e:
+            log_error(f"Groq API error: {e}", "chatbot_service")
+            yield "\n\n(The response was cut off. Please try again.)" if received else \
+                "Sorry, I'm having trouble processing your request. Please try again."
+        finally:
+            stream.close()
+    
+    def _build_messages(self, user_message, context=None, conversation_history=None):
+        """Build messages array: system prompt, history, then the user message"""
+        messages = [{"role": "system", "content": self._build_system_prompt(context)}]
+        
+        # Add conversation history if provided
+        if conversation_history:
+            messages.extend(conversation_history)
+        
+        messages.append({"role": "user", "content": user_message})
+        return messages
+    
     def _build_system_prompt(self, context=None):
         """Build system prompt with context"""
         base_prompt = """You are an intelligent course assistant for CourseHub, an online learning platform. 
@@ -121,7 +141,7 @@ Course Information:
 - Tags: {', '.join(course_info.get('tags', []))}
 """
         
-        return self.get_response(user_question, context)
+        return self.get_response(user_question, context, cache=True)
     
     def get_study_tips(self, subject=None):
         """Get study tips for a subject"""
@@ -130,17 +150,17 @@ Course Information:
         else:
             message = "Give me general study tips for online learning. Keep it concise and actionable."
         
-        return self.get_response(message)
+        return self.get_response(message, cache=True)
     
     def explain_concept(self, concept, level="beginner"):
         """Explain a learning concept"""
         message = f"Explain {concept} in simple terms for a {level} level learner. Use examples if helpful."
-        return self.get_response(message)
+        return self.get_response(message, cache=True)
     
     def career_guidance(self, field):
         """Provide career guidance"""
         message = f"What career paths are available in {field}? What skills should someone learn to succeed in this field?"
-        return self.get_response(message)
+        return self.get_response(message, cache=True)
 
 # Create singleton instance
 chatbot_service = ChatbotService()
@@ -0,0 +1,287 @@
+"""
+Course Neighbors
+Item-to-item collaborative filtering: "students who took this course also
+took ...".
+
+`build` streams the enrollments collection grouped by student, counts how
+often every pair of courses shares a student (sparse, as packed int64
+pair keys reduced with np.unique), normalizes the counts to cosine
+similarity
+
+    sim(i, j) = co(i, j) / sqrt(n(i) * n(j))
+
+and stores the top-k neighbors per course in `course_neighbors`
+(one document per course, `_id` = course id).
+
+`refresh` handles enrollments created since the last run by recomputing
+the neighbor lists of the courses they touched. Lists of other courses
+whose similarity to those changed are corrected by the next full build
+(run nightly).
+
+Serving reads the enrolled courses' neighbor documents in one `_id` query
+and merges them in memory with the content-based scores of the course
+recommender.
+"""
+from datetime import datetime, timedelta
+from itertools import groupby
+
+import numpy as np
+from bson import ObjectId
+from pymongo import ReplaceOne
+from app.services.course_recommender import course_recommender
+from app.utils.logger import log_error, log_info
+
+TOP_K = 20
+MIN_SUPPORT = 2       # co-enrollments needed before two courses count as neighbors
+MAX_BASKET = 500      # cap on courses per student (pairs grow quadratically)
+FLUSH_PAIRS = 2_000_000
+ROW_REBUILD_LIMIT = 50000  # courses with more students wait for the full build
+NEIGHBOR_WEIGHT = 0.5      # weight of the neighbor score relative to content similarity
+WRITE_BATCH = 1000
+# Enrollments inserted slightly out of _id order are still picked up
+REFRESH_OVERLAP = timedelta(minutes=2)
+
+ACTIVE = {'status': {'$ne': 'dropped'}}
+JOB_ID = 'course_neighbors'
+
+
+class CourseNeighborService:
+    def __init__(self, db):
+        self.db = db
+        self.collection = db['course_neighbors']
+        self.enrollments = db['enrollments']
+        self.jobs = db['batch_jobs']
+
+    # -- batch jobs -----------------------------------------------------
+
+    def build(self, top_k=TOP_K, min_support=MIN_SUPPORT, progress=None):
+        """
+        Full rebuild from every active enrollment
+        Returns:
+            (success, summary dict or error message)
+        """
+        try:
+            started = datetime.utcnow()
+            last = self.enrollments.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+
+            codes = {}        # course_id -> dense code
+            popularity = []   # students per course code
+            pending, pending_pairs = [], 0
+            pair_keys = np.zeros(0, dtype=np.int64)
+            pair_counts = np.zeros(0, dtype=np.int64)
+            students = 0
+
+            cursor = self.enrollments.find(ACTIVE, {'student_id': 1, 'course_id': 1, '_id': 0}) \
+                .sort('student_id', 1).batch_size(10000)
+            for _, rows in groupby(cursor, key=lambda row: row['student_id']):
+                basket = set()
+                for row in rows:
+                    code = codes.setdefault(row['course_id'], len(codes))
+                    if code == len(popularity):
+                        popularity.append(0)
+                    if code not in basket:
+                        basket.add(code)
+                        popularity[code] += 1
+                students += 1
+                if len(basket) < 2:
+                    continue
+
+                items = np.array(sorted(basket)[:MAX_BASKET], dtype=np.int64)
+                first, second = np.triu_indices(len(items), 1)
+                pending.append((items[first] << 32) | items[second])
+                pending_pairs += len(first)
+                if pending_pairs >= FLUSH_PAIRS:
+                    pair_keys, pair_counts = _merge_pairs(pair_keys, pair_counts, pending)
+                    pending, pending_pairs = [], 0
+                    if progress:
+                        progress(students, len(pair_keys))
+            pair_keys, pair_counts = _merge_pairs(pair_keys, pair_counts, pending)
+
+            course_ids = [None] * len(codes)
+            for course_id, code in codes.items():
+                course_ids[code] = course_id
+            neighbors = _top_neighbors(pair_keys, pair_counts, np.array(popularity, dtype=np.float64),
+                                       top_k, min_support)
+
+            written = self._write(
+                (course_ids[code], popularity[code],
+                 [(course_ids[other], score, count) for other, score, count in neighbors.get(code, [])])
+                for code in range(len(course_ids))
+            )
+            # Courses nobody is enrolled in any more
+            self.collection.delete_many({'updated_at': {'$lt': started}})
+
+            self.jobs.update_one(
+                {'_id': JOB_ID},
+                {'$set': {'last_enrollment_id': last['_id'] if last else None, 'built_at': started,
+                          'refreshed_at': started}},
+                upsert=True
+            )
+            summary = {'students': students, 'courses': written, 'pairs': int(len(pair_keys))}
+            log_info(f"Course neighbors built: {summary}")
+            return True, summary
+        except Exception as e:
+            log_error(str(e), "course_neighbors.build")
+            return False, str(e)
+
+    def refresh(self, top_k=TOP_K, min_support=MIN_SUPPORT):
+        """
+        Recompute neighbor lists of courses with enrollments since the last run
+        Returns:
+            (success, summary dict or error message)
+        """
+        try:
+            state = self.jobs.find_one({'_id': JOB_ID}) or {}
+            last_id = state.get('last_enrollment_id')
+            query = {'_id': {'$gt': ObjectId.from_datetime(last_id.generation_time - REFRESH_OVERLAP)}} \
+                if last_id else {}
+
+            touched, high_water = set(), last_id
+            for row in self.enrollments.find(query, {'course_id': 1}):
+                touched.add(row['course_id'])
+                if high_water is None or row['_id'] > high_water:
+                    high_water = row['_id']
+
+            updated = self._write(
+                row for row in (self._rebuild_row(course_id, top_k, min_support) for course_id in touched)
+                if row is not None
+            )
+            self.jobs.update_one(
+                {'_id': JOB_ID},
+                {'$set': {'last_enrollment_id': high_water, 'refreshed_at': datetime.utcnow()}},
+                upsert=True
+            )
+            return True, {'courses_touched': len(touched), 'courses_updated': updated}
+        except Exception as e:
+            log_error(str(e), "course_neighbors.refresh")
+            return False, str(e)
+
+    def _rebuild_row(self, course_id, top_k, min_support):
+        """Exact neighbor list for one course, or None if it is too popular to do online"""
+        students = self.enrollments.distinct('student_id', {'course_id': course_id, **ACTIVE})
+        if len(students) > ROW_REBUILD_LIMIT:
+            return None
+        if not students:
+            return course_id, 0, []
+
+        co_counts = {
+            row['_id']: row['count'] for row in self.enrollments.aggregate([
+                {'$match': {'student_id': {'$in': students}, 'course_id': {'$ne': course_id}, **ACTIVE}},
+                {'$group': {'_id': '$course_id', 'count': {'$sum': 1}}},
+                {'$match': {'count': {'$gte': min_support}}}
+            ])
+        }
+        popularity = {
+            row['_id']: row['count'] for row in self.enrollments.aggregate([
+                {'$match': {'course_id': {'$in': list(co_counts)}, **ACTIVE}},
+                {'$group': {'_id': '$course_id', 'count': {'$sum': 1}}}
+            ])
+        } if co_counts else {}
+
+        scored = [
+            (other, count / np.sqrt(len(students) * popularity.get(other, count)), count)
+            for other, count in co_counts.items()
+        ]
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return course_id, len(students), scored[:top_k]
+
+    def _write(self, rows):
+        """Upsert (course_id, students, [(neighbor_id, score, count)]) rows; returns the count"""
+        now = datetime.utcnow()
+        written, batch = 0, []
+        for course_id, students, neighbors in rows:
+            batch.append(ReplaceOne({'_id': course_id}, {
+                'students': int(students),
+                'neighbors': [
+                    {'course_id': other, 'score': round(float(score), 4), 'count': int(count)}
+                    for other, score, count in neighbors
+                ],
+                'updated_at': now
+            }, upsert=True))
+            if len(batch) >= WRITE_BATCH:
+                self.collection.bulk_write(batch, ordered=False)
+                written += len(batch)
+                batch = []
+        if batch:
+            self.collection.bulk_write(batch, ordered=False)
+            written += len(batch)
+        return written
+
+    # -- serving --------------------------------------------------------
+
+    def get_neighbor_lists(self, course_ids):
+        """{course_id: [neighbor, ...]} for the given courses (one indexed read)"""
+        course_ids = list({str(c) for c in course_ids})
+        if not course_ids:
+            return {}
+        return {
+            doc['_id']: doc.get('neighbors', [])
+            for doc in self.collection.find({'_id': {'$in': course_ids}}, {'neighbors': 1})
+        }
+
+    def get_neighbor_scores(self, course_ids, neighbor_lists=None):
+        """
+        Summed neighbor similarity per candidate course
+        `neighbor_lists` may be prefetched for many students at once;
+        otherwise the enrolled courses' lists are read here.
+        """
+        if neighbor_lists is None:
+            neighbor_lists = self.get_neighbor_lists(course_ids)
+        scores = {}
+        for course_id in {str(c) for c in course_ids}:
+            for neighbor in neighbor_lists.get(course_id, []):
+                scores[neighbor['course_id']] = scores.get(neighbor['course_id'], 0.0) + neighbor['score']
+        return scores
+
+    def recommend(self, course_ids, count=5, neighbor_lists=None):
+        """
+        Course ids for a student enrolled in `course_ids`: content similarity
+        plus co-enrollment neighbors, merged in memory
+        """
+        boosts = {}
+        try:
+            neighbor_scores = self.get_neighbor_scores(course_ids, neighbor_lists)
+            if neighbor_scores:
+                scale = NEIGHBOR_WEIGHT / len(course_ids)
+                boosts = {course_id: score * scale for course_id, score in neighbor_scores.items()}
+        except Exception as e:
+            log_error(str(e), "course_neighbors.recommend")
+        return course_recommender.recommend(self.db, course_ids, count, boosts)
+
+
+def _merge_pairs(keys, counts, pending):
+    """Fold pending pair-key arrays into the running (unique keys, counts)"""
+    if not pending:
+        return keys, counts
+    new_keys, new_counts = np.unique(np.concatenate(pending), return_counts=True)
+    if not len(keys):
+        return new_keys, new_counts.astype(np.int64)
+    merged, inverse = np.unique(np.concatenate([keys, new_keys]), return_inverse=True)
+    totals = np.bincount(inverse, weights=np.concatenate([counts, new_counts])).astype(np.int64)
+    return merged, totals
+
+
+def _top_neighbors(keys, counts, popularity, top_k, min_support):
+    """{course code: [(neighbor code, cosine, co-count)]} keeping the top_k per course"""
+    keep = counts >= min_support
+    keys, counts = keys[keep], counts[keep]
+    first = (keys >> 32).astype(np.int64)
+    second = (keys & 0xFFFFFFFF).astype(np.int64)
+
+    # Each pair is a neighbor of both courses
+    rows = np.concatenate([first, second])
+    cols = np.concatenate([second, first])
+    co = np.concatenate([counts, counts])
+    sims = co / np.sqrt(popularity[rows] * popularity[cols])
+
+    order = np.lexsort((cols, -sims, rows))
+    rows, cols, co, sims = rows[order], cols[order], co[order], sims[order]
+    starts = np.searchsorted(rows, rows, side='left')
+    rank = np.arange(len(rows)) - starts
+    keep = rank < top_k
+
+    neighbors = {}
+    for row, col, score, count in zip(rows[keep].tolist(), cols[keep].tolist(), sims[keep].tolist(),
+                                      co[keep].tolist()):
+        neighbors.setdefault(row, []).append((col, score, count))
+    return neighbors
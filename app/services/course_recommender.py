@@ -0,0 +1,468 @@
+"""
+Course Recommender
+Content-based recommendations from a precomputed TF-IDF model of the
+published catalog.
+
+Every course is a sparse vector of hashed features (title/description
+words, tags, category, level), TF-IDF weighted and L2-normalized. The
+vectors are stored as CSR arrays (`indptr`, `indices`, `data`) in
+`MODEL_DIR/<version>/*.npy` and memory-mapped by every worker process, so
+a 100k-course model is shared through the page cache instead of being
+copied per process.
+
+A student's profile is the sum of their enrolled courses' rows plus a
+preference for the next level up. Scoring the whole catalog is one sparse
+matrix-vector product (`np.add.reduceat`) plus a rating prior, and the top
+courses come from `np.argpartition`.
+
+Catalog changes are applied incrementally: changed courses are
+re-vectorized into an in-memory overlay and their old rows are masked out.
+`tools/build_recommender.py` folds the overlay into new arrays
+(`--incremental`) or rebuilds everything, including IDF weights
+(default; run nightly).
+"""
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+from app.utils.logger import log_error, log_info
+
+MODEL_DIR = os.getenv('RECOMMENDER_MODEL_DIR', os.path.join('data', 'recommender'))
+FEATURE_BITS = 18
+DIMENSIONS = 1 << FEATURE_BITS
+
+FIELD_WEIGHTS = {'word': 1.0, 'title': 2.0, 'tag': 3.0, 'category': 3.0, 'level': 1.0}
+LEVELS = ['beginner', 'intermediate', 'advanced']
+NEXT_LEVEL_WEIGHT = 0.3
+RATING_WEIGHT = 0.05  # rating 5.0 adds 0.05 to a cosine score in [0, 1]
+REFRESH_INTERVAL_SECONDS = 30
+# Courses saved slightly out of updated_at order are still picked up
+REFRESH_OVERLAP = timedelta(minutes=2)
+KEEP_VERSIONS = 2
+
+PUBLISHED = {'status': 'approved', 'is_published': True}
+COURSE_FIELDS = {'title': 1, 'description': 1, 'tags': 1, 'category': 1, 'level': 1, 'rating': 1,
+                 'status': 1, 'is_published': 1, 'updated_at': 1}
+
+_TOKEN = re.compile(r'[a-z0-9][a-z0-9+#]*')
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from how in into is it of on or that the this to with you your '
+    'will learn course'.split()
+)
+
+
+def _hash(feature):
+    return zlib.crc32(feature.encode('utf-8')) & (DIMENSIONS - 1)
+
+
+def _level(course):
+    level = (course.get('level') or 'beginner').lower()
+    return level if level in LEVELS else 'beginner'
+
+
+def course_features(course):
+    """Weighted term frequencies {hashed feature: weight} for one course"""
+    counts = Counter()
+    for field, weight in (('title', FIELD_WEIGHTS['title']), ('description', FIELD_WEIGHTS['word'])):
+        for token in _TOKEN.findall((course.get(field) or '').lower()):
+            if token not in _STOPWORDS:
+                counts[f"w:{token}"] += weight
+    for tag in course.get('tags') or []:
+        counts[f"tag:{str(tag).strip().lower()}"] += FIELD_WEIGHTS['tag']
+    if course.get('category'):
+        counts[f"cat:{str(course['category']).strip().lower()}"] += FIELD_WEIGHTS['category']
+    # Every row has at least this feature, which keeps reduceat well-defined
+    counts[f"lvl:{_level(course)}"] += FIELD_WEIGHTS['level']
+
+    features = {}
+    for feature, count in counts.items():
+        index = _hash(feature)
+        features[index] = features.get(index, 0.0) + 1.0 + math.log(count)
+    return features
+
+
+def content_hash(course):
+    """Checksum of the fields the model uses (skips no-op updates such as enrollments)"""
+    material = json.dumps([course.get('title'), course.get('description'), course.get('tags'),
+                           course.get('category'), _level(course), course.get('rating')], default=str)
+    return zlib.crc32(material.encode('utf-8'))
+
+
+def _row(features, idf):
+    indices = np.fromiter(features.keys(), dtype=np.int32, count=len(features))
+    values = np.fromiter(features.values(), dtype=np.float32, count=len(features)) * idf[indices]
+    norm = np.linalg.norm(values)
+    if norm > 0:
+        values /= norm
+    order = np.argsort(indices)
+    return indices[order], values[order]
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _prior(course):
+    return RATING_WEIGHT * min(float(course.get('rating') or 0), 5.0) / 5.0
+
+
+class CourseVectorModel:
+    """CSR course vectors plus an overlay of courses changed since the arrays were built"""
+
+    def __init__(self, ids, indptr, indices, data, prior, levels, hashes, idf, built_at=None,
+                 high_water=None, version=None):
+        self.ids = list(ids)
+        self.rows = {course_id: row for row, course_id in enumerate(self.ids)}
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.prior = prior
+        self.levels = levels
+        self.hashes = hashes
+        self.idf = idf
+        self.built_at = built_at
+        self.high_water = high_water  # newest courses.updated_at reflected in the model
+        self.version = version
+        self.dead = np.zeros(len(self.ids), dtype=bool)  # base rows replaced or removed
+        self.overlay = {}  # course_id -> (indices, values, prior, level, content hash)
+        self._lock = threading.Lock()
+
+    # -- building -------------------------------------------------------
+
+    @classmethod
+    def build(cls, courses):
+        """Vectorize an iterable of published course documents"""
+        ids, features, priors, levels, hashes = [], [], [], [], []
+        df = np.zeros(DIMENSIONS, dtype=np.int32)
+        high_water = None
+        for course in courses:
+            row_features = course_features(course)
+            ids.append(str(course['_id']))
+            features.append(row_features)
+            priors.append(_prior(course))
+            levels.append(LEVELS.index(_level(course)))
+            hashes.append(content_hash(course))
+            df[np.fromiter(row_features.keys(), dtype=np.int32, count=len(row_features))] += 1
+            updated_at = course.get('updated_at')
+            if updated_at and (high_water is None or updated_at > high_water):
+                high_water = updated_at
+
+        idf = (np.log((1 + len(ids)) / (1 + df)) + 1).astype(np.float32)
+        indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        for row, row_features in enumerate(features):
+            indptr[row + 1] = indptr[row] + len(row_features)
+        indices = np.empty(indptr[-1], dtype=np.int32)
+        data = np.empty(indptr[-1], dtype=np.float32)
+        for row, row_features in enumerate(features):
+            indices[indptr[row]:indptr[row + 1]], data[indptr[row]:indptr[row + 1]] = _row(row_features, idf)
+
+        return cls(ids, indptr, indices, data, np.array(priors, dtype=np.float32),
+                   np.array(levels, dtype=np.int8), np.array(hashes, dtype=np.uint32), idf,
+                   built_at=datetime.utcnow(), high_water=high_water)
+
+    def apply(self, course):
+        """Apply a changed course (published or not); returns True if the model changed"""
+        course_id = str(course['_id'])
+        published = course.get('status') == 'approved' and course.get('is_published')
+        with self._lock:
+            updated_at = course.get('updated_at')
+            if updated_at and (self.high_water is None or updated_at > self.high_water):
+                self.high_water = updated_at
+
+            row = self.rows.get(course_id)
+            if not published:
+                changed = course_id in self.overlay or (row is not None and not self.dead[row])
+                self.overlay.pop(course_id, None)
+                if row is not None:
+                    self.dead[row] = True
+                return changed
+
+            checksum = content_hash(course)
+            if course_id in self.overlay:
+                if self.overlay[course_id][4] == checksum:
+                    return False
+            elif row is not None and not self.dead[row] and self.hashes[row] == checksum:
+                return False
+
+            indices, values = _row(course_features(course), self.idf)
+            self.overlay[course_id] = (indices, values, _prior(course), LEVELS.index(_level(course)), checksum)
+            if row is not None:
+                self.dead[row] = True
+            return True
+
+    def remove(self, course_id):
+        """Drop a deleted course"""
+        with self._lock:
+            self.overlay.pop(str(course_id), None)
+            row = self.rows.get(str(course_id))
+            if row is not None:
+                self.dead[row] = True
+
+    def compact(self):
+        """New model with the overlay folded into the arrays (IDF weights unchanged)"""
+        with self._lock:
+            keep = ~self.dead
+            lengths = np.diff(self.indptr)
+            nnz_keep = np.repeat(keep, lengths)
+            overlay = list(self.overlay.items())
+
+            ids = [course_id for course_id, alive in zip(self.ids, keep) if alive] + [c for c, _ in overlay]
+            kept_lengths = lengths[keep]
+            overlay_lengths = np.array([len(entry[0]) for _, entry in overlay], dtype=np.int64)
+            indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+            np.cumsum(np.concatenate([kept_lengths, overlay_lengths]), out=indptr[1:])
+
+            indices = np.concatenate([np.asarray(self.indices)[nnz_keep]] +
+                                     [entry[0] for _, entry in overlay]).astype(np.int32)
+            data = np.concatenate([np.asarray(self.data)[nnz_keep]] +
+                                  [entry[1] for _, entry in overlay]).astype(np.float32)
+            prior = np.concatenate([np.asarray(self.prior)[keep],
+                                    np.array([entry[2] for _, entry in overlay], dtype=np.float32)])
+            levels = np.concatenate([np.asarray(self.levels)[keep],
+                                     np.array([entry[3] for _, entry in overlay], dtype=np.int8)])
+            hashes = np.concatenate([np.asarray(self.hashes)[keep],
+                                     np.array([entry[4] for _, entry in overlay], dtype=np.uint32)])
+            return CourseVectorModel(ids, indptr, indices, data, prior, levels, hashes, np.asarray(self.idf),
+                                     built_at=self.built_at, high_water=self.high_water)
+
+    # -- persistence ----------------------------------------------------
+
+    _ARRAYS = ('indptr', 'indices', 'data', 'prior', 'levels', 'hashes', 'idf')
+
+    def save(self, root=MODEL_DIR):
+        """Write a new version directory and point CURRENT at it"""
+        version = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+        path = os.path.join(root, version)
+        os.makedirs(path, exist_ok=True)
+        for name in self._ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(getattr(self, name)))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                'ids': self.ids,
+                'built_at': self.built_at.isoformat() if self.built_at else None,
+                'high_water': self.high_water.isoformat() if self.high_water else None
+            }, f)
+
+        tmp_pointer = os.path.join(root, f"CURRENT.{os.getpid()}.tmp")
+        with open(tmp_pointer, 'w') as f:
+            f.write(version)
+        os.replace(tmp_pointer, os.path.join(root, 'CURRENT'))
+        self.version = version
+
+        # Processes still mapping an older version keep their open files
+        versions = sorted(v for v in os.listdir(root) if os.path.isdir(os.path.join(root, v)))
+        for old in versions[:-KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+        return version
+
+    @staticmethod
+    def current_version(root=MODEL_DIR):
+        try:
+            with open(os.path.join(root, 'CURRENT')) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    @classmethod
+    def load(cls, root=MODEL_DIR, mmap=True):
+        """Memory-map the current version, or None if no model has been built"""
+        version = cls.current_version(root)
+        if not version:
+            return None
+        path = os.path.join(root, version)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+                  for name in cls._ARRAYS}
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        return cls(meta['ids'], built_at=_parse_datetime(meta['built_at']),
+                   high_water=_parse_datetime(meta['high_water']), version=version, **arrays)
+
+    # -- scoring --------------------------------------------------------
+
+    def profile(self, course_ids):
+        """Dense query vector for a student enrolled in `course_ids`"""
+        query = np.zeros(DIMENSIONS, dtype=np.float32)
+        levels = []
+        with self._lock:
+            for course_id in course_ids:
+                course_id = str(course_id)
+                if course_id in self.overlay:
+                    indices, values, _, level, _ = self.overlay[course_id]
+                elif course_id in self.rows:
+                    row = self.rows[course_id]
+                    start, end = self.indptr[row], self.indptr[row + 1]
+                    indices, values, level = self.indices[start:end], self.data[start:end], self.levels[row]
+                else:
+                    continue
+                query[indices] += values
+                levels.append(int(level))
+
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query /= norm
+        if levels:
+            # Prefer courses one level above the student's average
+            next_level = min(len(LEVELS) - 1, int(sum(levels) / len(levels)) + 1)
+            lvl = _hash(f"lvl:{LEVELS[next_level]}")
+            query[lvl] += NEXT_LEVEL_WEIGHT / max(float(self.idf[lvl]), 1.0)
+        return query
+
+    def recommend(self, course_ids, count=5, boosts=None):
+        """
+        Top `count` course ids for a student enrolled in `course_ids`
+        Args:
+            boosts: Optional {course_id: score} added to the content scores
+                    (e.g. collaborative-filtering neighbors); unknown or
+                    unpublished ids are ignored
+        """
+        exclude = {str(c) for c in course_ids}
+        boosts = boosts or {}
+        query = self.profile(exclude)
+
+        with self._lock:
+            overlay = list(self.overlay.items())
+            dead = self.dead.copy()
+
+        if len(self.ids):
+            products = self.data * query[self.indices]
+            scores = np.add.reduceat(products, self.indptr[:-1]) if len(products) else np.zeros(len(self.ids))
+            scores = scores.astype(np.float32) + self.prior
+            for course_id, boost in boosts.items():
+                row = self.rows.get(course_id)
+                if row is not None:
+                    scores[row] += boost
+            scores[dead] = -np.inf
+            for course_id in exclude:
+                row = self.rows.get(course_id)
+                if row is not None:
+                    scores[row] = -np.inf
+        else:
+            scores = np.zeros(0, dtype=np.float32)
+
+        candidates = []
+        limit = min(count, len(scores))
+        if limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates = [(float(scores[row]), self.ids[row]) for row in top if np.isfinite(scores[row])]
+        for course_id, (indices, values, prior, _, _) in overlay:
+            if course_id not in exclude:
+                candidates.append((float(np.dot(values, query[indices])) + prior + boosts.get(course_id, 0.0),
+                                   course_id))
+
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        return [course_id for _, course_id in candidates[:count]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'courses': len(self.ids) - int(self.dead.sum()) + len(self.overlay),
+                'base_rows': len(self.ids),
+                'overlay_rows': len(self.overlay),
+                'masked_rows': int(self.dead.sum()),
+                'nonzeros': int(len(self.data)),
+                'built_at': self.built_at.isoformat() if self.built_at else None,
+                'high_water': self.high_water.isoformat() if self.high_water else None
+            }
+
+
+def iter_published_courses(db):
+    return db['courses'].find(PUBLISHED, COURSE_FIELDS).sort('_id', 1)
+
+
+class CourseRecommender:
+    """
+    Per-process holder of the current model
+    Loads the newest saved version (or builds one in memory in a background
+    thread if none exists; recommendations are empty until it is ready),
+    picks up versions written by the builder tool and applies course changes
+    since the model's high-water mark, at most once every `refresh_interval`
+    seconds.
+    """
+
+    def __init__(self, root=MODEL_DIR, refresh_interval=REFRESH_INTERVAL_SECONDS):
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self.model = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._building = False
+
+    def get_model(self, db):
+        if self.model is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            with self._lock:
+                if self.model is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+                    self._refresh(db)
+        return self.model
+
+    def _refresh(self, db):
+        try:
+            version = CourseVectorModel.current_version(self.root)
+            if self.model is None or (version and version != self.model.version):
+                model = CourseVectorModel.load(self.root)
+                if model is None:
+                    if self.model is None:
+                        self._build_in_background(db)
+                        return
+                else:
+                    self.model = model
+            apply_catalog_changes(db, self.model)
+        except Exception as e:
+            log_error(e, "course_recommender.refresh")
+        self._refreshed_at = time.monotonic()
+
+    def _build_in_background(self, db):
+        """Build a model from the catalog without holding up requests (called with _lock held)"""
+        if self._building:
+            return
+        self._building = True
+        log_error(f"No saved course recommender model in {self.root}; building one in memory. "
+                  f"Run tools/build_recommender.py to persist it", "course_recommender.refresh")
+
+        def build():
+            try:
+                start = time.perf_counter()
+                model = CourseVectorModel.build(iter_published_courses(db))
+                with self._lock:
+                    if self.model is None:
+                        self.model = model
+                log_info(f"Course recommender built in memory ({len(model.ids)} courses) "
+                         f"in {time.perf_counter() - start:.1f}s")
+            except Exception as e:
+                log_error(e, "course_recommender.build")
+            finally:
+                with self._lock:
+                    self._building = False
+
+        threading.Thread(target=build, name='course-recommender-build', daemon=True).start()
+
+    def recommend(self, db, course_ids, count=5, boosts=None):
+        """Recommended course ids (may include deleted courses; callers fetch and filter)"""
+        model = self.get_model(db)
+        if model is None:
+            return []
+        return model.recommend(course_ids, count, boosts)
+
+    def stats(self):
+        return self.model.stats() if self.model else None
+
+
+def apply_catalog_changes(db, model):
+    """Apply courses updated since the model's high-water mark; returns the number changed"""
+    query = {'updated_at': {'$gte': model.high_water - REFRESH_OVERLAP}} if model.high_water else {}
+    changed = 0
+    for course in db['courses'].find(query, COURSE_FIELDS):
+        changed += model.apply(course)
+    return changed
+
+
+# Create singleton instance (one model mapping per worker process)
+course_recommender = CourseRecommender()
@@ -50,6 +50,16 @@ class CourseService:
             log_error(str(e), "course_service.get_course")
             return None
     
+    def get_courses(self, course_ids, published_only=False):
+        """Get several courses in the given order (missing ones are skipped)"""
+        try:
+            filters = {'status': 'approved', 'is_published': True} if published_only else None
+            courses = self.course_model.find_by_ids(course_ids, filters=filters)
+            return [courses[str(course_id)] for course_id in course_ids if str(course_id) in courses]
+        except Exception as e:
+            log_error(str(e), "course_service.get_courses")
+            return []
+    
     def get_all_published_courses(self, page=1, per_page=12):
         """Get all published courses with pagination"""
         try:
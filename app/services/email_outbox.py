@@ -0,0 +1,429 @@
+"""
+Email Outbox
+Transactional email that never blocks a request.
+
+Callers write a message to `email_outbox` in the same operation as the
+record it belongs to (e.g. the certificate). An EmailDispatcher claims
+queued messages in batches, sends them over pooled SMTP connections under
+a rate limit, and records the outcome on the outbox row. Temporary
+failures (connection problems, 4xx replies) are retried with exponential
+backoff; permanent ones (5xx replies) fail immediately.
+
+Message content is rendered when the message is queued; attachments are
+resolved at send time (certificate PDFs come from the certificate store).
+"""
+import os
+import queue
+import smtplib
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import make_msgid
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from app.utils.logger import log_error, log_info
+
+MAX_ATTEMPTS = 6
+LEASE_SECONDS = 120
+RETRY_BASE_SECONDS = 30
+
+_indexed_databases = set()
+
+
+class EmailOutbox:
+    def __init__(self, db):
+        self.db = db
+        self.collection = db['email_outbox']
+        self._create_indexes()
+
+    def _create_indexes(self):
+        key = (id(self.db.client), self.db.name)
+        if key in _indexed_databases:
+            return
+        # One message per event, so re-running an operation does not email twice
+        self.collection.create_index([('dedupe_key', 1)], unique=True)
+        self.collection.create_index([('status', 1), ('run_after', 1)])
+        self.collection.create_index([('ref_id', 1)])
+        _indexed_databases.add(key)
+
+    @staticmethod
+    def build(to, subject, text, html=None, kind='generic', ref_id=None, dedupe_key=None, attachments=None):
+        """Outbox document for a message (not yet written)"""
+        now = datetime.now()
+        return {
+            'kind': kind,
+            'ref_id': ref_id,
+            'dedupe_key': dedupe_key or f"{kind}:{uuid.uuid4().hex}",
+            'to': to,
+            'subject': subject,
+            'text': text,
+            'html': html,
+            'attachments': attachments or [],
+            'status': 'queued',
+            'attempts': 0,
+            'run_after': now,
+            'last_error': None,
+            'created_at': now,
+            'updated_at': now,
+            'sent_at': None
+        }
+
+    def enqueue(self, message, session=None):
+        """
+        Queue a message built with build()
+        Returns: True if queued, False if a message with the same dedupe_key exists
+        Raises:
+            DuplicateKeyError for a duplicate inside a session (the server has
+            aborted the transaction, so the caller's callback must fail)
+        """
+        try:
+            self.collection.insert_one(message, session=session)
+            return True
+        except DuplicateKeyError:
+            if session is not None:
+                raise
+            return False
+
+    def enqueue_many(self, messages):
+        """Queue many messages; duplicates (by dedupe_key) are skipped"""
+        if not messages:
+            return 0
+        try:
+            return len(self.collection.insert_many(messages, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            return e.details.get('nInserted', 0)
+
+    def claim(self, worker_id, limit):
+        """
+        Lease up to `limit` due messages with three queries (find ids,
+        update_many, read back) instead of one round trip per message
+        """
+        now = datetime.now()
+        due = {'$or': [
+            {'status': 'queued', 'run_after': {'$lte': now}},
+            {'status': 'sending', 'locked_until': {'$lt': now}}
+        ]}
+        ids = [doc['_id'] for doc in self.collection.find(due, {'_id': 1}).sort('run_after', 1).limit(limit)]
+        if not ids:
+            return []
+
+        lease = uuid.uuid4().hex
+        self.collection.update_many(
+            {'$and': [{'_id': {'$in': ids}}, due]},
+            {
+                '$set': {
+                    'status': 'sending',
+                    'locked_by': worker_id,
+                    'lease': lease,
+                    'locked_until': now + timedelta(seconds=LEASE_SECONDS),
+                    'updated_at': now
+                },
+                '$inc': {'attempts': 1}
+            }
+        )
+        return list(self.collection.find({'lease': lease}))
+
+    def record_results(self, results):
+        """
+        Record a batch of send outcomes with one bulk_write
+        Args:
+            results: list of (message, error or None, permanent bool)
+        """
+        now = datetime.now()
+        requests = []
+        for message, error, permanent in results:
+            if error is None:
+                changes = {'status': 'sent', 'sent_at': now, 'last_error': None}
+            elif permanent or message.get('attempts', 1) >= MAX_ATTEMPTS:
+                changes = {'status': 'failed', 'last_error': str(error)}
+            else:
+                delay = RETRY_BASE_SECONDS * 2 ** (message.get('attempts', 1) - 1)
+                changes = {'status': 'queued', 'last_error': str(error), 'run_after': now + timedelta(seconds=delay)}
+            changes['updated_at'] = now
+            requests.append(UpdateOne(
+                {'_id': message['_id'], 'lease': message.get('lease')},
+                {'$set': changes, '$unset': {'lease': '', 'locked_by': '', 'locked_until': ''}}
+            ))
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+
+    def requeue_failed(self):
+        now = datetime.now()
+        return self.collection.update_many(
+            {'status': 'failed'},
+            {'$set': {'status': 'queued', 'attempts': 0, 'run_after': now, 'updated_at': now}}
+        ).modified_count
+
+    def get_status(self, ref_id):
+        """Delivery status of the newest message about a record"""
+        message = self.collection.find_one({'ref_id': ref_id}, sort=[('created_at', -1)])
+        if not message:
+            return None
+        return {
+            'status': message['status'],
+            'attempts': message.get('attempts', 0),
+            'last_error': message.get('last_error'),
+            'sent_at': message['sent_at'].isoformat() if message.get('sent_at') else None
+        }
+
+
+class RateLimiter:
+    """Token bucket shared by the dispatcher's sender threads"""
+    def __init__(self, rate_per_second, burst=None):
+        self.rate = float(rate_per_second)
+        self.capacity = float(burst or max(1, rate_per_second))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` logged-in SMTP connections for reuse
+    Connections are recycled after `max_messages` sends and checked with
+    NOOP when they have been idle for a while.
+    """
+    def __init__(self, host, port, username=None, password=None, use_tls=False, use_ssl=False,
+                 size=4, timeout=30, max_messages=100, idle_check_seconds=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self.idle_check_seconds = idle_check_seconds
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.connections_opened = 0
+
+    def _connect(self):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        connection = smtp_class(self.host, self.port, timeout=self.timeout)
+        if self.use_tls and not self.use_ssl:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password)
+        self.connections_opened += 1
+        return {'smtp': connection, 'sent': 0, 'last_used': time.monotonic()}
+
+    def acquire(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - conn['last_used'] < self.idle_check_seconds:
+                return conn
+            try:
+                if conn['smtp'].noop()[0] == 250:
+                    return conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(conn)
+
+    def release(self, conn, broken=False):
+        conn['last_used'] = time.monotonic()
+        if broken or conn['sent'] >= self.max_messages:
+            self._close(conn)
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn['smtp'].quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                conn['smtp'].close()
+            except OSError:
+                pass
+
+    def close_all(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _is_permanent(error):
+    """5xx replies will not succeed on retry; connection trouble and 4xx may"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(code >= 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    if isinstance(error, ValueError):
+        # Malformed message or address
+        return True
+    return False
+
+
+class EmailDispatcher:
+    """
+    Sends queued outbox messages
+    Each batch is split across `connections` sender threads; every thread
+    sends its share over one pooled SMTP connection.
+    """
+    def __init__(self, db, host=None, port=None, username=None, password=None, use_tls=None,
+                 sender=None, connections=None, batch_size=None, rate_per_second=None, poll_interval=2.0):
+        self.db = db
+        self.outbox = EmailOutbox(db)
+        self.sender = sender or os.getenv('MAIL_FROM', 'no-reply@localhost')
+        self.connections = connections or int(os.getenv('SMTP_POOL_SIZE', '4'))
+        self.batch_size = batch_size or self.connections * 25
+        self.poll_interval = poll_interval
+        self.pool = SMTPConnectionPool(
+            host or os.getenv('SMTP_HOST', 'localhost'),
+            int(port or os.getenv('SMTP_PORT', '25')),
+            username if username is not None else os.getenv('SMTP_USERNAME'),
+            password if password is not None else os.getenv('SMTP_PASSWORD'),
+            use_tls=use_tls if use_tls is not None else os.getenv('SMTP_USE_TLS', '0') == '1',
+            use_ssl=os.getenv('SMTP_USE_SSL', '0') == '1',
+            size=self.connections
+        )
+        self.rate_limiter = RateLimiter(
+            rate_per_second if rate_per_second is not None else float(os.getenv('EMAIL_RATE_PER_SECOND', '10'))
+        )
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix='email-sender')
+        self._stop = threading.Event()
+        self.sent = 0
+        self.failed = 0
+
+    def _build_message(self, message, certificates):
+        email = EmailMessage()
+        email['From'] = self.sender
+        email['To'] = message['to']
+        email['Subject'] = message['subject']
+        email['Message-ID'] = make_msgid()
+        email.set_content(message['text'])
+        if message.get('html'):
+            email.add_alternative(message['html'], subtype='html')
+
+        for attachment in message.get('attachments', []):
+            if attachment.get('kind') == 'certificate_pdf':
+                from app.services.certificate_store import certificate_store
+                cert = certificates.get(attachment['ref_id'])
+                path = certificate_store.get_or_render(cert) if cert else None
+                if not path:
+                    raise FileNotFoundError(f"Certificate PDF unavailable for {attachment['ref_id']}")
+                with open(path, 'rb') as f:
+                    email.add_attachment(f.read(), maintype='application', subtype='pdf',
+                                         filename=attachment.get('filename', 'certificate.pdf'))
+        return email
+
+    def _send_chunk(self, messages, certificates):
+        """Send messages over one pooled connection; returns (message, error, permanent) tuples"""
+        results = []
+        conn = None
+        for message in messages:
+            try:
+                email = self._build_message(message, certificates)
+            except Exception as e:
+                results.append((message, e, _is_permanent(e)))
+                continue
+            self.rate_limiter.acquire()
+            try:
+                if conn is None:
+                    conn = self.pool.acquire()
+                conn['smtp'].send_message(email)
+                conn['sent'] += 1
+                results.append((message, None, False))
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                # The server answered (and smtplib reset the transaction): the connection is still usable
+                results.append((message, e, _is_permanent(e)))
+            except (smtplib.SMTPException, OSError) as e:
+                results.append((message, e, _is_permanent(e)))
+                if conn is not None:
+                    self.pool.release(conn, broken=True)
+                    conn = None
+        if conn is not None:
+            self.pool.release(conn)
+        return results
+
+    def run_once(self):
+        """Claim and send one batch; returns the number of messages processed"""
+        messages = self.outbox.claim(self.worker_id, self.batch_size)
+        if not messages:
+            return 0
+
+        certificate_ids = [
+            attachment['ref_id'] for message in messages for attachment in message.get('attachments', [])
+            if attachment.get('kind') == 'certificate_pdf'
+        ]
+        certificates = {
+            cert['_id']: cert for cert in self.db['certificates'].find({'_id': {'$in': certificate_ids}})
+        } if certificate_ids else {}
+
+        chunks = [messages[i::self.connections] for i in range(self.connections)]
+        futures = [self._executor.submit(self._send_chunk, chunk, certificates) for chunk in chunks if chunk]
+        results = [result for future in futures for result in future.result()]
+
+        self.outbox.record_results(results)
+        self._mirror_certificate_status(results)
+
+        for message, error, permanent in results:
+            if error is None:
+                self.sent += 1
+            else:
+                self.failed += 1
+                log_error(f"Email to {message['to']} failed (attempt {message.get('attempts')}): {error}",
+                          "email_outbox.run_once")
+        return len(messages)
+
+    def _mirror_certificate_status(self, results):
+        now = datetime.now()
+        sent = [message['ref_id'] for message, error, _ in results if error is None and message.get('kind') == 'certificate']
+        if sent:
+            self.db['certificates'].update_many(
+                {'_id': {'$in': sent}},
+                {'$set': {'email_sent': True, 'email_sent_at': now}}
+            )
+
+    def run_forever(self):
+        log_info(f"Email dispatcher {self.worker_id} started ({self.connections} connections)")
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                log_error(str(e), "email_outbox.run_forever")
+                processed = 0
+            if not processed:
+                self._stop.wait(self.poll_interval)
+        self.shutdown()
+
+    def start(self):
+        """Run the dispatcher loop in a daemon thread"""
+        thread = threading.Thread(target=self.run_forever, name='email-dispatcher', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        self.pool.close_all()
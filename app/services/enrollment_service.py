@@ -2,50 +2,75 @@
 Enrollment Service
 Business logic for course enrollments
 """
+from pymongo.errors import DuplicateKeyError
 from app.models.enrollment_model import Enrollment
 from app.models.course_model import Course
 from app.models.user_model import User
 from app.models.payment_model import Payment
+from app.services.student_recommendations import StudentRecommendationService
+from app.utils.validators import validate_email
+from app.utils.transactions import run_in_transaction
 from app.utils.logger import log_error, log_info
 
+BULK_ENROLL_BATCH_SIZE = 500
+
 class EnrollmentService:
     def __init__(self, db):
+        self.client = db.client
         self.enrollment_model = Enrollment(db)
         self.course_model = Course(db)
         self.user_model = User(db)
         self.payment_model = Payment(db)
+        self.recommendations = StudentRecommendationService(db)
     
     def enroll_student(self, student_id, course_id, payment_id=None):
-        """Enroll student in a course"""
+        """
+        Enroll student in a course
+        Duplicate enrollments are rejected by the unique (student_id, course_id)
+        index instead of a pre-check. The enrollment insert and the course/user
+        updates run in one transaction on replica sets; on standalone servers
+        the insert is undone if the follow-up writes fail.
+        """
         try:
             # Check if course exists
-            course = self.course_model.find_by_id(course_id)
+            course = self.course_model.find_by_id(course_id, {"is_published": 1, "price": 1})
             if not course:
                 return False, "Course not found"
             
             if not course.get('is_published'):
                 return False, "Course is not published"
             
-            # Check if already enrolled
-            if self.enrollment_model.is_enrolled(student_id, course_id):
-                return False, "Already enrolled in this course"
-            
             # Check if payment required
-            if course['price'] > 0 and not payment_id:
+            if course.get('price', 0) > 0 and not payment_id:
                 return False, "Payment required for this course"
             
-            # Create enrollment
-            enrollment_id = self.enrollment_model.enroll(student_id, course_id, payment_id)
-            
-            if not enrollment_id:
-                return False, "Enrollment failed"
+            def write_enrollment(session):
+                enrollment_id = self.enrollment_model.enroll(student_id, course_id, payment_id, session=session)
+                if not enrollment_id:
+                    return None
+                
+                try:
+                    if not self.course_model.enroll_student(course_id, student_id, session=session):
+                        raise RuntimeError(f"Failed to update course {course_id} enrollment count")
+                    self.user_model.add_enrolled_course(student_id, course_id, session=session)
+                except Exception:
+                    if session is None:
+                        # No transaction to abort - remove the orphaned enrollment
+                        self.enrollment_model.delete(enrollment_id)
+                    raise
+                
+                return enrollment_id
             
-            # Update course enrollment count
-            self.course_model.enroll_student(course_id, student_id)
+            try:
+                enrollment_id = run_in_transaction(self.client, write_enrollment)
+            except DuplicateKeyError:
+                # Raised out of the transaction so it is aborted, not retried
+                enrollment_id = None
             
-            # Update user's enrolled courses
-            self.user_model.add_enrolled_course(student_id, course_id)
+            if not enrollment_id:
+                return False, "Already enrolled in this course"
             
+            self.recommendations.invalidate([student_id])
             log_info(f"Student {student_id} enrolled in course {course_id}")
             return True, "Enrollment successful"
         
@@ -53,21 +78,118 @@ class EnrollmentService:
             log_error(str(e), "enrollment_service.enroll_student")
             return False, "Enrollment failed"
     
+    def bulk_enroll(self, course_id, emails, batch_size=BULK_ENROLL_BATCH_SIZE):
+        """
+        Enroll a cohort of students by email
+        Emails are consumed lazily in batches; each batch costs one user lookup,
+        one existing-enrollment lookup, one unordered bulk insert, one course
+        counter update and one user update.
+        Args:
+            course_id: Course ID
+            emails: Iterable of email strings (may be a stream)
+            batch_size: Number of rows resolved per round trip
+        Yields:
+            Per-row result dictionaries {row, email, status[, student_id]}
+        """
+        course = self.course_model.find_by_id(course_id)
+        if not course:
+            yield {'row': 0, 'email': None, 'status': 'error', 'error': 'Course not found'}
+            return
+        
+        seen = set()
+        batch = []
+        row = 0
+        
+        for email in emails:
+            row += 1
+            email = (email or '').strip().lower()
+            
+            is_valid, _ = validate_email(email)
+            if not is_valid:
+                yield {'row': row, 'email': email, 'status': 'invalid_email'}
+                continue
+            
+            if email in seen:
+                yield {'row': row, 'email': email, 'status': 'duplicate'}
+                continue
+            seen.add(email)
+            
+            batch.append((row, email))
+            if len(batch) >= batch_size:
+                yield from self._bulk_enroll_batch(course_id, batch)
+                batch = []
+        
+        if batch:
+            yield from self._bulk_enroll_batch(course_id, batch)
+    
+    def _bulk_enroll_batch(self, course_id, batch):
+        """Resolve, dedupe and insert one batch of (row, email) pairs"""
+        try:
+            users = self.user_model.find_by_emails([email for _, email in batch])
+            
+            candidates = []
+            results = {}
+            for row, email in batch:
+                user = users.get(email)
+                if not user:
+                    results[row] = {'row': row, 'email': email, 'status': 'not_found'}
+                elif user.get('role') != 'student' or not user.get('is_active', True):
+                    results[row] = {'row': row, 'email': email, 'status': 'not_student'}
+                else:
+                    candidates.append((row, email, user['_id']))
+            
+            already = self.enrollment_model.get_enrolled_student_ids(
+                course_id, [student_id for _, _, student_id in candidates]
+            )
+            to_insert = [c for c in candidates if c[2] not in already]
+            
+            enrolled, failed = self.enrollment_model.bulk_enroll(
+                [student_id for _, _, student_id in to_insert], course_id
+            )
+            
+            if enrolled:
+                self.course_model.enroll_students(course_id, enrolled)
+                self.user_model.add_enrolled_course_many(enrolled, course_id)
+                self.recommendations.invalidate(enrolled)
+                log_info(f"Bulk enrolled {len(enrolled)} students in course {course_id}")
+            
+            for row, email, student_id in candidates:
+                if student_id in already:
+                    status = 'already_enrolled'
+                else:
+                    status = failed.get(student_id, 'enrolled')
+                results[row] = {'row': row, 'email': email, 'status': status, 'student_id': student_id}
+        
+        except Exception as e:
+            log_error(str(e), "enrollment_service.bulk_enroll")
+            results = {row: {'row': row, 'email': email, 'status': 'failed'} for row, email in batch}
+        
+        for row, _ in batch:
+            yield results[row]
+    
     def get_student_enrollments(self, student_id, status=None):
         """Get all enrollments for a student"""
         try:
             enrollments = self.enrollment_model.get_student_enrollments(student_id, status)
             
-            # Enrich with course details
+            # Enrich with course details (one $in query for all courses)
+            courses = self.course_model.find_by_ids([e['course_id'] for e in enrollments])
             for enrollment in enrollments:
-                course = self.course_model.find_by_id(enrollment['course_id'])
-                enrollment['course'] = course
+                enrollment['course'] = courses.get(str(enrollment['course_id']))
             
             return enrollments
         except Exception as e:
             log_error(str(e), "enrollment_service.get_student_enrollments")
             return []
     
+    def get_student_course_ids(self, student_id, status=None):
+        """Get the ids of the courses a student is enrolled in"""
+        try:
+            return self.enrollment_model.get_student_course_ids(student_id, status)
+        except Exception as e:
+            log_error(str(e), "enrollment_service.get_student_course_ids")
+            return []
+    
     def get_course_students(self, course_id):
         """Get all students enrolled in a course"""
         try:
@@ -125,6 +247,7 @@ class EnrollmentService:
             success = self.enrollment_model.drop_course(student_id, course_id)
             
             if success:
+                self.recommendations.invalidate([student_id])
                 log_info(f"Student {student_id} dropped course {course_id}")
                 return True, "Course dropped successfully"
             else:
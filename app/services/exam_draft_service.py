@@ -0,0 +1,246 @@
+"""
+Exam Draft Service
+Autosaves in-progress exam answers so a refresh or crash does not lose them.
+
+Clients send small per-question deltas ({"3": 1}) while the student works.
+Deltas are coalesced in an in-process buffer (latest answer per question
+wins) and a background thread persists them to `exam_drafts` with one
+unordered bulk_write per flush interval, so thousands of examinees cost a
+few writes per second instead of one per click. Drafts carry an
+`expires_at` TTL so abandoned attempts are cleaned up by MongoDB.
+
+Acknowledged deltas that have not been flushed yet live only in this
+process; that window is bounded by `flush_interval`. Submission flushes the
+attempt's own entry first, and clients send their full answer set with it,
+so deltas buffered in another process are not lost.
+"""
+import atexit
+import threading
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.utils.logger import log_error
+
+DRAFT_TTL_HOURS = 24
+MAX_DELTAS_PER_REQUEST = 200
+
+_indexed_databases = set()
+
+
+class DraftBuffer:
+    def __init__(self, flush_interval=1.0, max_pending=5000, ttl_hours=DRAFT_TTL_HOURS):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.ttl = timedelta(hours=ttl_hours)
+        # (exam_id, student_id) -> {question index: (seq, answer)}
+        self._pending = {}
+        self._inflight = {}  # batch being written by flush(), still visible to get()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._collection = None
+        self._thread = None
+        self._stats = {'deltas': 0, 'flushes': 0, 'documents_written': 0, 'errors': 0}
+
+    def attach(self, collection):
+        """Bind the drafts collection and start the flusher on first use"""
+        with self._lock:
+            self._collection = collection
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='exam-draft-flusher', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def add(self, exam_id, student_id, answers, seq=0):
+        """
+        Buffer answer deltas for one attempt
+        A delta older (lower seq) than one already buffered for the same
+        question is ignored, so out-of-order requests cannot roll back an answer.
+        """
+        with self._lock:
+            entry = self._pending.setdefault((exam_id, student_id), {})
+            for question, answer in answers.items():
+                current = entry.get(question)
+                if current is None or seq >= current[0]:
+                    entry[question] = (seq, answer)
+            self._stats['deltas'] += len(answers)
+            backlog = len(self._pending)
+        if backlog >= self.max_pending:
+            self._wake.set()
+
+    def get(self, exam_id, student_id):
+        """Buffered (not yet persisted) answers for one attempt"""
+        key = (exam_id, student_id)
+        with self._lock:
+            entry = dict(self._inflight.get(key, {}))
+            for question, (seq, value) in self._pending.get(key, {}).items():
+                if question not in entry or seq >= entry[question][0]:
+                    entry[question] = (seq, value)
+            return {question: value for question, (_, value) in entry.items()}
+
+    def discard(self, exam_id, student_id):
+        """Drop buffered deltas, waiting out a flush that may be writing them"""
+        with self._flush_lock, self._lock:
+            self._pending.pop((exam_id, student_id), None)
+
+    def flush(self):
+        """Persist every buffered attempt with one bulk_write"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            return self._write(batch)
+
+    def flush_attempt(self, exam_id, student_id):
+        """Persist one attempt's buffered deltas now (waits out a flush in progress)"""
+        key = (exam_id, student_id)
+        with self._flush_lock:
+            with self._lock:
+                entry = self._pending.pop(key, None)
+                if entry is None:
+                    return 0
+                batch = self._inflight = {key: entry}
+            return self._write(batch)
+
+    def _write(self, batch):
+        """Write a swapped-out batch; called with _flush_lock held"""
+        with self._lock:
+            collection = self._collection
+        if not batch or collection is None:
+            self._requeue(batch)
+            return 0
+
+        now = datetime.now()
+        keys = list(batch)
+        requests = []
+        for exam_id, student_id in keys:
+            entry = batch[(exam_id, student_id)]
+            changes = {f'answers.{q}': value for q, (_, value) in entry.items()}
+            changes['updated_at'] = now
+            changes['expires_at'] = now + self.ttl
+            requests.append(UpdateOne(
+                {'exam_id': ObjectId(exam_id), 'student_id': ObjectId(student_id)},
+                {
+                    '$set': changes,
+                    '$max': {'seq': max(seq for seq, _ in entry.values())},
+                    '$setOnInsert': {'created_at': now}
+                },
+                upsert=True
+            ))
+
+        failed = []
+        try:
+            collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            # Typically two processes upserting the same new draft; retry next round
+            failed = [keys[err['index']] for err in e.details.get('writeErrors', [])]
+            log_error(f"{len(failed)} draft writes failed: {e}", "exam_draft_service.flush")
+        except Exception as e:
+            failed = keys
+            log_error(str(e), "exam_draft_service.flush")
+
+        self._requeue({key: batch[key] for key in failed})
+        with self._lock:
+            self._stats['flushes'] += 1
+            self._stats['documents_written'] += len(keys) - len(failed)
+            self._stats['errors'] += len(failed)
+        return len(keys) - len(failed)
+
+    def _requeue(self, entries):
+        """Put unwritten entries back without overwriting newer deltas; ends the in-flight batch"""
+        with self._lock:
+            self._inflight = {}
+            for key, entry in entries.items():
+                current = self._pending.setdefault(key, {})
+                for question, (seq, value) in entry.items():
+                    if question not in current or seq > current[question][0]:
+                        current[question] = (seq, value)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending))
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log_error(str(e), "exam_draft_service.flusher")
+
+
+exam_draft_buffer = DraftBuffer()
+
+
+class ExamDraftService:
+    def __init__(self, db):
+        self.db = db
+        self.draft_collection = db['exam_drafts']
+        self.buffer = exam_draft_buffer
+        self._create_indexes()
+        self.buffer.attach(self.draft_collection)
+
+    def _create_indexes(self):
+        # Services are built per request; only the first one per process creates indexes
+        key = (id(self.db.client), self.db.name)
+        if key in _indexed_databases:
+            return
+        self.draft_collection.create_index([('exam_id', 1), ('student_id', 1)], unique=True)
+        self.draft_collection.create_index([('expires_at', 1)], expireAfterSeconds=0)
+        _indexed_databases.add(key)
+
+    def save_answers(self, exam_id, student_id, answers, seq=0, question_count=None):
+        """
+        Buffer answer deltas for an attempt
+        Args:
+            answers: {"<question index>": answer}
+            seq: Client sequence number (higher wins per question)
+            question_count: Reject indexes outside the paper when given
+        Returns:
+            Tuple (success, number of answers saved or error message)
+        """
+        if not isinstance(answers, dict) or not answers:
+            return False, 'No answers to save'
+        if len(answers) > MAX_DELTAS_PER_REQUEST:
+            return False, f'Cannot save more than {MAX_DELTAS_PER_REQUEST} answers at once'
+        for question in answers:
+            if not str(question).isdigit():
+                return False, f'Invalid question index: {question}'
+            if question_count is not None and int(question) >= question_count:
+                return False, f'Invalid question index: {question}'
+
+        try:
+            seq = int(seq or 0)
+        except (TypeError, ValueError):
+            return False, 'Invalid sequence number'
+
+        self.buffer.add(str(exam_id), str(student_id), {str(q): a for q, a in answers.items()}, seq)
+        return True, len(answers)
+
+    def flush_draft(self, exam_id, student_id):
+        """Persist an attempt's buffered deltas before it is finalized"""
+        try:
+            self.buffer.flush_attempt(str(exam_id), str(student_id))
+        except Exception as e:
+            log_error(str(e), "exam_draft_service.flush_draft")
+
+    def get_draft(self, exam_id, student_id):
+        """Saved answers for an attempt (persisted draft merged with buffered deltas)"""
+        try:
+            draft = self.draft_collection.find_one(
+                {'exam_id': ObjectId(exam_id), 'student_id': ObjectId(student_id)},
+                {'answers': 1}
+            )
+            answers = dict(draft.get('answers', {})) if draft else {}
+            answers.update(self.buffer.get(str(exam_id), str(student_id)))
+            return answers
+        except Exception as e:
+            log_error(str(e), "exam_draft_service.get_draft")
+            return {}
+
+    def discard(self, exam_id, student_id):
+        """Drop an attempt's draft once the exam has been submitted"""
+        self.buffer.discard(str(exam_id), str(student_id))
+        self.draft_collection.delete_one({'exam_id': ObjectId(exam_id), 'student_id': ObjectId(student_id)})
@@ -4,7 +4,20 @@ Handles exam creation, scheduling, taking, and grading
 """
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
+import json
 import random
+from app.services.exam_draft_service import ExamDraftService
+from app.services.exam_snapshot_cache import exam_snapshot_cache, serialize_exam
+from app.services.grading_service import GradingService
+from app.services.item_analysis_service import ItemAnalysisService
+from app.services.question_bank_service import QuestionBankService
+from app.utils.pagination import paginate
+from app.utils.validators import validate_exam_question
+
+SUBMISSION_SORT_FIELDS = {'submitted_at': 'submitted_at', 'score': 'marks_obtained'}
+
+_indexed_databases = set()
 
 class ExamService:
     def __init__(self, db):
@@ -12,32 +25,57 @@ class ExamService:
         self.exam_collection = db['exams']
         self.submission_collection = db['exam_submissions']
         self.course_collection = db['courses']
+        self.snapshot_cache = exam_snapshot_cache
+        self.grading_service = GradingService(db)
+        self.item_analysis_service = ItemAnalysisService(db)
+        self.question_bank_service = QuestionBankService(db)
+        self.draft_service = ExamDraftService(db)
+        self._create_indexes()
+    
+    def _create_indexes(self):
+        # Services are built per request; only the first one per process creates indexes
+        key = (id(self.db.client), self.db.name)
+        if key in _indexed_databases:
+            return
+        # Serves per-course listings sorted by newest first
+        self.exam_collection.create_index([('course_id', 1), ('created_at', -1)])
+        # Keyset pagination of an exam's submissions by date or score
+        self.submission_collection.create_index([('exam_id', 1), ('submitted_at', -1), ('_id', -1)])
+        self.submission_collection.create_index([('exam_id', 1), ('marks_obtained', -1), ('_id', -1)])
+        _indexed_databases.add(key)
         
     def create_exam(self, course_id, instructor_id, exam_data):
         """Create a new exam with flexible questions"""
         try:
-            # Validate questions
-            questions = exam_data.get('questions', [])
-            if len(questions) < 1:
-                return False, 'Exam must have at least 1 question'
-            
-            if len(questions) > 50:
-                return False, 'Exam cannot have more than 50 questions'
-            
-            total_marks = 0
-            for i, q in enumerate(questions):
-                marks = q.get('marks', 1)
-                if marks < 1 or marks > 100:
-                    return False, f'Question {i+1}: Marks must be between 1 and 100'
-                total_marks += marks
-                
-                # Validate question structure
-                if not q.get('question'):
-                    return False, f'Question {i+1}: Question text is required'
-                if not q.get('options') or len(q.get('options')) < 2:
-                    return False, f'Question {i+1}: At least 2 options are required'
-                if q.get('correct_answer') is None:
-                    return False, f'Question {i+1}: Correct answer must be specified'
+            bank_fields = {}
+            if exam_data.get('sampling_rules'):
+                # Question-bank exam: each student draws a variant from the pool
+                valid, result = self.question_bank_service.resolve_sampling_rules(
+                    instructor_id, exam_data['sampling_rules']
+                )
+                if not valid:
+                    return False, result
+                pool, rules = result
+                questions = []
+                # Nominal total (average marks per draw); each variant's exact total is set at grading
+                total_marks = round(sum(
+                    rule['count'] * sum(pool[i].get('marks', 1) for i in rule['pool']) / len(rule['pool'])
+                    for rule in rules
+                ), 2)
+                bank_fields = {
+                    'question_pool': pool,
+                    'sampling_rules': rules,
+                    'questions_per_variant': sum(rule['count'] for rule in rules),
+                    'variant_seed': random.getrandbits(63),
+                    'shuffle_questions': bool(exam_data.get('shuffle_questions', True))
+                }
+            else:
+                # Validate questions
+                questions = exam_data.get('questions', [])
+                valid, result = self._validate_questions(questions)
+                if not valid:
+                    return False, result
+                total_marks = result
             
             # Calculate passing marks from percentage
             passing_score_percent = exam_data.get('passing_score', 70)
@@ -59,37 +97,153 @@ class ExamService:
                 'duration_minutes': exam_data.get('duration', exam_data.get('duration_minutes', 60)),
                 'status': 'active',
                 'is_published': True,
+                'version': 1,
                 'created_at': datetime.now(),
                 'updated_at': datetime.now()
             }
+            exam_doc.update(bank_fields)
             
             # Add date fields if provided
             if exam_date:
-                if isinstance(exam_date, str):
-                    # Handle datetime-local format (YYYY-MM-DDTHH:MM)
-                    try:
-                        exam_doc['exam_date'] = datetime.strptime(exam_date, '%Y-%m-%dT%H:%M')
-                    except ValueError:
-                        exam_doc['exam_date'] = datetime.fromisoformat(exam_date.replace('Z', '+00:00'))
-                else:
-                    exam_doc['exam_date'] = exam_date
+                exam_doc['exam_date'] = self._parse_datetime(exam_date)
             if deadline:
-                if isinstance(deadline, str):
-                    # Handle datetime-local format (YYYY-MM-DDTHH:MM)
-                    try:
-                        exam_doc['deadline'] = datetime.strptime(deadline, '%Y-%m-%dT%H:%M')
-                    except ValueError:
-                        exam_doc['deadline'] = datetime.fromisoformat(deadline.replace('Z', '+00:00'))
-                else:
-                    exam_doc['deadline'] = deadline
+                exam_doc['deadline'] = self._parse_datetime(deadline)
             
             result = self.exam_collection.insert_one(exam_doc)
             
+            # Warm the snapshot cache so the first students don't hit Mongo
+            exam_doc['_id'] = result.inserted_id
+            self.snapshot_cache.put(exam_doc)
+            
             return True, str(result.inserted_id)
             
         except Exception as e:
             return False, f'Error creating exam: {str(e)}'
     
+    def update_exam(self, exam_id, instructor_id, updates):
+        """Update an exam owned by the instructor and refresh its snapshot"""
+        try:
+            exam = self.exam_collection.find_one({'_id': ObjectId(exam_id)})
+            if not exam:
+                return False, 'Exam not found'
+            
+            if str(exam['instructor_id']) != str(instructor_id):
+                return False, 'Unauthorized'
+            
+            changes = {}
+            for field in ('title', 'description'):
+                if field in updates:
+                    changes[field] = updates[field]
+            
+            if 'duration' in updates or 'duration_minutes' in updates:
+                changes['duration_minutes'] = updates.get('duration', updates.get('duration_minutes'))
+            
+            total_marks = exam['total_marks']
+            if 'questions' in updates and exam.get('sampling_rules'):
+                return False, 'Question-bank exams are edited through their question banks'
+            if 'questions' in updates:
+                valid, result = self._validate_questions(updates['questions'])
+                if not valid:
+                    return False, result
+                total_marks = result
+                changes['questions'] = updates['questions']
+                changes['total_marks'] = total_marks
+            
+            passing_score_percent = updates.get('passing_score', exam.get('passing_score_percent', 70))
+            if 'questions' in updates or 'passing_score' in updates:
+                changes['passing_score_percent'] = passing_score_percent
+                changes['passing_marks'] = round((total_marks * passing_score_percent) / 100, 2)
+            
+            for field in ('exam_date', 'deadline'):
+                if updates.get(field):
+                    changes[field] = self._parse_datetime(updates[field])
+            
+            changes['updated_at'] = datetime.now()
+            
+            updated = self.exam_collection.find_one_and_update(
+                {'_id': ObjectId(exam_id)},
+                {'$set': changes, '$inc': {'version': 1}},
+                return_document=ReturnDocument.AFTER
+            )
+            self.snapshot_cache.put(updated)
+            
+            return True, 'Exam updated successfully'
+            
+        except Exception as e:
+            return False, f'Error updating exam: {str(e)}'
+    
+    def _validate_questions(self, questions):
+        """
+        Validate exam questions
+        Returns: Tuple (is_valid, total_marks or error message)
+        """
+        if len(questions) < 1:
+            return False, 'Exam must have at least 1 question'
+        
+        if len(questions) > 50:
+            return False, 'Exam cannot have more than 50 questions'
+        
+        total_marks = 0
+        for i, q in enumerate(questions):
+            is_valid, message = validate_exam_question(q, i + 1)
+            if not is_valid:
+                return False, message
+            total_marks += q.get('marks', 1)
+        
+        return True, total_marks
+    
+    def _parse_datetime(self, value):
+        """Parse datetime-local (YYYY-MM-DDTHH:MM) or ISO strings; pass datetimes through"""
+        if not isinstance(value, str):
+            return value
+        try:
+            return datetime.strptime(value, '%Y-%m-%dT%H:%M')
+        except ValueError:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    
+    def get_exam_snapshot(self, exam_id):
+        """
+        Get the cached, pre-serialized snapshot of an exam
+        Returns: ExamSnapshot or None if the exam does not exist
+        """
+        if not ObjectId.is_valid(exam_id):
+            return None
+        return self.snapshot_cache.get(str(exam_id), self._load_exam, self._probe_exam_version)
+    
+    def get_student_exam_json(self, exam_id, student_id):
+        """
+        Get the serialized student view of an exam (answers hidden)
+        Question-bank exams return the student's own variant.
+        Returns: JSON bytes or None if the exam does not exist
+        """
+        snapshot = self.get_exam_snapshot(exam_id)
+        if not snapshot:
+            return None
+        if snapshot.variants:
+            return snapshot.variants.student_json(student_id)
+        return snapshot.student_json
+    
+    def get_grading_exam(self, exam_id, student_id=None):
+        """
+        Get the full exam (with answers) from the snapshot cache for grading
+        For question-bank exams the student's variant is rebuilt from the seed.
+        """
+        snapshot = self.get_exam_snapshot(exam_id)
+        if not snapshot:
+            return None
+        if snapshot.variants:
+            if student_id is None:
+                return None
+            return snapshot.variants.grading_exam(student_id)
+        return json.loads(snapshot.grading_json)
+    
+    def _load_exam(self, exam_id):
+        return self.exam_collection.find_one({'_id': ObjectId(exam_id)})
+    
+    def _probe_exam_version(self, exam_id):
+        exam = self.exam_collection.find_one({'_id': ObjectId(exam_id)}, {'version': 1})
+        return exam.get('version', 0) if exam else None
+    
     def get_exam(self, exam_id):
         """Get exam details"""
         try:
@@ -146,6 +300,10 @@ class ExamService:
                 
                 if not include_questions:
                     exam.pop('questions', None)
+                    exam.pop('question_pool', None)
+                    exam.pop('variant_seed', None)
+                for rule in exam.get('sampling_rules', []):
+                    rule.pop('pool', None)
             
             return True, exams
             
@@ -153,11 +311,84 @@ class ExamService:
             print(f"Error in get_course_exams: {str(e)}")
             return False, []
     
-    def submit_exam(self, exam_id, student_id, answers):
-        """Submit exam answers"""
+    def save_draft_answers(self, exam_id, student_id, answers, seq=0):
+        """Autosave answer deltas for an in-progress attempt"""
+        snapshot = self.get_exam_snapshot(exam_id)
+        if not snapshot:
+            return False, 'Exam not found'
+        return self.draft_service.save_answers(
+            exam_id, student_id, answers, seq, question_count=snapshot.question_count
+        )
+    
+    def get_draft_answers(self, exam_id, student_id):
+        """Get autosaved answers for an in-progress attempt"""
+        if not ObjectId.is_valid(exam_id):
+            return {}
+        return self.draft_service.get_draft(exam_id, student_id)
+    
+    def get_student_exams(self, student_id, course_ids):
+        """
+        Get exams across a student's courses with their submission status
+        One aggregation: every course's exams via $in (served by the
+        course_id/created_at index) with question bodies projected out, and
+        the student's own submission joined with $lookup.
+        """
         try:
-            # Get exam
-            exam = self.exam_collection.find_one({'_id': ObjectId(exam_id)})
+            course_oids = [ObjectId(c) for c in course_ids if ObjectId.is_valid(str(c))]
+            if not course_oids:
+                return True, []
+            
+            exams = list(self.exam_collection.aggregate([
+                {'$match': {'course_id': {'$in': course_oids}}},
+                {'$sort': {'created_at': -1}},
+                {'$project': {'questions': 0, 'question_pool': 0, 'sampling_rules.pool': 0, 'variant_seed': 0}},
+                {'$lookup': {
+                    'from': 'exam_submissions',
+                    'let': {'exam_id': '$_id'},
+                    'pipeline': [
+                        {'$match': {'$expr': {'$and': [
+                            {'$eq': ['$exam_id', '$$exam_id']},
+                            {'$eq': ['$student_id', ObjectId(student_id)]}
+                        ]}}},
+                        {'$project': {'marks_obtained': 1, 'total_marks': 1, 'passed': 1, 'submitted_at': 1}},
+                        {'$limit': 1}
+                    ],
+                    'as': 'submissions'
+                }}
+            ]))
+            
+            for i, exam in enumerate(exams):
+                submissions = exam.pop('submissions', [])
+                exam = serialize_exam(exam)
+                if submissions:
+                    submission = submissions[0]
+                    exam['submission'] = {
+                        'submission_id': str(submission['_id']),
+                        'marks_obtained': submission.get('marks_obtained'),
+                        'total_marks': submission.get('total_marks'),
+                        'passed': submission.get('passed'),
+                        'submitted_at': submission['submitted_at'].isoformat() if submission.get('submitted_at') else None
+                    }
+                else:
+                    exam['submission'] = None
+                exam['submitted'] = bool(submissions)
+                exams[i] = exam
+            
+            return True, exams
+            
+        except Exception as e:
+            print(f"Error in get_student_exams: {str(e)}")
+            return False, []
+    
+    def submit_exam(self, exam_id, student_id, answers, use_draft=False):
+        """
+        Submit exam answers
+        With use_draft the autosaved draft is finalized; answers sent with
+        the request (clients send all of them) take precedence over the draft.
+        """
+        try:
+            # Get exam (grading snapshot, shared across the submission burst)
+            exam = self.get_grading_exam(exam_id, student_id)
             if not exam:
                 print(f"[ExamService] submit_exam: exam not found (exam_id={exam_id})")
                 return False, 'Exam not found'
@@ -172,45 +403,19 @@ class ExamService:
                 print(f"[ExamService] submit_exam: exam already submitted (exam_id={exam_id}, student_id={student_id})")
                 return False, 'Exam already submitted'
             
-            # Calculate marks
-            total_obtained = 0
-            graded_answers = []
+            if use_draft:
+                self.draft_service.flush_draft(exam_id, student_id)
+                answers = dict(self.draft_service.get_draft(exam_id, student_id), **(answers or {}))
             
-            for i, question in enumerate(exam['questions']):
-                student_answer = answers.get(str(i))
-                correct_answer = question.get('correct_answer')
-                marks = question.get('marks', 0)
-                
-                # Convert both to int for comparison
-                is_correct = False
-                if student_answer is not None and correct_answer is not None:
-                    try:
-                        is_correct = int(student_answer) == int(correct_answer)
-                    except (ValueError, TypeError):
-                        is_correct = str(student_answer) == str(correct_answer)
-                
-                obtained = marks if is_correct else 0
-                
-                graded_answers.append({
-                    'question_index': i,
-                    'question_text': question.get('question', ''),
-                    'student_answer': student_answer,
-                    'correct_answer': correct_answer,
-                    'is_correct': is_correct,
-                    'marks_obtained': obtained,
-                    'max_marks': marks
-                })
-                
-                total_obtained += obtained
+            # Calculate marks
+            graded_answers, total_obtained, passed = self.grading_service.grade_submission(exam, answers)
             
-            # Determine pass/fail
-            passed = total_obtained >= exam['passing_marks']
             print(f"[ExamService] submit_exam: student={student_id} obtained={total_obtained}/{exam.get('total_marks')} passed={passed}")
             
             submission_doc = {
                 'exam_id': ObjectId(exam_id),
                 'student_id': ObjectId(student_id),
-                'course_id': exam['course_id'],
+                'course_id': ObjectId(exam['course_id']),
                 'exam_title': exam.get('title', 'Exam'),
                 'answers': graded_answers,
                 'total_marks': exam['total_marks'],
@@ -225,6 +430,16 @@ class ExamService:
             result = self.submission_collection.insert_one(submission_doc)
             print(f"[ExamService] submit_exam: inserted submission_id={result.inserted_id}")
             
+            self.draft_service.discard(exam_id, student_id)
+            
+            # Fold into per-question statistics (never fails the submission)
+            try:
+                self.item_analysis_service.record_submission(
+                    exam_id, graded_answers, total_obtained, exam['total_marks']
+                )
+            except Exception as e:
+                print(f"[ExamService] submit_exam: item statistics update failed: {e}")
+            
             return True, {
                 'submission_id': str(result.inserted_id),
                 'marks_obtained': total_obtained,
@@ -243,23 +458,15 @@ class ExamService:
                 return False, 'Submission not found'
             
             # Update marks
-            total_obtained = 0
-            for graded in graded_answers:
-                idx = graded['question_index']
-                marks = graded['marks_obtained']
-                
-                # Find and update the answer
-                for answer in submission['answers']:
-                    if answer['question_index'] == idx:
-                        answer['marks_obtained'] = marks
-                        break
-                
-                total_obtained += marks
+            manual_marks = {g['question_index']: g['marks_obtained'] for g in graded_answers}
             
-            # Calculate total including already graded questions
+            total_obtained = 0
             for answer in submission['answers']:
-                if answer['question_index'] not in [g['question_index'] for g in graded_answers]:
-                    total_obtained += answer['marks_obtained']
+                idx = answer['question_index']
+                if idx in manual_marks:
+                    answer['marks_obtained'] = manual_marks[idx]
+                    answer['manually_graded'] = True
+                total_obtained += answer['marks_obtained']
             
             passed = total_obtained >= submission['passing_marks']
             
@@ -305,29 +512,77 @@ class ExamService:
         except Exception as e:
             return False, []
     
-    def get_exam_submissions(self, exam_id):
-        """Get all submissions for an exam (for instructor)"""
+    def get_exam_submissions(self, exam_id, sort_by='submitted_at', descending=True,
+                             limit=None, cursor=None, include_answers=False):
+        """
+        Get submissions for an exam (for instructor)
+        Keyset-paginated on (sort field, _id); students and certificates are
+        joined with one $in query each per page.
+        Args:
+            sort_by: 'submitted_at' or 'score'
+            limit: Page size (None returns all submissions)
+            cursor: next_cursor from the previous page
+        Returns:
+            Tuple (success, {'submissions': [...], 'next_cursor': str or None})
+        """
         try:
-            submissions = list(self.submission_collection.find({
-                'exam_id': ObjectId(exam_id)
-            }))
-            
-            # Get student details
-            for sub in submissions:
-                student = self.db['users'].find_one({'_id': sub['student_id']})
-                sub['_id'] = str(sub['_id'])
-                sub['exam_id'] = str(sub['exam_id'])
-                sub['student_id'] = str(sub['student_id'])
-                sub['course_id'] = str(sub['course_id'])
-                sub['student_name'] = student['name'] if student else 'Unknown'
-                sub['student_email'] = student['email'] if student else 'Unknown'
-                sub['submitted_at'] = sub['submitted_at'].isoformat()
-                
-                # Check if certificate exists
-                cert = self.db['certificates'].find_one({'submission_id': sub['_id'] if isinstance(sub['_id'], ObjectId) else ObjectId(sub['_id'])})
-                sub['certificate_id'] = str(cert['_id']) if cert else None
+            sort_field = SUBMISSION_SORT_FIELDS.get(sort_by)
+            if not sort_field:
+                return False, f'Invalid sort field: {sort_by}'
+            
+            projection = None if include_answers else {'answers': 0}
+            submissions, next_cursor = paginate(
+                self.submission_collection, {'exam_id': ObjectId(exam_id)},
+                sort_field, descending, limit, cursor, projection
+            )
             
-            return True, submissions
+            return True, {
+                'submissions': self._join_submission_details(submissions),
+                'next_cursor': next_cursor
+            }
             
+        except ValueError as e:
+            return False, str(e)
         except Exception as e:
-            return False, []
+            print(f"Error in get_exam_submissions: {str(e)}")
+            return False, 'Error loading submissions'
+    
+    def iter_exam_submissions(self, exam_id, sort_by='submitted_at', descending=True, batch_size=500):
+        """Yield every submission of an exam page by page (for CSV export)"""
+        cursor = None
+        while True:
+            success, page = self.get_exam_submissions(exam_id, sort_by, descending, batch_size, cursor)
+            if not success:
+                raise RuntimeError(page)
+            yield from page['submissions']
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+    
+    def _join_submission_details(self, submissions):
+        """Attach student name/email and certificate id to a page of submissions"""
+        student_ids = list({sub['student_id'] for sub in submissions})
+        students = {
+            user['_id']: user for user in self.db['users'].find(
+                {'_id': {'$in': student_ids}}, {'name': 1, 'email': 1}
+            )
+        }
+        certificates = {
+            cert['submission_id']: cert['_id'] for cert in self.db['certificates'].find(
+                {'submission_id': {'$in': [sub['_id'] for sub in submissions]}}, {'submission_id': 1}
+            )
+        }
+        
+        for sub in submissions:
+            student = students.get(sub['student_id'])
+            cert_id = certificates.get(sub['_id'])
+            sub['_id'] = str(sub['_id'])
+            sub['exam_id'] = str(sub['exam_id'])
+            sub['student_id'] = str(sub['student_id'])
+            sub['course_id'] = str(sub['course_id'])
+            sub['student_name'] = student['name'] if student else 'Unknown'
+            sub['student_email'] = student['email'] if student else 'Unknown'
+            sub['submitted_at'] = sub['submitted_at'].isoformat()
+            sub['certificate_id'] = str(cert_id) if cert_id else None
+        
+        return submissions
@@ -0,0 +1,176 @@
+"""
+Exam Snapshot Cache
+Holds immutable, versioned, pre-serialized copies of exams so that an
+"exam opens" burst is served from memory instead of one full find_one
+(questions + answers) per student.
+
+Each snapshot carries two serialized forms:
+- student_json: the complete /api/student/exams/<id> response body with
+  correct answers and explanations stripped
+- grading_json: the full exam (including answers) used by submit_exam
+
+Question-bank exams additionally carry a VariantSource that assembles each
+student's paper from pre-serialized question fragments.
+
+Snapshots are keyed by exam id and tagged with the exam's `version` field.
+Writes made through ExamService replace the snapshot directly; snapshots
+older than `revalidate_after` seconds are re-checked with a version-only
+query so that edits made by other processes are picked up.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from app.services.question_bank_service import VariantSource
+
+ExamSnapshot = namedtuple('ExamSnapshot', ['exam_id', 'version', 'student_json', 'grading_json', 'variants', 'question_count', 'checked_at'])
+
+STUDENT_HIDDEN_FIELDS = ('correct_answer', 'explanation')
+DATE_FIELDS = ('exam_date', 'scheduled_at', 'deadline', 'created_at', 'updated_at')
+
+
+def serialize_exam(exam):
+    """Return a JSON-safe copy of an exam document (ObjectIds and dates as strings)"""
+    exam = dict(exam)
+    for key in ('_id', 'course_id', 'instructor_id'):
+        if key in exam:
+            exam[key] = str(exam[key])
+    for key in DATE_FIELDS:
+        if exam.get(key) and hasattr(exam[key], 'isoformat'):
+            exam[key] = exam[key].isoformat()
+    return exam
+
+
+def build_snapshot(exam):
+    """Build an ExamSnapshot from a raw exam document"""
+    grading = serialize_exam(exam)
+
+    student = dict(grading)
+    student['questions'] = [
+        {k: v for k, v in question.items() if k not in STUDENT_HIDDEN_FIELDS}
+        for question in grading.get('questions', [])
+    ]
+
+    variants = None
+    if grading.get('sampling_rules'):
+        base = {k: v for k, v in grading.items() if k not in ('question_pool', 'variant_seed')}
+        base['sampling_rules'] = [
+            {k: v for k, v in rule.items() if k != 'pool'} for rule in grading['sampling_rules']
+        ]
+        student = dict(base, questions='__QUESTIONS__')
+        template = json.dumps({'success': True, 'exam': student}, default=str)
+        variants = VariantSource(grading, base, template)
+
+    return ExamSnapshot(
+        exam_id=grading['_id'],
+        version=exam.get('version', 0),
+        student_json=json.dumps({'success': True, 'exam': student}, default=str).encode('utf-8'),
+        grading_json=json.dumps(grading, default=str).encode('utf-8'),
+        variants=variants,
+        question_count=grading.get('questions_per_variant') if variants else len(grading.get('questions', [])),
+        checked_at=time.monotonic()
+    )
+
+
+class ExamSnapshotCache:
+    def __init__(self, max_entries=512, revalidate_after=30):
+        self.max_entries = max_entries
+        self.revalidate_after = revalidate_after
+        self._snapshots = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def get(self, exam_id, loader, version_probe):
+        """
+        Get a snapshot, loading it at most once per exam on a miss
+        Args:
+            exam_id: Exam ID string
+            loader: Callable(exam_id) -> raw exam document or None
+            version_probe: Callable(exam_id) -> current version or None
+        Returns:
+            ExamSnapshot or None if the exam does not exist
+        """
+        snapshot = self._lookup(exam_id)
+        if snapshot is not None:
+            if time.monotonic() - snapshot.checked_at < self.revalidate_after:
+                return snapshot
+
+            version = version_probe(exam_id)
+            if version == snapshot.version:
+                return self._store(snapshot._replace(checked_at=time.monotonic()))
+            if version is None:
+                self.invalidate(exam_id)
+                return None
+
+        return self._load(exam_id, loader)
+
+    def put(self, exam):
+        """Replace the snapshot for a freshly written exam document"""
+        return self._store(build_snapshot(exam))
+
+    def invalidate(self, exam_id):
+        """Drop the snapshot for an exam"""
+        with self._lock:
+            self._snapshots.pop(str(exam_id), None)
+
+    def stats(self):
+        """Return cache counters"""
+        with self._lock:
+            return {
+                'entries': len(self._snapshots),
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads
+            }
+
+    def _lookup(self, exam_id):
+        with self._lock:
+            snapshot = self._snapshots.get(exam_id)
+            if snapshot is not None:
+                self._snapshots.move_to_end(exam_id)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return snapshot
+
+    def _store(self, snapshot):
+        with self._lock:
+            self._snapshots[snapshot.exam_id] = snapshot
+            self._snapshots.move_to_end(snapshot.exam_id)
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def _load(self, exam_id, loader):
+        """Single-flight load: one caller queries Mongo, the rest wait for it"""
+        with self._lock:
+            event = self._inflight.get(exam_id)
+            leader = event is None
+            if leader:
+                event = threading.Event()
+                self._inflight[exam_id] = event
+                self.loads += 1
+
+        if not leader:
+            event.wait()
+            with self._lock:
+                return self._snapshots.get(exam_id)
+
+        try:
+            exam = loader(exam_id)
+            if not exam:
+                self.invalidate(exam_id)
+                return None
+            return self.put(exam)
+        finally:
+            with self._lock:
+                self._inflight.pop(exam_id, None)
+            event.set()
+
+
+# Create singleton instance (one cache per worker process)
+exam_snapshot_cache = ExamSnapshotCache()
@@ -0,0 +1,246 @@
+"""
+Grading Service
+Compiles an exam's answer key into NumPy arrays and scores whole batches of
+submissions at once. Also provides the bulk regrade job used when an
+instructor corrects an answer key.
+
+Question-bank exams compile the whole question pool; each submission's
+variant (pool indices rebuilt from the exam seed) gathers its row of the
+key, so a batch of different papers is still graded in one pass.
+"""
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+import numpy as np
+from app.services.item_analysis_service import ItemAnalysisService
+from app.services.question_bank_service import variant_question_indices
+from app.utils.logger import log_error, log_info
+
+REGRADE_BATCH_SIZE = 1000
+NO_ANSWER = -1
+
+
+class AnswerKey:
+    """
+    Answer key compiled to arrays
+    Answers are encoded to integer codes so that a batch of submissions is
+    graded with one vectorized comparison. Integer-like answers (option
+    indexes, "2") share a code, matching submit_exam's int() comparison;
+    other answers are compared as strings.
+    """
+    def __init__(self, exam):
+        questions = exam.get('question_pool') or exam.get('questions', [])
+        self.exam_id = str(exam.get('_id', ''))
+        self.questions = questions
+        self.num_questions = len(questions)
+        self.marks = np.array([q.get('marks', 0) for q in questions], dtype=np.float64)
+        self.total_marks = exam.get('total_marks', float(self.marks.sum()))
+        self.passing_marks = exam.get('passing_marks', 0)
+        self.passing_score_percent = exam.get('passing_score_percent', 70)
+        self._vocab = {}
+        self.correct = np.array([self.encode(q.get('correct_answer')) for q in questions], dtype=np.int64)
+
+    def encode(self, value):
+        """Encode one answer value to an integer code (NO_ANSWER for missing)"""
+        if value is None or value == '':
+            return NO_ANSWER
+        try:
+            key = ('i', int(value))
+        except (ValueError, TypeError):
+            key = ('s', str(value))
+        code = self._vocab.get(key)
+        if code is None:
+            code = len(self._vocab)
+            self._vocab[key] = code
+        return code
+
+    def encode_batch(self, answer_maps, width=None):
+        """
+        Encode answers to an (n_submissions x n_questions) code matrix
+        Args:
+            answer_maps: List of {"<question index>": answer} dictionaries
+            width: Questions per paper (defaults to the whole key)
+        """
+        width = self.num_questions if width is None else width
+        matrix = np.full((len(answer_maps), width), NO_ANSWER, dtype=np.int64)
+        for row, answers in enumerate(answer_maps):
+            for i in range(width):
+                value = answers.get(str(i))
+                if value is not None:
+                    matrix[row, i] = self.encode(value)
+        return matrix
+
+
+class GradingService:
+    def __init__(self, db):
+        self.db = db
+        self.exam_collection = db['exams']
+        self.submission_collection = db['exam_submissions']
+
+    def grade_batch(self, key, answer_maps, variants=None):
+        """
+        Score a batch of submissions against a compiled answer key
+        Args:
+            variants: Optional (n_submissions x questions per paper) matrix of
+                pool indices, for question-bank exams
+        Returns:
+            Tuple (is_correct bool matrix, per-question marks matrix, totals, passed)
+        """
+        if variants is None:
+            correct, marks, passing = key.correct, key.marks, key.passing_marks
+        else:
+            correct, marks = key.correct[variants], key.marks[variants]
+            passing = np.round(marks.sum(axis=1) * key.passing_score_percent / 100, 2)
+        codes = key.encode_batch(answer_maps, correct.shape[-1])
+        is_correct = (codes == correct) & (codes != NO_ANSWER)
+        obtained = is_correct * marks
+        totals = obtained.sum(axis=1)
+        passed = totals >= passing
+        return is_correct, obtained, totals, passed
+
+    def build_graded_answers(self, key, answers, is_correct, obtained, questions=None):
+        """Build the per-question answer records stored on a submission"""
+        graded = []
+        for i, question in enumerate(key.questions if questions is None else questions):
+            graded.append({
+                'question_index': i,
+                'question_text': question.get('question', ''),
+                'student_answer': answers.get(str(i)),
+                'correct_answer': question.get('correct_answer'),
+                'is_correct': bool(is_correct[i]),
+                'marks_obtained': _as_number(obtained[i]),
+                'max_marks': question.get('marks', 0)
+            })
+            if question.get('id'):
+                graded[-1]['question_id'] = question['id']
+        return graded
+
+    def grade_submission(self, exam, answers):
+        """
+        Grade a single submission (batch of one)
+        Returns:
+            Tuple (graded answers, marks obtained, passed)
+        """
+        key = AnswerKey(exam)
+        is_correct, obtained, totals, passed = self.grade_batch(key, [answers])
+        graded = self.build_graded_answers(key, answers, is_correct[0], obtained[0])
+        return graded, _as_number(totals[0]), bool(passed[0])
+
+    def regrade_exam(self, exam_id, batch_size=REGRADE_BATCH_SIZE):
+        """
+        Regrade every submission of an exam against its current answer key
+        Submissions are streamed in batches, scored with one vectorized pass per
+        batch and written back with an unordered bulk_write. Answers an instructor
+        graded by hand keep their manual marks.
+        Returns:
+            Tuple (success, summary dict or error message)
+        """
+        try:
+            exam = self.exam_collection.find_one({'_id': ObjectId(exam_id)})
+            if not exam:
+                return False, 'Exam not found'
+
+            key = AnswerKey(exam)
+            summary = {'processed': 0, 'changed': 0, 'passed': 0, 'failed': 0}
+
+            cursor = self.submission_collection.find(
+                {'exam_id': ObjectId(exam_id)},
+                {'student_id': 1, 'answers': 1, 'marks_obtained': 1, 'passed': 1}
+            ).batch_size(batch_size)
+
+            batch = []
+            for submission in cursor:
+                batch.append(submission)
+                if len(batch) >= batch_size:
+                    self._regrade_batch(key, exam, batch, summary)
+                    batch = []
+            if batch:
+                self._regrade_batch(key, exam, batch, summary)
+
+            # Correctness changed, so the incremental item statistics must be rebuilt
+            ItemAnalysisService(self.db).rebuild(exam_id)
+
+            log_info(f"Regraded exam {exam_id}: {summary}")
+            return True, summary
+
+        except Exception as e:
+            log_error(str(e), "grading_service.regrade_exam")
+            return False, f'Error regrading exam: {str(e)}'
+
+    def _regrade_batch(self, key, exam, submissions, summary):
+        """Score one batch of stored submissions and write the changes"""
+        answer_maps = []
+        manual_marks = []
+        for submission in submissions:
+            answers = {}
+            manual = {}
+            for answer in submission.get('answers', []):
+                idx = answer.get('question_index')
+                answers[str(idx)] = answer.get('student_answer')
+                if answer.get('manually_graded'):
+                    manual[idx] = answer.get('marks_obtained', 0)
+            answer_maps.append(answers)
+            manual_marks.append(manual)
+
+        variants = None
+        if exam.get('sampling_rules'):
+            variants = np.array([
+                variant_question_indices(
+                    exam['variant_seed'], str(submission['student_id']),
+                    exam['sampling_rules'], exam.get('shuffle_questions', True)
+                )
+                for submission in submissions
+            ], dtype=np.int64)
+
+        is_correct, obtained, totals, passed = self.grade_batch(key, answer_maps, variants)
+
+        now = datetime.now()
+        requests = []
+        for row, submission in enumerate(submissions):
+            if variants is None:
+                questions = key.questions
+                total_marks, passing_marks = key.total_marks, key.passing_marks
+            else:
+                questions = [key.questions[i] for i in variants[row]]
+                total_marks = _as_number(key.marks[variants[row]].sum())
+                passing_marks = round(total_marks * key.passing_score_percent / 100, 2)
+
+            graded = self.build_graded_answers(key, answer_maps[row], is_correct[row], obtained[row], questions)
+            total = _as_number(totals[row])
+            is_passed = bool(passed[row])
+
+            if manual_marks[row]:
+                for answer in graded:
+                    idx = answer['question_index']
+                    if idx in manual_marks[row]:
+                        total += manual_marks[row][idx] - answer['marks_obtained']
+                        answer['marks_obtained'] = manual_marks[row][idx]
+                        answer['manually_graded'] = True
+                is_passed = total >= passing_marks
+
+            if total != submission.get('marks_obtained') or is_passed != submission.get('passed'):
+                summary['changed'] += 1
+
+            requests.append(UpdateOne(
+                {'_id': submission['_id']},
+                {'$set': {
+                    'answers': graded,
+                    'marks_obtained': total,
+                    'total_marks': total_marks,
+                    'passing_marks': passing_marks,
+                    'passed': is_passed,
+                    'regraded_at': now
+                }}
+            ))
+
+            summary['processed'] += 1
+            summary['passed' if is_passed else 'failed'] += 1
+
+        if requests:
+            self.submission_collection.bulk_write(requests, ordered=False)
+
+
+def _as_number(value):
+    """Convert a NumPy scalar to int when whole, else float (BSON-friendly)"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
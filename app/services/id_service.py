@@ -0,0 +1,23 @@
+"""
+ID Service
+Identifiers used by the services; the allocation itself lives in
+app/utils/ids.py so models can share it.
+"""
+from app.utils.ids import DEFAULT_BLOCK_SIZE, certificate_number, get_allocator, time_ordered_id
+
+
+class IdService:
+    def __init__(self, db):
+        self.db = db
+
+    def next_sequence(self, name, block_size=DEFAULT_BLOCK_SIZE):
+        """Next value of a named counter (usually served from memory)"""
+        return get_allocator(self.db, name, block_size).next()
+
+    def certificate_number(self):
+        """Certificate ID, e.g. CERT-20250114-0001234"""
+        return certificate_number(self.db)
+
+    def transaction_id(self):
+        """Payment transaction ID, time-ordered"""
+        return time_ordered_id('TXN')
@@ -0,0 +1,203 @@
+"""
+Item Analysis Service
+Per-exam question statistics maintained incrementally on every submission:
+difficulty (p-value), discrimination (point-biserial correlation between
+answering an item correctly and the total score), option-choice distribution
+and a score histogram.
+
+Only running sums are stored, so each submission costs a single $inc upsert
+on one compact `exam_item_stats` document and reads derive the statistics.
+Question-bank exams key items by question id rather than paper position.
+"""
+import math
+from datetime import datetime
+from bson import ObjectId
+from app.utils.logger import log_error, log_info
+
+HISTOGRAM_BINS = 10
+NO_ANSWER_KEY = 'none'
+
+_indexed_databases = set()
+
+
+def _option_key(answer):
+    """Make an answer usable as a Mongo field name"""
+    if answer is None or answer == '':
+        return NO_ANSWER_KEY
+    return str(answer).replace('.', '_').replace('$', '_')[:64]
+
+
+def _histogram_bin(score, total_marks):
+    if not total_marks:
+        return 0
+    return max(0, min(HISTOGRAM_BINS - 1, int(HISTOGRAM_BINS * score / total_marks)))
+
+
+class ItemAnalysisService:
+    def __init__(self, db):
+        self.db = db
+        self.stats_collection = db['exam_item_stats']
+        self.submission_collection = db['exam_submissions']
+        self._create_indexes()
+
+    def _create_indexes(self):
+        # Services are built per request; only the first one per process creates indexes
+        key = (id(self.db.client), self.db.name)
+        if key in _indexed_databases:
+            return
+        self.stats_collection.create_index([('exam_id', 1)], unique=True)
+        _indexed_databases.add(key)
+
+    def record_submission(self, exam_id, answers, score, total_marks):
+        """
+        Fold one graded submission into the exam's running statistics
+        Args:
+            exam_id: Exam ID
+            answers: Graded answer records (question_index, student_answer, is_correct)
+            score: Marks obtained
+            total_marks: Exam total marks
+        """
+        increments = self._increments(answers, score, total_marks)
+        self.stats_collection.update_one(
+            {'exam_id': ObjectId(exam_id)},
+            {'$inc': increments, '$set': {'updated_at': datetime.now()}},
+            upsert=True
+        )
+
+    def _increments(self, answers, score, total_marks):
+        """Build the $inc document for one submission"""
+        increments = {
+            'submissions': 1,
+            'score_sum': score,
+            'score_sq_sum': score * score,
+            f'histogram.{_histogram_bin(score, total_marks)}': 1
+        }
+        for answer in answers:
+            prefix = f"items.{answer.get('question_id', answer['question_index'])}"
+            increments[f'{prefix}.options.{_option_key(answer.get("student_answer"))}'] = 1
+            if 'question_id' in answer:
+                # Bank questions are only on some papers: track who saw them
+                increments[f'{prefix}.seen'] = 1
+                increments[f'{prefix}.score_sum_seen'] = score
+            if answer.get('is_correct'):
+                increments[f'{prefix}.correct'] = 1
+                increments[f'{prefix}.score_sum_correct'] = score
+        return increments
+
+    def get_item_statistics(self, exam_id):
+        """
+        Derive item statistics from the stored running sums
+        Returns:
+            Tuple (success, statistics dict)
+        """
+        try:
+            exam = self.db['exams'].find_one(
+                {'_id': ObjectId(exam_id)},
+                {'questions.question': 1, 'question_pool.question': 1, 'question_pool.id': 1, 'total_marks': 1}
+            )
+            if not exam:
+                return False, 'Exam not found'
+
+            stats = self.stats_collection.find_one({'exam_id': ObjectId(exam_id)}) or {}
+            n = stats.get('submissions', 0)
+            score_sum = stats.get('score_sum', 0)
+            mean = score_sum / n if n else 0
+            variance = max(0.0, stats.get('score_sq_sum', 0) / n - mean * mean) if n else 0
+            std = math.sqrt(variance)
+
+            items = []
+            stored_items = stats.get('items', {})
+            for i, question in enumerate(exam.get('question_pool') or exam.get('questions', [])):
+                item = stored_items.get(str(question.get('id', i)), {})
+                seen = item.get('seen', 0) if question.get('id') else n
+                seen_score_sum = item.get('score_sum_seen', score_sum) if question.get('id') else score_sum
+                correct = item.get('correct', 0)
+                p_value = correct / seen if seen else None
+
+                # Point-biserial: (mean score of correct - mean score of incorrect) / std * sqrt(pq)
+                discrimination = None
+                if seen and std > 0 and 0 < correct < seen:
+                    mean_correct = item.get('score_sum_correct', 0) / correct
+                    mean_incorrect = (seen_score_sum - item.get('score_sum_correct', 0)) / (seen - correct)
+                    discrimination = round(
+                        (mean_correct - mean_incorrect) / std * math.sqrt(p_value * (1 - p_value)), 4
+                    )
+
+                items.append({
+                    'question_index': i,
+                    'question_id': question.get('id'),
+                    'question_text': question.get('question', ''),
+                    'responses': seen,
+                    'difficulty': round(p_value, 4) if p_value is not None else None,
+                    'discrimination': discrimination,
+                    'option_distribution': item.get('options', {})
+                })
+
+            histogram = stats.get('histogram', {})
+            return True, {
+                'exam_id': str(exam_id),
+                'submissions': n,
+                'mean_score': round(mean, 2),
+                'std_score': round(std, 2),
+                'total_marks': exam.get('total_marks'),
+                'score_histogram': [histogram.get(str(b), 0) for b in range(HISTOGRAM_BINS)],
+                'items': items,
+                'updated_at': stats['updated_at'].isoformat() if stats.get('updated_at') else None
+            }
+
+        except Exception as e:
+            log_error(str(e), "item_analysis_service.get_item_statistics")
+            return False, f'Error loading item statistics: {str(e)}'
+
+    def rebuild(self, exam_id=None):
+        """
+        Rebuild statistics from stored submissions in one streaming pass
+        Args:
+            exam_id: Limit to one exam (default: every exam with submissions)
+        Returns:
+            Number of exams rebuilt
+        """
+        query = {'exam_id': ObjectId(exam_id)} if exam_id else {}
+        cursor = self.submission_collection.find(
+            query,
+            {
+                'exam_id': 1, 'marks_obtained': 1, 'total_marks': 1,
+                'answers.question_index': 1, 'answers.question_id': 1,
+                'answers.student_answer': 1, 'answers.is_correct': 1
+            }
+        )
+
+        totals = {}
+        for submission in cursor:
+            acc = totals.setdefault(submission['exam_id'], {})
+            increments = self._increments(
+                submission.get('answers', []),
+                submission.get('marks_obtained', 0),
+                submission.get('total_marks', 0)
+            )
+            for key, value in increments.items():
+                acc[key] = acc.get(key, 0) + value
+
+        for exam_oid, acc in totals.items():
+            self.stats_collection.replace_one(
+                {'exam_id': exam_oid},
+                self._expand(exam_oid, acc),
+                upsert=True
+            )
+
+        if exam_id and ObjectId(exam_id) not in totals:
+            self.stats_collection.delete_one({'exam_id': ObjectId(exam_id)})
+
+        log_info(f"Rebuilt item statistics for {len(totals)} exams")
+        return len(totals)
+
+    def _expand(self, exam_oid, flat):
+        """Turn dotted accumulator keys into a nested stats document"""
+        doc = {'exam_id': exam_oid, 'updated_at': datetime.now()}
+        for dotted, value in flat.items():
+            node = doc
+            parts = dotted.split('.')
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = value
+        return doc
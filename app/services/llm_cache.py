@@ -0,0 +1,208 @@
+"""
+LLM Response Cache
+Caches answers to stateless AI helper prompts (study tips, concept
+explanations, career guidance, course Q&A, learning paths).
+
+- Keys are a hash of the model, the call parameters and the messages with
+  whitespace collapsed, case folded and trailing punctuation stripped, so
+  "Explain  recursion?" and "explain recursion" share an entry. Course
+  context is part of the system message and therefore of the key.
+- The in-process tier is an LRU bounded by the size of the stored text,
+  with a TTL per entry.
+- The persistent tier is the `llm_cache` collection (TTL index on
+  `expires_at`), so warm answers survive restarts and are shared between
+  worker processes.
+- Concurrent misses for the same key in a process wait for a single LLM
+  call instead of each paying for one.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from app.utils.logger import log_error
+
+MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_MB', '32')) * 1024 * 1024
+TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', str(24 * 3600)))
+ENTRY_OVERHEAD_BYTES = 200  # key, bookkeeping
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Databases whose llm_cache index exists (created once per process)
+_indexed_databases = set()
+
+
+def normalize_prompt(text):
+    """Collapse whitespace, case-fold and drop trailing punctuation"""
+    return _WHITESPACE.sub(' ', text or '').strip().casefold().rstrip('?!.。 ')
+
+
+def make_key(model, messages, **params):
+    """Cache key for a chat completion request"""
+    material = json.dumps({
+        'model': model,
+        'params': params,
+        'messages': [[m.get('role'), normalize_prompt(m.get('content'))] for m in messages]
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, db=None, max_bytes=MAX_BYTES, ttl_seconds=TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.collection = None
+        self._entries = OrderedDict()  # key -> (response, expires_at monotonic, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flight_locks = {}  # key -> [lock, callers holding or waiting on it]
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.evictions = 0
+        if db is not None:
+            self.attach(db)
+
+    def attach(self, db):
+        """Use `db.llm_cache` as the persistent tier"""
+        self.collection = db['llm_cache']
+        key = (id(db.client), db.name)
+        if key in _indexed_databases:
+            return
+        try:
+            self.collection.create_index('expires_at', expireAfterSeconds=0)
+            _indexed_databases.add(key)
+        except Exception as e:
+            log_error(f"llm_cache index creation failed: {e}", "llm_cache.attach")
+
+    def get_or_compute(self, key, compute):
+        """
+        Cached response for `key`, calling `compute()` on a miss
+        Exceptions from `compute` propagate and nothing is cached.
+        """
+        response = self._get_memory(key)
+        if response is not None:
+            return response
+
+        # One LLM call per key in this process; concurrent requests wait for it
+        with self._lock:
+            flight = self._flight_locks.get(key)
+            if flight is None:
+                flight = self._flight_locks[key] = [threading.Lock(), 0]
+            flight[1] += 1
+        try:
+            with flight[0]:
+                response = self._get_memory(key, waited=True)
+                if response is not None:
+                    return response
+
+                response = self._get_persistent(key)
+                if response is not None:
+                    return response
+
+                with self._lock:
+                    self.misses += 1
+                response = compute()
+                if response:
+                    self._put_memory(key, response, self.ttl_seconds)
+                    self._put_persistent(key, response)
+                return response
+        finally:
+            # The last caller out removes the lock, so a later miss can never run beside a waiter
+            with self._lock:
+                flight[1] -= 1
+                if not flight[1] and self._flight_locks.get(key) is flight:
+                    del self._flight_locks[key]
+
+    def _get_memory(self, key, waited=False):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= entry[2]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if waited:
+                self.collapsed += 1
+            return entry[0]
+
+    def _put_memory(self, key, response, ttl_seconds):
+        size = len(response.encode('utf-8')) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (response, time.monotonic() + ttl_seconds, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _get_persistent(self, key):
+        if self.collection is None:
+            return None
+        try:
+            doc = self.collection.find_one({'_id': key}, {'response': 1, 'expires_at': 1})
+        except Exception as e:
+            log_error(e, "llm_cache.get")
+            return None
+        # The TTL monitor only runs once a minute
+        if not doc or doc['expires_at'] <= datetime.utcnow():
+            return None
+        remaining = (doc['expires_at'] - datetime.utcnow()).total_seconds()
+        self._put_memory(key, doc['response'], remaining)
+        with self._lock:
+            self.persistent_hits += 1
+        return doc['response']
+
+    def _put_persistent(self, key, response):
+        if self.collection is None:
+            return
+        now = datetime.utcnow()
+        try:
+            self.collection.replace_one(
+                {'_id': key},
+                {'response': response, 'created_at': now, 'expires_at': now + timedelta(seconds=self.ttl_seconds)},
+                upsert=True
+            )
+        except Exception as e:
+            log_error(e, "llm_cache.put")
+
+    def clear(self):
+        """Drop every cached response (both tiers)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.collection is not None:
+            self.collection.delete_many({})
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.persistent_hits + self.misses
+            return {
+                'hits': self.hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'collapsed': self.collapsed,
+                'hit_rate': round((self.hits + self.persistent_hits) / lookups, 4) if lookups else None,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'ttl_seconds': self.ttl_seconds,
+                'persistent': self.collection is not None
+            }
+
+
+# Create singleton instance (create_app attaches the database)
+llm_response_cache = LLMResponseCache()
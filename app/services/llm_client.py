@@ -0,0 +1,369 @@
+"""
+LLM Client
+Shared HTTP client for Groq's OpenAI-compatible chat completions API.
+
+- One pooled `requests.Session` per process, so calls reuse keep-alive
+  TCP/TLS connections instead of paying a handshake each time.
+- At most `max_concurrency` calls are in flight per process. Callers that
+  cannot get a slot within `acquire_timeout` fail fast instead of piling up
+  request workers behind a slow upstream.
+- 429, 5xx and connection errors are retried with full-jitter exponential
+  backoff (honouring Retry-After). A read timeout is not retried: the API
+  may already be generating, and a chat call is not idempotent. Retries and
+  backoff stop at the call's overall deadline. A circuit breaker stops
+  calling the API after repeated failures and lets a single probe through
+  once it cools down.
+- `stream_chat` yields content deltas as they arrive. Retries only happen
+  before the first byte; closing the generator (the browser went away)
+  closes the upstream connection, which cancels the generation.
+- Latency, time to first token and token usage are recorded per call and
+  exposed via `stats()`.
+
+Settings come from the environment: GROQ_API_KEY, GROQ_API_BASE,
+LLM_MAX_CONNECTIONS, LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES, LLM_DEADLINE_SECONDS.
+"""
+import json
+import os
+import random
+import threading
+import time
+from collections import deque, namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from app.utils.logger import log_error, log_info
+
+GROQ_API_BASE = 'https://api.groq.com/openai/v1/chat/completions'
+MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '10'))
+MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+DEADLINE_SECONDS = float(os.getenv('LLM_DEADLINE_SECONDS', '60'))
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LATENCY_SAMPLES = 1000
+
+LLMResult = namedtuple('LLMResult', ['content', 'model', 'usage', 'latency', 'attempts'])
+
+
+class LLMError(Exception):
+    """An LLM call that failed after retries (or was not attempted)"""
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMTimeoutError(LLMError):
+    pass
+
+
+class LLMUnavailableError(LLMError):
+    """Circuit open or no free concurrency slot"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half-open after `reset_timeout` seconds (one probe call);
+    half-open -> closed on success, back to open on failure
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half-open'
+                self._probing = False
+            if self.state == 'half-open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.times_opened += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+class LLMClient:
+    def __init__(self, api_key=None, base_url=None, max_connections=None, max_concurrency=None,
+                 max_retries=None, backoff_base=0.5, backoff_max=8.0, acquire_timeout=10.0,
+                 deadline=None, breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections or MAX_CONNECTIONS
+        self.max_concurrency = max_concurrency or MAX_CONCURRENCY
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.acquire_timeout = acquire_timeout
+        self.deadline = deadline or DEADLINE_SECONDS  # seconds per call, across all attempts
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._first_tokens = deque(maxlen=LATENCY_SAMPLES)
+        self._counters = {
+            'calls': 0, 'succeeded': 0, 'failed': 0, 'cancelled': 0, 'retries': 0, 'rejected': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0
+        }
+
+    @property
+    def session(self):
+        """Pooled session, recreated after a fork so processes never share sockets"""
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._session_lock:
+                if self._session is None or self._session_pid != pid:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+                    self._session_pid = pid
+        return self._session
+
+    def chat(self, messages, model, temperature=0.7, max_tokens=1024, timeout=None, **params):
+        """
+        Run a chat completion
+        Returns:
+            LLMResult (content, model, usage, latency, attempts)
+        Raises:
+            LLMError (LLMTimeoutError / LLMUnavailableError)
+        """
+        payload = {
+            'model': model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            **params
+        }
+        started = time.perf_counter()
+        response, attempts = self._post(payload, timeout)
+        try:
+            data = response.json()
+            content = data['choices'][0]['message']['content'] or ''
+        except (ValueError, KeyError, IndexError, TypeError):
+            self._record('failed', started, attempts)
+            raise LLMError('Malformed response from LLM API', response.status_code)
+
+        usage = data.get('usage') or {}
+        latency = self._record('succeeded', started, attempts, usage)
+        log_info(f"LLM call {model}: {latency * 1000:.0f}ms, {attempts} attempt(s), "
+                 f"{usage.get('total_tokens', 0)} tokens")
+        return LLMResult(content, data.get('model', model), usage, latency, attempts)
+
+    def stream_chat(self, messages, model, temperature=0.7, max_tokens=1024, timeout=None, **params):
+        """
+        Run a streaming chat completion, yielding content deltas as they arrive
+        The concurrency slot is held until the stream ends or the generator is closed.
+        Raises:
+            LLMError (LLMTimeoutError / LLMUnavailableError)
+        """
+        payload = {
+            'model': model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            **params,
+            'stream': True
+        }
+        started = time.perf_counter()
+        response, attempts = self._post(payload, timeout, stream=True)
+        outcome = 'cancelled'
+        first_token = None
+        usage = {}
+        try:
+            # chunk_size=None hands over bytes as they arrive instead of filling a buffer
+            for line in response.iter_lines(chunk_size=None):
+                if not line.startswith(b'data:'):
+                    continue
+                data = line[5:].strip()
+                if data == b'[DONE]':
+                    break
+                chunk = json.loads(data)
+                # Groq reports usage on the last chunk under x_groq
+                usage = chunk.get('usage') or (chunk.get('x_groq') or {}).get('usage') or usage
+                for choice in chunk.get('choices') or []:
+                    delta = (choice.get('delta') or {}).get('content')
+                    if delta:
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                        yield delta
+            outcome = 'succeeded'
+        except requests.exceptions.Timeout:
+            outcome = 'failed'
+            self.breaker.record_failure()
+            raise LLMTimeoutError('LLM API stream timed out')
+        except (requests.exceptions.RequestException, ValueError) as e:
+            outcome = 'failed'
+            self.breaker.record_failure()
+            raise LLMError(f'LLM API stream interrupted: {e}')
+        finally:
+            # Closing an unfinished response drops the connection, which stops generation upstream
+            response.close()
+            self._slots.release()
+            latency = self._record(outcome, started, attempts, usage, first_token)
+            log_info(f"LLM stream {model} {outcome}: first token "
+                     f"{first_token * 1000 if first_token is not None else 0:.0f}ms, total {latency * 1000:.0f}ms, "
+                     f"{usage.get('total_tokens', 0)} tokens")
+
+    def _post(self, payload, timeout=None, stream=False):
+        """
+        POST with retries; returns (response, attempts) for a 200 response
+        For stream=True the concurrency slot stays held; the caller releases it.
+        """
+        with self._metrics_lock:
+            self._counters['calls'] += 1
+
+        # Read per call so a .env loaded after import still applies
+        api_key = self.api_key or os.getenv('GROQ_API_KEY')
+        url = self.base_url or os.getenv('GROQ_API_BASE', GROQ_API_BASE)
+        if not api_key:
+            self._reject()
+            raise LLMUnavailableError('LLM API key not configured')
+
+        headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        }
+        timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline_at - time.monotonic()
+            if not self._slots.acquire(timeout=max(0, min(self.acquire_timeout, remaining))):
+                self._reject()
+                raise LLMUnavailableError('Too many concurrent LLM requests')
+            if not self.breaker.allow():
+                self._slots.release()
+                self._reject()
+                raise LLMUnavailableError('LLM API temporarily unavailable (circuit open)')
+
+            retry_after = None
+            held = False
+            try:
+                response = self.session.post(url, headers=headers, json=payload, stream=stream,
+                                             timeout=tuple(max(0.1, min(t, remaining)) for t in timeout))
+            except requests.exceptions.ConnectTimeout:
+                error = LLMTimeoutError('LLM API connection timed out')
+            except requests.exceptions.ConnectionError as e:
+                error = LLMError(f'LLM API connection error: {e}')
+            except requests.exceptions.Timeout:
+                # The request was sent and may be generating; sending it again could run it twice
+                self.breaker.record_failure()
+                self._record('failed', None, attempt)
+                raise LLMTimeoutError('LLM API request timed out')
+            except requests.exceptions.RequestException as e:
+                self.breaker.record_failure()
+                self._record('failed', None, attempt)
+                raise LLMError(f'LLM API request failed: {e}')
+            else:
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    held = stream
+                    return response, attempt
+                error = LLMError(f'LLM API error: {response.status_code} - {response.text[:200]}',
+                                 response.status_code)
+                retry_after = response.headers.get('Retry-After')
+                response.close()
+                if response.status_code not in RETRY_STATUSES:
+                    # Client errors (bad request, auth) won't get better with retries
+                    # and say nothing about upstream health
+                    self.breaker.record_success()
+                    self._record('failed', None, attempt)
+                    raise error
+            finally:
+                if not held:
+                    self._slots.release()
+
+            self.breaker.record_failure()
+            delay = self._backoff(attempt, retry_after)
+            if attempt > self.max_retries or time.monotonic() + delay >= deadline_at:
+                self._record('failed', None, attempt)
+                log_error(error, 'llm_client')
+                raise error
+            with self._metrics_lock:
+                self._counters['retries'] += 1
+            time.sleep(delay)
+
+    def _backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, at least Retry-After when the API sends one"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+        try:
+            delay = max(delay, min(float(retry_after), self.backoff_max))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    def _reject(self):
+        with self._metrics_lock:
+            self._counters['rejected'] += 1
+
+    def _record(self, outcome, started, attempts, usage=None, first_token=None):
+        latency = time.perf_counter() - started if started is not None else None
+        with self._metrics_lock:
+            self._counters[outcome] += 1
+            if latency is not None and outcome == 'succeeded':
+                self._latencies.append(latency)
+            if first_token is not None:
+                self._first_tokens.append(first_token)
+            for key in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+                self._counters[key] += int((usage or {}).get(key) or 0)
+        return latency
+
+    def stats(self):
+        with self._metrics_lock:
+            latencies = sorted(self._latencies)
+            first_tokens = sorted(self._first_tokens)
+            counters = dict(self._counters)
+
+        def percentiles(samples):
+            def at(p):
+                if not samples:
+                    return None
+                return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+            return {'p50': at(0.5), 'p95': at(0.95), 'p99': at(0.99)}
+
+        return {
+            **counters,
+            'latency_ms': percentiles(latencies),
+            'first_token_ms': percentiles(first_tokens),
+            'circuit': self.breaker.state,
+            'circuit_opened': self.breaker.times_opened,
+            'max_concurrency': self.max_concurrency,
+            'max_connections': self.max_connections
+        }
+
+
+# Create singleton instance (one pool per worker process)
+llm_client = LLMClient()
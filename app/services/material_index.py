@@ -0,0 +1,501 @@
+"""
+Course Material Index
+Retrieval over a course's materials for the AI chat assistant, fully
+offline.
+
+Indexing: the course overview, each material's title, description and
+text content, and the text of uploaded documents (.txt/.md/.html, .docx
+and .pptx; .pdf when pypdf is installed) are split into overlapping
+word windows. Every chunk is a hashed TF-IDF vector (words and word
+pairs, IDF over the course's own chunks, L2-normalized), stored
+feature-major (an inverted index) next to the chunk text in
+`INDEX_DIR/<course_id>/<version>/*.npy`.
+Versions are switched by renaming a CURRENT pointer, like the course
+recommender's model.
+
+Retrieval memory-maps the course's arrays, scores only the chunks in the
+postings of the question's features and returns the best chunks above
+MIN_SCORE that fit in a token budget.
+
+Each course's index records a fingerprint of its materials. A process
+re-checks it at most every REFRESH_INTERVAL_SECONDS and rebuilds a stale
+index in a background thread while the previous version keeps serving.
+Courses without an index are indexed in the background on first use
+(chat answers without excerpts until it is saved). Run
+tools/build_material_index.py to index every course up front.
+"""
+import hashlib
+import html
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import zipfile
+import zlib
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+import numpy as np
+from bson import ObjectId
+from app.utils.logger import log_error, log_info
+
+INDEX_DIR = os.getenv('MATERIAL_INDEX_DIR', os.path.join('data', 'material_index'))
+UPLOAD_DIR = os.path.join('static', 'uploads', 'materials')
+FEATURE_BITS = 18
+DIMENSIONS = 1 << FEATURE_BITS
+CHUNK_WORDS = 160
+CHUNK_OVERLAP = 40
+TOP_K = int(os.getenv('RAG_TOP_K', '4'))
+TOKEN_BUDGET = int(os.getenv('RAG_TOKEN_BUDGET', '900'))
+MIN_SCORE = 0.05
+MAX_DOCUMENT_BYTES = 20 * 1024 * 1024
+MAX_OPEN_COURSES = 256
+REFRESH_INTERVAL_SECONDS = 30
+KEEP_VERSIONS = 2
+
+TEXT_EXTENSIONS = {'.txt', '.md', '.markdown', '.csv', '.json', '.py', '.js', '.java', '.c', '.cpp', '.sql'}
+HTML_EXTENSIONS = {'.html', '.htm'}
+
+_TOKEN = re.compile(r'[a-z0-9][a-z0-9+#]*')
+_WORD = re.compile(r'\S+')
+_TAG = re.compile(r'<[^>]+>')
+_XML_TEXT = {
+    '.docx': (re.compile(r'^word/document\.xml$'), re.compile(r'<w:t[^>]*>([^<]*)</w:t>|</w:p>')),
+    '.pptx': (re.compile(r'^ppt/slides/slide\d+\.xml$'), re.compile(r'<a:t>([^<]*)</a:t>|</a:p>')),
+}
+_STOPWORDS = frozenset(
+    'a an and are as at be by can do does for from how i in into is it me my of on or so that the '
+    'this to was what when where which who why will with you your'.split()
+)
+
+
+# -- text extraction ----------------------------------------------------
+
+def extract_document_text(path):
+    """Plain text of an uploaded document, or '' for unsupported or unreadable files"""
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if os.path.getsize(path) > MAX_DOCUMENT_BYTES:
+            return ''
+        if extension in TEXT_EXTENSIONS or extension in HTML_EXTENSIONS:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                text = f.read()
+            return html.unescape(_TAG.sub(' ', text)) if extension in HTML_EXTENSIONS else text
+        if extension in _XML_TEXT:
+            # Office Open XML: text runs in the document / slide parts
+            part_name, runs = _XML_TEXT[extension]
+            parts = []
+            with zipfile.ZipFile(path) as archive:
+                for name in sorted(n for n in archive.namelist() if part_name.match(n)):
+                    xml = archive.read(name).decode('utf-8', errors='replace')
+                    parts.append(''.join(m.group(1) if m.group(1) is not None else '\n'
+                                         for m in runs.finditer(xml)))
+            return html.unescape('\n'.join(parts))
+        if extension == '.pdf':
+            try:
+                from pypdf import PdfReader
+            except ImportError:
+                return ''
+            return '\n'.join(page.extract_text() or '' for page in PdfReader(path).pages)
+    except Exception as e:
+        log_error(f"Text extraction failed for {path}: {e}", "material_index.extract_document_text")
+    return ''
+
+
+def _upload_path(material):
+    """Local path of an uploaded material file, or None"""
+    file_url = material.get('file_url') or ''
+    if not file_url.startswith('/static/uploads/materials/'):
+        return None
+    path = os.path.normpath(file_url.lstrip('/'))
+    if os.path.dirname(path) != os.path.normpath(UPLOAD_DIR):
+        return None
+    return path
+
+
+def _course_materials(db, course_id):
+    """Uploaded/linked materials (materials collection) plus lessons embedded in the course"""
+    course = db['courses'].find_one({'_id': ObjectId(course_id)},
+                                    {'title': 1, 'description': 1, 'materials': 1, 'updated_at': 1})
+    if not course:
+        return None, []
+    materials = list(db['materials'].find({'course_id': str(course_id)}).sort('_id', 1))
+    return course, (course.get('materials') or []) + materials
+
+
+def materials_fingerprint(course, materials):
+    """Changes whenever the course text, a material or an uploaded file changes"""
+    material = [course.get('title'), course.get('description')]
+    for item in materials:
+        path = _upload_path(item)
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            stat = None
+        material.append([
+            str(item.get('_id') or item.get('id')), item.get('title'), item.get('description'),
+            item.get('content'), item.get('text'), stat and stat.st_size, stat and stat.st_mtime
+        ])
+    return hashlib.sha256(json.dumps(material, default=str).encode('utf-8')).hexdigest()
+
+
+def iter_course_documents(course, materials):
+    """(material_id, title, text) for everything worth retrieving from a course"""
+    overview = '\n'.join(filter(None, [course.get('title'), course.get('description')]))
+    if overview:
+        yield None, 'Course overview', overview
+    for item in materials:
+        title = item.get('title') or 'Untitled material'
+        parts = [item.get('description'), item.get('content') or item.get('text')]
+        path = _upload_path(item)
+        if path and os.path.exists(path):
+            parts.append(extract_document_text(path))
+        text = '\n'.join(p for p in parts if p)
+        if text.strip():
+            yield str(item.get('_id') or item.get('id')), title, text
+
+
+def chunk_text(text, words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Overlapping windows of `words` words"""
+    tokens = _WORD.findall(text)
+    step = max(1, words - overlap)
+    for start in range(0, max(1, len(tokens) - overlap), step):
+        window = tokens[start:start + words]
+        if window:
+            yield ' '.join(window)
+
+
+def estimate_tokens(text):
+    """Rough LLM token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+# -- vectors -------------------------------------------------------------
+
+def _hash(feature):
+    return zlib.crc32(feature.encode('utf-8')) & (DIMENSIONS - 1)
+
+
+def text_features(text):
+    """Hashed term counts {feature: count} for words and adjacent word pairs"""
+    words = [w for w in _TOKEN.findall(text.lower()) if w not in _STOPWORDS]
+    counts = Counter(_hash(w) for w in words)
+    counts.update(_hash(f"{a} {b}") for a, b in zip(words, words[1:]))
+    return counts
+
+
+def _weights(counts, features, idf):
+    """Sublinear TF times IDF, L2-normalized, for the given sorted features"""
+    values = np.array([1.0 + math.log(counts[f]) for f in features.tolist()], dtype=np.float32) * idf
+    norm = np.linalg.norm(values)
+    return values / norm if norm > 0 else values
+
+
+class MaterialIndex:
+    """Feature-major chunk vectors (an inverted index) and chunk text for one course"""
+
+    _ARRAYS = ('vocabulary', 'idf', 'postings_ptr', 'postings_chunk', 'postings_weight',
+               'text', 'text_offsets', 'tokens')
+
+    def __init__(self, chunks, vocabulary, idf, postings_ptr, postings_chunk, postings_weight,
+                 text, text_offsets, tokens, fingerprint=None, version=None):
+        self.chunks = chunks  # [(material_id, title)] per chunk
+        self.vocabulary = vocabulary  # sorted features that occur in the course
+        self.idf = idf                # IDF per vocabulary entry
+        # Chunks containing vocabulary[i] and their vector weights:
+        # postings_chunk/postings_weight[postings_ptr[i]:postings_ptr[i + 1]]
+        self.postings_ptr = postings_ptr
+        self.postings_chunk = postings_chunk
+        self.postings_weight = postings_weight
+        self.text = text              # UTF-8 bytes of every chunk, concatenated
+        self.text_offsets = text_offsets
+        self.tokens = tokens          # estimated LLM tokens per chunk
+        self.fingerprint = fingerprint
+        self.version = version
+
+    @classmethod
+    def build(cls, documents, fingerprint=None):
+        """Chunk and vectorize (material_id, title, text) documents"""
+        chunks, texts, counts = [], [], []
+        for material_id, title, text in documents:
+            for body in chunk_text(text):
+                chunk = f"{title}: {body}"
+                chunk_counts = text_features(chunk)
+                if not chunk_counts:
+                    continue
+                chunks.append((material_id, title))
+                texts.append(chunk)
+                counts.append(chunk_counts)
+
+        df = Counter(feature for chunk_counts in counts for feature in chunk_counts)
+        vocabulary = np.array(sorted(df), dtype=np.int32)
+        # Smoothed IDF over this course's chunks
+        idf = np.log((1 + len(counts)) / (1 + np.array([df[f] for f in vocabulary.tolist()],
+                                                         dtype=np.float32))) + 1
+        idf = idf.astype(np.float32)
+
+        # Chunk vectors, then transposed so a query only reads its features' postings
+        positions, weights, chunk_ids = [], [], []
+        for chunk, chunk_counts in enumerate(counts):
+            features = np.array(sorted(chunk_counts), dtype=np.int32)
+            features_at = np.searchsorted(vocabulary, features)
+            positions.append(features_at)
+            weights.append(_weights(chunk_counts, features, idf[features_at]))
+            chunk_ids.append(np.full(len(features), chunk, dtype=np.int32))
+        positions = np.concatenate(positions) if positions else np.zeros(0, dtype=np.int64)
+        order = np.argsort(positions, kind='stable')
+        postings_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(positions, minlength=len(vocabulary)), out=postings_ptr[1:])
+
+        encoded = [t.encode('utf-8') for t in texts]
+        return cls(
+            chunks, vocabulary, idf, postings_ptr,
+            np.concatenate(chunk_ids)[order] if chunk_ids else np.zeros(0, dtype=np.int32),
+            np.concatenate(weights)[order] if weights else np.zeros(0, dtype=np.float32),
+            np.frombuffer(b''.join(encoded), dtype=np.uint8).copy(),
+            np.cumsum([0] + [len(t) for t in encoded], dtype=np.int64),
+            np.array([estimate_tokens(t) for t in texts], dtype=np.int32),
+            fingerprint
+        )
+
+    # -- storage --------------------------------------------------------
+
+    def save(self, root):
+        """Write a new version directory and point CURRENT at it"""
+        os.makedirs(root, exist_ok=True)
+        version = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+        path = os.path.join(root, version)
+        os.makedirs(path, exist_ok=True)
+        for name in self._ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(getattr(self, name)))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'chunks': self.chunks, 'fingerprint': self.fingerprint}, f)
+
+        tmp_pointer = os.path.join(root, f"CURRENT.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_pointer, 'w') as f:
+            f.write(version)
+        os.replace(tmp_pointer, os.path.join(root, 'CURRENT'))
+        self.version = version
+
+        # Processes still mapping an older version keep their open files
+        versions = sorted(v for v in os.listdir(root) if os.path.isdir(os.path.join(root, v)))
+        for old in versions[:-KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+        return version
+
+    @staticmethod
+    def current_version(root):
+        try:
+            with open(os.path.join(root, 'CURRENT')) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    @classmethod
+    def load(cls, root, mmap=True):
+        """Memory-map the current version, or None if the course has not been indexed"""
+        version = cls.current_version(root)
+        if not version:
+            return None
+        path = os.path.join(root, version)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+                  for name in cls._ARRAYS}
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        return cls([tuple(c) for c in meta['chunks']], fingerprint=meta['fingerprint'], version=version,
+                   **arrays)
+
+    # -- retrieval ------------------------------------------------------
+
+    def query_vector(self, question):
+        """(vocabulary positions, weights) of a question in this course's IDF space"""
+        counts = text_features(question)
+        features = np.array(sorted(counts), dtype=np.int32)
+        positions = np.searchsorted(self.vocabulary, features)
+        known = positions < len(self.vocabulary)
+        known[known] = self.vocabulary[positions[known]] == features[known]
+        features, positions = features[known], positions[known]
+        return positions, _weights(counts, features, self.idf[positions])
+
+    def search(self, question, top_k=TOP_K, token_budget=TOKEN_BUDGET, min_score=MIN_SCORE):
+        """
+        Best chunks for a question that fit in the token budget
+        Returns:
+            List of {material_id, title, text, score}, best first
+        """
+        positions, weights = self.query_vector(question)
+        if not len(positions):
+            return []
+
+        # Cosine similarity of every chunk sharing a feature with the question
+        chunk_ids, products = [], []
+        for position, weight in zip(positions.tolist(), weights.tolist()):
+            start, end = self.postings_ptr[position], self.postings_ptr[position + 1]
+            chunk_ids.append(self.postings_chunk[start:end])
+            products.append(self.postings_weight[start:end] * weight)
+        touched, inverse = np.unique(np.concatenate(chunk_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(products))
+
+        candidates = min(len(scores), top_k * 4)
+        best = np.argpartition(-scores, candidates - 1)[:candidates]
+        best = best[np.argsort(-scores[best], kind='stable')]
+
+        results, used = [], 0
+        for candidate in best.tolist():
+            chunk, score = int(touched[candidate]), float(scores[candidate])
+            if score < min_score or len(results) >= top_k:
+                break
+            if used + int(self.tokens[chunk]) > token_budget:
+                continue
+            used += int(self.tokens[chunk])
+            material_id, title = self.chunks[chunk]
+            start, end = self.text_offsets[chunk], self.text_offsets[chunk + 1]
+            results.append({
+                'material_id': material_id,
+                'title': title,
+                'text': bytes(self.text[start:end]).decode('utf-8'),
+                'score': round(score, 4)
+            })
+        return results
+
+    def stats(self):
+        return {
+            'chunks': len(self.chunks),
+            'features': int(len(self.vocabulary)),
+            'postings': int(len(self.postings_chunk)),
+            'text_bytes': int(len(self.text)),
+            'version': self.version
+        }
+
+
+def build_course_index(db, course_id, root=INDEX_DIR, force=False):
+    """
+    Index one course's materials
+    Returns:
+        The new MaterialIndex, or None if the course is missing or the saved
+        index is already current (unless `force`)
+    """
+    course, materials = _course_materials(db, course_id)
+    if course is None:
+        return None
+    fingerprint = materials_fingerprint(course, materials)
+    course_root = os.path.join(root, str(course_id))
+    if not force:
+        current = MaterialIndex.load(course_root)
+        if current is not None and current.fingerprint == fingerprint:
+            return None
+    index = MaterialIndex.build(iter_course_documents(course, materials), fingerprint)
+    index.save(course_root)
+    return index
+
+
+class MaterialRetriever:
+    """
+    Per-process cache of memory-mapped course indexes
+    Keeps at most `max_open` courses mapped (least recently used dropped)
+    and checks each course for new versions and changed materials at most
+    once every `refresh_interval` seconds.
+    """
+
+    def __init__(self, root=INDEX_DIR, max_open=MAX_OPEN_COURSES, refresh_interval=REFRESH_INTERVAL_SECONDS):
+        self.root = root
+        self.max_open = max_open
+        self.refresh_interval = refresh_interval
+        self._indexes = OrderedDict()  # course_id -> (MaterialIndex, checked_at)
+        self._lock = threading.Lock()
+        self._course_locks = {}  # course_id -> lock serializing its refresh, dropped with the index
+        self._rebuilding = set()
+
+    def get_index(self, db, course_id):
+        course_id = str(course_id)
+        with self._lock:
+            entry = self._indexes.get(course_id)
+            if entry is not None:
+                self._indexes.move_to_end(course_id)
+            course_lock = self._course_locks.setdefault(course_id, threading.Lock())
+        if entry is not None and time.monotonic() - entry[1] < self.refresh_interval:
+            return entry[0]
+
+        with course_lock:
+            index = self._refresh(db, course_id, entry[0] if entry else None)
+        with self._lock:
+            if index is None:
+                self._indexes.pop(course_id, None)
+                self._drop_course_lock(course_id)
+                return None
+            self._indexes[course_id] = (index, time.monotonic())
+            self._indexes.move_to_end(course_id)
+            while len(self._indexes) > self.max_open:
+                evicted, _ = self._indexes.popitem(last=False)
+                self._drop_course_lock(evicted)
+        return index
+
+    def _drop_course_lock(self, course_id):
+        """Forget a course's refresh lock unless a request holds it (called with _lock held)"""
+        course_lock = self._course_locks.get(course_id)
+        if course_lock is not None and not course_lock.locked():
+            del self._course_locks[course_id]
+
+    def _refresh(self, db, course_id, index):
+        course_root = os.path.join(self.root, course_id)
+        try:
+            if index is None or MaterialIndex.current_version(course_root) != index.version:
+                index = MaterialIndex.load(course_root)
+            if index is None:
+                # First use: extracting every upload can take seconds, so build it off the
+                # request; chat answers without excerpts until the index is saved
+                self._rebuild_in_background(db, course_id)
+                return None
+
+            course, materials = _course_materials(db, course_id)
+            if course is not None and materials_fingerprint(course, materials) != index.fingerprint:
+                self._rebuild_in_background(db, course_id)
+        except Exception as e:
+            log_error(f"{course_id}: {e}", "material_index.refresh")
+        return index
+
+    def _rebuild_in_background(self, db, course_id):
+        with self._lock:
+            if course_id in self._rebuilding:
+                return
+            self._rebuilding.add(course_id)
+
+        def rebuild():
+            try:
+                start = time.perf_counter()
+                index = build_course_index(db, course_id, self.root)
+                if index is not None:
+                    log_info(f"Indexed materials of course {course_id}: {index.stats()['chunks']} chunks "
+                             f"in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                log_error(f"{course_id}: {e}", "material_index.rebuild")
+            finally:
+                with self._lock:
+                    self._rebuilding.discard(course_id)
+                    # Pick up the new version on the next request
+                    entry = self._indexes.get(course_id)
+                    if entry is not None:
+                        self._indexes[course_id] = (entry[0], 0.0)
+
+        threading.Thread(target=rebuild, name=f'material-index-{course_id}', daemon=True).start()
+
+    def retrieve(self, db, course_id, question, top_k=TOP_K, token_budget=TOKEN_BUDGET):
+        """Best material chunks for a question about a course ([] if nothing relevant)"""
+        try:
+            index = self.get_index(db, course_id)
+            return index.search(question, top_k, token_budget) if index is not None else []
+        except Exception as e:
+            log_error(f"{course_id}: {e}", "material_index.retrieve")
+            return []
+
+
+def format_context(chunks):
+    """Numbered excerpts for the system prompt"""
+    return '\n\n'.join(f"[{number}] {chunk['text']}" for number, chunk in enumerate(chunks, start=1))
+
+
+# Create singleton instance (course indexes are memory-mapped per worker process)
+material_retriever = MaterialRetriever()
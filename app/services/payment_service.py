@@ -4,12 +4,13 @@ Handles payment processing and transaction tracking
 """
 from datetime import datetime
 from bson import ObjectId
-import secrets
+from app.services.id_service import IdService
 
 class PaymentService:
     def __init__(self, db):
         self.db = db
         self.payment_collection = db['payments']
+        self.id_service = IdService(db)
         self.enrollment_collection = db['enrollments']
         self.course_collection = db['courses']
         self.users_collection = db['users']
@@ -28,7 +29,7 @@ class PaymentService:
                 return False, 'Student not found', None
             
             # Generate transaction ID
-            transaction_id = f"TXN-{datetime.now().strftime('%Y%m%d%H%M%S')}-{secrets.token_hex(4).upper()}"
+            transaction_id = self.id_service.transaction_id()
             
             payment_doc = {
                 'transaction_id': transaction_id,
@@ -0,0 +1,298 @@
+"""
+Question Bank Service
+Question pools tagged by topic and difficulty, and deterministic per-student
+exam variants.
+
+A bank-based exam stores sampling rules (pool + count) and a random seed.
+Each student's paper is derived from sha256(seed, student_id), so nothing is
+stored per student: the same student always gets the same questions in the
+same order, and grading rebuilds the variant from the seed. Sampling uses a
+sparse Fisher-Yates shuffle, so building a variant is O(questions drawn)
+regardless of pool size.
+"""
+import hashlib
+import json
+import random
+from datetime import datetime
+from bson import ObjectId
+from app.utils.validators import validate_exam_question
+from app.utils.logger import log_error, log_info
+
+MAX_VARIANT_QUESTIONS = 200
+STUDENT_HIDDEN_FIELDS = ('correct_answer', 'explanation')
+
+_indexed_databases = set()
+
+
+def variant_rng(seed, student_id):
+    """Deterministic PRNG for one student's variant"""
+    digest = hashlib.sha256(f"{seed}:{student_id}".encode('utf-8')).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+
+def sample_indices(rng, pool, count):
+    """Draw `count` distinct items from `pool` in O(count) (sparse Fisher-Yates)"""
+    swapped = {}
+    n = len(pool)
+    picked = []
+    for j in range(count):
+        r = rng.randrange(j, n)
+        picked.append(swapped.get(r, r))
+        swapped[r] = swapped.get(j, j)
+    return [pool[i] for i in picked]
+
+
+def variant_question_indices(seed, student_id, rules, shuffle=True):
+    """
+    Rebuild a student's variant as indices into the exam's question pool
+    Args:
+        seed: Exam variant seed
+        student_id: Student ID
+        rules: List of {"count": int, "pool": [pool indices]}
+        shuffle: Shuffle question order across rules
+    """
+    rng = variant_rng(seed, student_id)
+    indices = []
+    picked = set()
+    for rule in rules:
+        rule_pool = rule['pool']
+        if not picked.isdisjoint(rule_pool):
+            # Overlapping rules draw without replacement across the paper
+            rule_pool = [i for i in rule_pool if i not in picked]
+        drawn = sample_indices(rng, rule_pool, rule['count'])
+        picked.update(drawn)
+        indices.extend(drawn)
+    if shuffle:
+        for i in range(len(indices) - 1, 0, -1):
+            j = rng.randrange(0, i + 1)
+            indices[i], indices[j] = indices[j], indices[i]
+    return indices
+
+
+class VariantSource:
+    """
+    Per-exam precomputed data for building variants
+    Holds each pool question's student-facing JSON fragment so a variant's
+    response body is a join of pre-serialized pieces.
+    """
+    def __init__(self, exam, base, response_template):
+        """
+        Args:
+            exam: Serialized exam with question_pool / sampling_rules / variant_seed
+            base: Exam fields shared by every variant (no pool or seed)
+            response_template: Serialized student response with a "__QUESTIONS__"
+                placeholder where the questions array goes
+        """
+        self.seed = exam['variant_seed']
+        self.shuffle = exam.get('shuffle_questions', True)
+        self.rules = [{'count': r['count'], 'pool': r['pool']} for r in exam['sampling_rules']]
+        self.pool = exam['question_pool']
+        self.passing_score_percent = exam.get('passing_score_percent', 70)
+        self.base = base
+        self.fragments = [
+            json.dumps({k: v for k, v in q.items() if k not in STUDENT_HIDDEN_FIELDS}, default=str)
+            for q in self.pool
+        ]
+        self._head, self._tail = response_template.split('"__QUESTIONS__"', 1)
+
+    def indices_for(self, student_id):
+        return variant_question_indices(self.seed, student_id, self.rules, self.shuffle)
+
+    def student_json(self, student_id):
+        """Serialized student response for this student's variant"""
+        indices = self.indices_for(student_id)
+        questions = '[' + ', '.join(self.fragments[i] for i in indices) + ']'
+        return (self._head + questions + self._tail).encode('utf-8')
+
+    def grading_exam(self, student_id):
+        """Exam dict with this student's variant as its questions"""
+        questions = [self.pool[i] for i in self.indices_for(student_id)]
+        total_marks = sum(q.get('marks', 1) for q in questions)
+        exam = dict(self.base)
+        exam['questions'] = questions
+        exam['total_marks'] = total_marks
+        exam['passing_marks'] = round(total_marks * self.passing_score_percent / 100, 2)
+        return exam
+
+
+class QuestionBankService:
+    def __init__(self, db):
+        self.db = db
+        self.bank_collection = db['question_banks']
+        self._create_indexes()
+
+    def _create_indexes(self):
+        # Services are built per request; only the first one per process creates indexes
+        key = (id(self.db.client), self.db.name)
+        if key in _indexed_databases:
+            return
+        self.bank_collection.create_index([('instructor_id', 1)])
+        self.bank_collection.create_index([('course_id', 1)])
+        _indexed_databases.add(key)
+
+    def create_bank(self, instructor_id, data):
+        """
+        Create a question bank
+        Args:
+            instructor_id: Owner
+            data: {title, course_id (optional), questions: [{..., topic, difficulty}]}
+        """
+        try:
+            questions, error = self._prepare_questions(data.get('questions', []))
+            if error:
+                return False, error
+
+            bank = {
+                'instructor_id': ObjectId(instructor_id),
+                'course_id': ObjectId(data['course_id']) if data.get('course_id') else None,
+                'title': data.get('title', 'Question Bank'),
+                'questions': questions,
+                'created_at': datetime.now(),
+                'updated_at': datetime.now()
+            }
+            result = self.bank_collection.insert_one(bank)
+            log_info(f"Question bank {result.inserted_id} created with {len(questions)} questions")
+            return True, str(result.inserted_id)
+
+        except Exception as e:
+            log_error(str(e), "question_bank_service.create_bank")
+            return False, f'Error creating question bank: {str(e)}'
+
+    def add_questions(self, bank_id, instructor_id, questions):
+        """Append questions to a bank owned by the instructor"""
+        try:
+            questions, error = self._prepare_questions(questions)
+            if error:
+                return False, error
+
+            result = self.bank_collection.update_one(
+                {'_id': ObjectId(bank_id), 'instructor_id': ObjectId(instructor_id)},
+                {'$push': {'questions': {'$each': questions}}, '$set': {'updated_at': datetime.now()}}
+            )
+            if result.matched_count == 0:
+                return False, 'Question bank not found'
+            return True, f'{len(questions)} questions added'
+
+        except Exception as e:
+            log_error(str(e), "question_bank_service.add_questions")
+            return False, f'Error adding questions: {str(e)}'
+
+    def get_instructor_banks(self, instructor_id):
+        """List an instructor's banks with per-topic/difficulty counts (no question bodies)"""
+        try:
+            banks = list(self.bank_collection.aggregate([
+                {'$match': {'instructor_id': ObjectId(instructor_id)}},
+                {'$project': {
+                    'title': 1, 'course_id': 1, 'created_at': 1,
+                    'total_questions': {'$size': '$questions'},
+                    'tags': {'$map': {
+                        'input': '$questions',
+                        'as': 'q',
+                        'in': {'topic': '$$q.topic', 'difficulty': '$$q.difficulty'}
+                    }}
+                }}
+            ]))
+
+            for bank in banks:
+                bank['_id'] = str(bank['_id'])
+                bank['course_id'] = str(bank['course_id']) if bank.get('course_id') else None
+                bank['created_at'] = bank['created_at'].isoformat()
+                counts = {}
+                for tag in bank.pop('tags', []):
+                    key = f"{tag.get('topic') or 'general'}/{tag.get('difficulty') or 'any'}"
+                    counts[key] = counts.get(key, 0) + 1
+                bank['question_counts'] = counts
+
+            return True, banks
+
+        except Exception as e:
+            log_error(str(e), "question_bank_service.get_instructor_banks")
+            return False, []
+
+    def resolve_sampling_rules(self, instructor_id, rules):
+        """
+        Resolve sampling rules into a self-contained question pool
+        Args:
+            rules: [{bank_id, topic (optional), difficulty (optional), count}]
+        Returns:
+            Tuple (success, (question_pool, resolved_rules) or error message)
+        """
+        if not rules:
+            return False, 'At least one sampling rule is required'
+
+        bank_ids = list({r.get('bank_id') for r in rules})
+        if not all(ObjectId.is_valid(b) for b in bank_ids):
+            return False, 'Invalid question bank id'
+
+        banks = {
+            str(b['_id']): b for b in self.bank_collection.find({
+                '_id': {'$in': [ObjectId(b) for b in bank_ids]},
+                'instructor_id': ObjectId(instructor_id)
+            })
+        }
+
+        pool = []
+        pool_index = {}
+        resolved = []
+        total = 0
+        for i, rule in enumerate(rules):
+            bank = banks.get(rule.get('bank_id'))
+            if not bank:
+                return False, f'Rule {i+1}: Question bank not found'
+
+            count = int(rule.get('count', 0))
+            if count < 1:
+                return False, f'Rule {i+1}: Count must be at least 1'
+
+            indices = []
+            for question in bank['questions']:
+                if rule.get('topic') and question.get('topic') != rule['topic']:
+                    continue
+                if rule.get('difficulty') and question.get('difficulty') != rule['difficulty']:
+                    continue
+                key = (rule['bank_id'], question['id'])
+                if key not in pool_index:
+                    pool_index[key] = len(pool)
+                    pool.append(question)
+                indices.append(pool_index[key])
+
+            if len(indices) < count:
+                return False, f'Rule {i+1}: Only {len(indices)} matching questions for {count} requested'
+
+            # Earlier overlapping rules may already have drawn shared questions
+            available = len(indices)
+            for earlier in resolved:
+                shared = len(set(indices).intersection(earlier['pool']))
+                available -= min(shared, earlier['count'])
+            if available < count:
+                return False, (f'Rule {i+1}: Overlaps earlier rules; only {available} questions '
+                               f'are guaranteed left for {count} requested')
+
+            total += count
+            resolved.append({
+                'bank_id': rule['bank_id'],
+                'topic': rule.get('topic'),
+                'difficulty': rule.get('difficulty'),
+                'count': count,
+                'pool': indices
+            })
+
+        if total > MAX_VARIANT_QUESTIONS:
+            return False, f'Exam cannot draw more than {MAX_VARIANT_QUESTIONS} questions'
+
+        return True, (pool, resolved)
+
+    def _prepare_questions(self, questions):
+        """Validate questions and give each a stable id"""
+        if not questions:
+            return None, 'At least 1 question is required'
+        prepared = []
+        for i, q in enumerate(questions):
+            is_valid, message = validate_exam_question(q, i + 1)
+            if not is_valid:
+                return None, message
+            q = dict(q)
+            q['id'] = q.get('id') or str(ObjectId())
+            q['marks'] = q.get('marks', 1)
+            prepared.append(q)
+        return prepared, None
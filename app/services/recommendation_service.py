@@ -1,19 +1,19 @@
 """
 Recommendation Service - AI-powered course recommendations using Groq LLM
 """
-import requests
 import os
+from app.services.llm_client import llm_client, LLMError
+from app.services.llm_cache import llm_response_cache, make_key
+from app.services.skill_matcher import SkillIndex
 from app.utils.logger import log_error, log_info
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_API_BASE = "https://api.groq.com/openai/v1/chat/completions"
 MODEL = "llama-3.3-70b-versatile"
 
 class RecommendationService:
     def __init__(self):
         self.api_key = GROQ_API_KEY
         self.model = MODEL
-        self.base_url = GROQ_API_BASE
     
     def recommend_courses(self, user_profile, available_courses=None):
         """
@@ -43,36 +43,17 @@ class RecommendationService:
                 }
             ]
             
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 0.8,
-                "max_tokens": 800,
-                "top_p": 1
-            }
-            
             log_info("Generating course recommendations...")
             
-            response = requests.post(
-                self.base_url,
-                headers=headers,
-                json=payload,
-                timeout=30
+            result = llm_client.chat(
+                messages,
+                model=self.model,
+                temperature=0.8,
+                max_tokens=800,
+                top_p=1
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                recommendations_text = data['choices'][0]['message']['content']
-                log_info("Recommendations generated successfully")
-                return self._parse_recommendations(recommendations_text)
-            else:
-                log_error(f"Groq API error: {response.status_code}", "recommendation_service")
-                return []
+            log_info("Recommendations generated successfully")
+            return self._parse_recommendations(result.content)
         
         except Exception as e:
             log_error(str(e), "recommendation_service")
@@ -158,31 +139,16 @@ Keep it practical and focused on online learning."""
                 }
             ]
             
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1000
-            }
-            
-            response = requests.post(
-                self.base_url,
-                headers=headers,
-                json=payload,
-                timeout=30
+            params = {"temperature": 0.7, "max_tokens": 1000}
+            learning_path = llm_response_cache.get_or_compute(
+                make_key(self.model, messages, **params),
+                lambda: llm_client.chat(messages, model=self.model, **params).content
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                learning_path = data['choices'][0]['message']['content']
-                return {"success": True, "path": learning_path}
-            else:
-                return {"error": "Failed to generate learning path"}
+            return {"success": True, "path": learning_path}
+        
+        except LLMError as e:
+            log_error(f"Groq API error: {e}", "recommendation_service")
+            return {"error": "Failed to generate learning path"}
         
         except Exception as e:
             log_error(str(e), "recommendation_service")
@@ -197,27 +163,21 @@ Keep it practical and focused on online learning."""
         Returns:
             Matched courses with relevance scores
         """
-        # Simple matching based on tags and description
-        matched = []
-        
-        for course in available_courses:
-            score = 0
-            course_text = f"{course.get('title', '')} {course.get('description', '')} {' '.join(course.get('tags', []))}".lower()
-            
-            for skill in target_skills:
-                if skill.lower() in course_text:
-                    score += 1
-            
-            if score > 0:
-                matched.append({
-                    "course": course,
-                    "relevance_score": score
-                })
-        
-        # Sort by relevance
-        matched.sort(key=lambda x: x['relevance_score'], reverse=True)
-        
-        return matched[:10]  # Return top 10 matches
+        # Phrase matching over title, description and tags (see skill_matcher;
+        # the routes use the per-process catalog index instead of a list)
+        index = SkillIndex.build(
+            {'_id': position, 'title': course.get('title'), 'description': course.get('description'),
+             'tags': course.get('tags')}
+            for position, course in enumerate(available_courses)
+        )
+        return [
+            {
+                "course": available_courses[int(position)],
+                "relevance_score": matched,
+                "match_score": score
+            }
+            for position, matched, score in index.match(target_skills, count=10)
+        ]
     
     def get_enrollment_based_recommendations(self, enrolled_courses, all_courses, count=5):
         """
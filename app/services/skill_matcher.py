@@ -0,0 +1,286 @@
+"""
+Skill Matcher
+Matches skills ("python", "machine learning", "node.js") to published
+courses through a positional inverted index over title, description and
+tags, kept in memory per process.
+
+- Text is split into lowercase tokens (trailing plural "s" folded, so
+  "data structure" matches "Data Structures"). Postings are NumPy arrays
+  of (row, position, field weight) grouped by token.
+- A one-word skill is a slice of its token's postings. A multi-word skill
+  intersects the postings of its tokens keyed by (row, position - offset),
+  so only courses containing the phrase are touched and the cost follows
+  the postings of the skill's words rather than the size of the catalog.
+  Fields and tags are separated by a position gap so phrases never span
+  two of them.
+- A course scores its best field weight per skill (title > tags >
+  description); results rank by skills matched, then by weight.
+- Courses changed since the index was built go into a small overlay index
+  and their base rows are masked; the index is rebuilt from the catalog
+  once the overlay grows past a fraction of it.
+"""
+import json
+import re
+import threading
+import time
+import zlib
+from datetime import timedelta
+
+import numpy as np
+from app.services.course_recommender import COURSE_FIELDS, iter_published_courses
+from app.utils.logger import log_error, log_info
+
+FIELD_WEIGHTS = {'title': 3, 'tags': 2, 'description': 1}
+REFRESH_INTERVAL_SECONDS = 30
+REFRESH_OVERLAP = timedelta(minutes=2)
+OVERLAY_REBUILD_RATIO = 0.05   # rebuild once this share of the catalog changed
+OVERLAY_REBUILD_MIN = 1000
+
+_TOKEN = re.compile(r'[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*')
+_POSITION_BITS = 32
+
+
+def tokenize(text):
+    """Lowercase tokens with a trailing plural "s" folded"""
+    tokens = []
+    for token in _TOKEN.findall((text or '').lower()):
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _course_postings(course):
+    """(token, position, field weight) for one course"""
+    position = 0
+    fields = [('title', course.get('title')), ('description', course.get('description'))]
+    fields += [('tags', str(tag)) for tag in course.get('tags') or []]
+    for field, text in fields:
+        for token in tokenize(text):
+            yield token, position, FIELD_WEIGHTS[field]
+            position += 1
+        position += 1  # phrases never span fields or tags
+
+
+def _checksum(course):
+    """Checksum of the indexed fields (skips no-op updates such as enrollments)"""
+    material = json.dumps([course.get('title'), course.get('description'), course.get('tags')], default=str)
+    return zlib.crc32(material.encode('utf-8'))
+
+
+def _is_published(course):
+    return course.get('status') == 'approved' and bool(course.get('is_published'))
+
+
+class SkillIndex:
+    """Positional postings for a fixed set of courses, plus an overlay of later changes"""
+
+    def __init__(self, ids, vocabulary, offsets, rows, positions, weights, checksums, high_water=None):
+        self.ids = list(ids)
+        self.rows = {course_id: row for row, course_id in enumerate(self.ids)}
+        self.vocabulary = vocabulary  # token -> index into offsets
+        self.offsets = offsets
+        self.post_rows = rows
+        self.post_positions = positions
+        self.post_weights = weights
+        self.checksums = checksums
+        self.high_water = high_water  # newest courses.updated_at reflected in the index
+        self.dead = np.zeros(len(self.ids), dtype=bool)
+        self.overlay_courses = {}  # course_id -> (course document, checksum)
+        self.overlay = None        # SkillIndex over overlay_courses
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, courses):
+        """Index an iterable of course documents"""
+        ids, vocabulary, checksums = [], {}, []
+        token_ids, rows, positions, weights = [], [], [], []
+        high_water = None
+        for course in courses:
+            row = len(ids)
+            ids.append(str(course['_id']))
+            checksums.append(_checksum(course))
+            for token, position, weight in _course_postings(course):
+                token_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                rows.append(row)
+                positions.append(position)
+                weights.append(weight)
+            updated_at = course.get('updated_at')
+            if updated_at and (high_water is None or updated_at > high_water):
+                high_water = updated_at
+
+        token_ids = np.array(token_ids, dtype=np.int32)
+        order = np.argsort(token_ids, kind='stable')  # rows and positions stay ascending per token
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(token_ids, minlength=len(vocabulary)), out=offsets[1:])
+        return cls(
+            ids, vocabulary, offsets,
+            np.array(rows, dtype=np.int32)[order],
+            np.array(positions, dtype=np.int32)[order],
+            np.array(weights, dtype=np.int8)[order],
+            np.array(checksums, dtype=np.uint32),
+            high_water
+        )
+
+    # -- changes --------------------------------------------------------
+
+    def apply(self, courses):
+        """Fold changed course documents into the overlay; returns how many were applied"""
+        changed = 0
+        with self._lock:
+            overlay_courses = dict(self.overlay_courses)
+            dead = self.dead.copy()
+            high_water = self.high_water
+            for course in courses:
+                updated_at = course.get('updated_at')
+                if updated_at and (high_water is None or updated_at > high_water):
+                    high_water = updated_at
+
+                course_id = str(course['_id'])
+                row = self.rows.get(course_id)
+                live_row = row is not None and not dead[row]
+                if _is_published(course):
+                    checksum = _checksum(course)
+                    if course_id in overlay_courses:
+                        if overlay_courses[course_id][1] == checksum:
+                            continue
+                    elif live_row and self.checksums[row] == checksum:
+                        continue
+                    overlay_courses[course_id] = (course, checksum)
+                elif course_id in overlay_courses:
+                    del overlay_courses[course_id]
+                elif not live_row:
+                    continue
+                if row is not None:
+                    dead[row] = True
+                changed += 1
+            if changed:
+                overlay = SkillIndex.build(course for course, _ in overlay_courses.values()) \
+                    if overlay_courses else None
+                self.overlay_courses, self.overlay, self.dead = overlay_courses, overlay, dead
+            self.high_water = high_water
+        return changed
+
+    def needs_rebuild(self):
+        return len(self.overlay_courses) > max(OVERLAY_REBUILD_MIN, OVERLAY_REBUILD_RATIO * len(self.ids))
+
+    # -- matching -------------------------------------------------------
+
+    def _postings(self, token):
+        index = self.vocabulary.get(token)
+        if index is None:
+            return None
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.post_rows[start:end], self.post_positions[start:end], self.post_weights[start:end]
+
+    def _match_phrase(self, tokens):
+        """(rows, best field weight per row) of courses containing the token sequence"""
+        postings = [self._postings(token) for token in tokens]
+        if any(p is None for p in postings):
+            return None
+        rows, positions, weights = postings[0]
+        if len(tokens) > 1:
+            keys = (rows.astype(np.int64) << _POSITION_BITS) + positions
+            common = keys
+            for offset, (other_rows, other_positions, _) in enumerate(postings[1:], start=1):
+                other_keys = (other_rows.astype(np.int64) << _POSITION_BITS) + other_positions - offset
+                common = np.intersect1d(common, other_keys, assume_unique=True)
+                if not len(common):
+                    return None
+            mask = np.isin(keys, common, assume_unique=True)
+            rows, weights = rows[mask], weights[mask]
+        if not len(rows):
+            return None
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        best = np.zeros(len(unique_rows), dtype=np.int8)
+        np.maximum.at(best, inverse, weights)
+        return unique_rows, best
+
+    def _scores(self, skill_tokens, dead):
+        """{course_id: (skills matched, summed weight)} from the base arrays and the overlay"""
+        matches = [m for m in (self._match_phrase(tokens) for tokens in skill_tokens) if m is not None]
+        scores = {}
+        if matches:
+            rows = np.concatenate([rows for rows, _ in matches])
+            weights = np.concatenate([weights for _, weights in matches]).astype(np.int32)
+            unique_rows, inverse, counts = np.unique(rows, return_inverse=True, return_counts=True)
+            totals = np.bincount(inverse, weights=weights).astype(np.int32)
+            for row, count, total in zip(unique_rows.tolist(), counts.tolist(), totals.tolist()):
+                if not dead[row]:
+                    scores[self.ids[row]] = (count, total)
+        return scores
+
+    def match(self, skills, count=10):
+        """
+        Courses matching the most skills
+        Returns:
+            List of (course_id, skills matched, weighted score), best first
+        """
+        skill_tokens = list({tuple(tokens) for tokens in (tokenize(skill) for skill in skills) if tokens})
+        with self._lock:
+            overlay, dead = self.overlay, self.dead
+        scores = self._scores(skill_tokens, dead)
+        if overlay is not None:
+            scores.update(overlay._scores(skill_tokens, overlay.dead))
+        ranked = sorted(scores.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+        return [(course_id, matched, score) for course_id, (matched, score) in ranked[:count]]
+
+    def stats(self):
+        return {
+            'courses': len(self.ids) - int(self.dead.sum()) + len(self.overlay_courses),
+            'tokens': len(self.vocabulary),
+            'postings': int(len(self.post_rows)),
+            'overlay': len(self.overlay_courses),
+            'bytes': int(self.offsets.nbytes + self.post_rows.nbytes + self.post_positions.nbytes
+                         + self.post_weights.nbytes)
+        }
+
+
+class SkillMatcher:
+    """
+    Per-process holder of the skill index
+    Builds it from the published catalog on first use and applies course
+    changes since its high-water mark at most once every `refresh_interval`
+    seconds.
+    """
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL_SECONDS):
+        self.refresh_interval = refresh_interval
+        self.index = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_index(self, db):
+        if self.index is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            with self._lock:
+                if self.index is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+                    self._refresh(db)
+        return self.index
+
+    def _refresh(self, db):
+        try:
+            if self.index is None or self.index.needs_rebuild():
+                start = time.perf_counter()
+                self.index = SkillIndex.build(iter_published_courses(db))
+                log_info(f"Skill index built: {self.index.stats()} in {time.perf_counter() - start:.1f}s")
+            elif self.index.high_water:
+                self.index.apply(db['courses'].find(
+                    {'updated_at': {'$gte': self.index.high_water - REFRESH_OVERLAP}}, COURSE_FIELDS
+                ))
+        except Exception as e:
+            log_error(e, "skill_matcher.refresh")
+        self._refreshed_at = time.monotonic()
+
+    def match(self, db, skills, count=10):
+        """(course_id, skills matched, weighted score) tuples, best first"""
+        index = self.get_index(db)
+        if index is None:
+            return []
+        return index.match(skills, count)
+
+    def stats(self):
+        return self.index.stats() if self.index else None
+
+
+# Create singleton instance (one index per worker process)
+skill_matcher = SkillMatcher()
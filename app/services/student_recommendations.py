@@ -0,0 +1,218 @@
+"""
+Student Recommendations
+Precomputed, ranked recommendation lists per student.
+
+`build` runs nightly across every active student in a process pool. The
+parent pages through student ids and hands out batches; each worker
+process opens its own MongoClient and memory-maps the saved course model
+(the pages are shared between workers through the OS page cache). Per
+batch a worker reads the students' enrollments and the enrolled courses'
+neighbor lists in one query each, scores every student in memory and
+bulk-writes the lists into `student_recommendations` (`_id` = student id)
+tagged with the run's `generation` timestamp.
+
+Serving is one `_id` read. Students without a list (new accounts) or
+whose list was invalidated by an enrollment are scored live and the
+result is stored, so the next request is a single read again.
+
+Every list records `computed_at`, the time its enrollments were read. A
+write only replaces an older list, so a batch that read enrollments
+before a student enrolled cannot overwrite the invalidation.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.services.course_neighbors import ACTIVE, CourseNeighborService
+from app.services.course_recommender import (
+    CourseVectorModel, course_recommender, iter_published_courses
+)
+from app.utils.logger import log_error, log_info
+
+LIST_SIZE = 10       # stored per student; the endpoint serves the first available ones
+BATCH_SIZE = 500     # students per worker task
+
+ACTIVE_STUDENTS = {'role': 'student', 'is_active': {'$ne': False}}
+
+
+class StudentRecommendationService:
+    def __init__(self, db):
+        self.db = db
+        self.collection = db['student_recommendations']
+        self.enrollments = db['enrollments']
+        self.neighbors = CourseNeighborService(db)
+
+    # -- serving --------------------------------------------------------
+
+    def get_recommendations(self, student_id, count=LIST_SIZE):
+        """Ranked course ids for a student: the stored list, or scored live if there is none"""
+        student_id = str(student_id)
+        try:
+            doc = self.collection.find_one({'_id': student_id}, {'course_ids': 1})
+            if doc and doc.get('course_ids') is not None:
+                return doc['course_ids'][:count]
+        except Exception as e:
+            log_error(str(e), "student_recommendations.get_recommendations")
+
+        computed_at = datetime.utcnow()
+        course_ids = self.enrollments.distinct('course_id', {'student_id': student_id, **ACTIVE})
+        recommended = self.neighbors.recommend(course_ids, count=LIST_SIZE)
+        try:
+            self._store(student_id, recommended, computed_at, generation=None)
+        except DuplicateKeyError:
+            pass  # a newer list was written meanwhile
+        except Exception as e:
+            log_error(str(e), "student_recommendations.get_recommendations")
+        return recommended[:count]
+
+    def invalidate(self, student_ids):
+        """Drop the stored lists of students whose enrollments changed"""
+        student_ids = [str(s) for s in student_ids]
+        if not student_ids:
+            return
+        now = datetime.utcnow()
+        try:
+            # Leave a marker newer than any batch still scoring these students
+            self.collection.bulk_write([
+                UpdateOne({'_id': student_id},
+                          {'$set': {'course_ids': None, 'computed_at': now, 'generated_at': now}},
+                          upsert=True)
+                for student_id in student_ids
+            ], ordered=False)
+        except Exception as e:
+            log_error(str(e), "student_recommendations.invalidate")
+
+    def _store(self, student_id, course_ids, computed_at, generation):
+        self.collection.replace_one(
+            {'_id': student_id, 'computed_at': {'$lt': computed_at}},
+            _list_doc(course_ids, computed_at, generation),
+            upsert=True
+        )
+
+    # -- batch job ------------------------------------------------------
+
+    def build(self, processes=None, batch_size=BATCH_SIZE, mongo_uri=None, progress=None):
+        """
+        Recompute the lists of all active students
+        Args:
+            processes: Worker processes (0 = score in this process)
+            mongo_uri: Server the workers connect to (default MONGO_URI)
+            progress: Optional callback(students done, lists written)
+        Returns:
+            (success, summary dict or error message)
+        """
+        try:
+            generation = datetime.utcnow()
+            if processes is None:
+                processes = os.cpu_count() or 1
+
+            # Workers map the saved model instead of each building one (and the
+            # in-process scorer only builds in the background without it)
+            if not CourseVectorModel.current_version(course_recommender.root):
+                CourseVectorModel.build(iter_published_courses(self.db)).save(course_recommender.root)
+
+            batches = _batches(
+                (str(user['_id']) for user in
+                 self.db['users'].find(ACTIVE_STUDENTS, {'_id': 1}).sort('_id', 1).batch_size(10000)),
+                batch_size
+            )
+            students = written = 0
+            if processes:
+                with ProcessPoolExecutor(
+                    max_workers=processes, initializer=_init_worker,
+                    initargs=(mongo_uri or os.getenv('MONGO_URI', 'mongodb://localhost:27017'), self.db.name)
+                ) as pool:
+                    for done, stored in pool.map(_build_batch, batches, repeat(generation)):
+                        students, written = students + done, written + stored
+                        if progress:
+                            progress(students, written)
+            else:
+                for batch in batches:
+                    done, stored = self.build_batch(batch, generation)
+                    students, written = students + done, written + stored
+                    if progress:
+                        progress(students, written)
+
+            # Students who are no longer active
+            removed = self.collection.delete_many({'generated_at': {'$lt': generation}}).deleted_count
+            self.db['batch_jobs'].update_one(
+                {'_id': 'student_recommendations'},
+                {'$set': {'generation': generation, 'completed_at': datetime.utcnow(), 'students': students}},
+                upsert=True
+            )
+            summary = {'generation': generation.isoformat(), 'students': students, 'written': written,
+                       'removed': removed}
+            log_info(f"Student recommendations built: {summary}")
+            return True, summary
+        except Exception as e:
+            log_error(str(e), "student_recommendations.build")
+            return False, str(e)
+
+    def build_batch(self, student_ids, generation):
+        """Score and store one batch of students; returns (students, lists written)"""
+        computed_at = datetime.utcnow()
+        enrolled = {student_id: [] for student_id in student_ids}
+        for row in self.enrollments.find({'student_id': {'$in': student_ids}, **ACTIVE},
+                                         {'student_id': 1, 'course_id': 1, '_id': 0}):
+            enrolled[row['student_id']].append(row['course_id'])
+
+        neighbor_lists = self.neighbors.get_neighbor_lists(
+            {course_id for course_ids in enrolled.values() for course_id in course_ids}
+        )
+        requests = [
+            ReplaceOne(
+                {'_id': student_id, 'computed_at': {'$lt': computed_at}},
+                _list_doc(self.neighbors.recommend(course_ids, LIST_SIZE, neighbor_lists), computed_at,
+                          generation),
+                upsert=True
+            )
+            for student_id, course_ids in enrolled.items()
+        ]
+        if not requests:
+            return 0, 0
+        try:
+            result = self.collection.bulk_write(requests, ordered=False)
+            written = result.upserted_count + result.modified_count
+        except BulkWriteError as e:
+            # 11000: the student's list was invalidated after this batch read enrollments
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+            written = e.details.get('nUpserted', 0) + e.details.get('nModified', 0)
+        return len(requests), written
+
+
+def _list_doc(course_ids, computed_at, generation):
+    return {
+        'course_ids': [str(c) for c in course_ids],
+        'generation': generation,
+        'computed_at': computed_at,
+        'generated_at': datetime.utcnow()
+    }
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Worker process state (set by the pool initializer)
+_worker_service = None
+
+
+def _init_worker(mongo_uri, database_name):
+    global _worker_service
+    _worker_service = StudentRecommendationService(MongoClient(mongo_uri)[database_name])
+
+
+def _build_batch(student_ids, generation):
+    """Runs in a worker process"""
+    return _worker_service.build_batch(student_ids, generation)
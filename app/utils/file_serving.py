@@ -0,0 +1,60 @@
+"""
+File Serving Helpers
+Send versioned, never-changing files (rendered certificates) with caching
+headers, ETag/304 and range support, optionally handing the transfer to the
+front web server.
+
+Modes (FILE_SENDFILE_MODE):
+- ''           Flask streams the file (conditional + range handled by Werkzeug)
+- 'x-sendfile' Apache/lighttpd: X-Sendfile header with the absolute path
+- 'x-accel'    nginx: X-Accel-Redirect to FILE_ACCEL_PREFIX + path relative
+               to FILE_ACCEL_ROOT (mapped to an `internal` location)
+"""
+import os
+from flask import current_app, request, send_file, Response
+from werkzeug.utils import send_file as werkzeug_send_file
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def send_versioned_file(file_path, download_name, version, mimetype='application/pdf', private=True):
+    """
+    Send a file whose content never changes for a given version
+    Requests that carry the current version as `?v=` get a one-year
+    immutable response; other requests must revalidate, which costs a 304
+    when the client already has the file.
+    """
+    mode = current_app.config.get('FILE_SENDFILE_MODE', '')
+
+    if mode == 'x-accel':
+        root = current_app.config.get('FILE_ACCEL_ROOT') or os.getcwd()
+        relative = os.path.relpath(os.path.abspath(file_path), os.path.abspath(root)).replace(os.sep, '/')
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = current_app.config.get('FILE_ACCEL_PREFIX', '/protected/') + relative
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        response.set_etag(version)
+        response.make_conditional(request)
+    elif mode == 'x-sendfile':
+        response = werkzeug_send_file(
+            os.path.abspath(file_path), request.environ, mimetype=mimetype,
+            as_attachment=True, download_name=download_name,
+            conditional=True, etag=version, use_x_sendfile=True,
+            response_class=current_app.response_class
+        )
+    else:
+        response = send_file(
+            file_path, mimetype=mimetype, as_attachment=True, download_name=download_name,
+            conditional=True, etag=version
+        )
+
+    response.cache_control.private = private
+    response.cache_control.public = not private
+    if request.args.get('v') == version:
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = None
+        response.cache_control.no_cache = True
+    response.expires = None
+    return response
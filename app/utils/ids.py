@@ -0,0 +1,89 @@
+"""
+ID Helpers
+Human-readable identifiers without a database round trip per ID.
+
+- Sequence numbers come from `counters` documents. Each process reserves a
+  block of numbers with one atomic find_one_and_update ($inc by the block
+  size) and hands them out from memory, so only one allocation in
+  `block_size` touches the database. Numbers are unique across processes;
+  they are not strictly ordered between processes, and the unused part of a
+  block is skipped when a process exits.
+- Time-ordered IDs are a fresh ObjectId (timestamp, per-process random
+  value, counter) written in Crockford base32, so they sort by creation time
+  and need no database at all.
+"""
+import os
+import threading
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+DEFAULT_BLOCK_SIZE = 100
+
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+class SequenceBlockAllocator:
+    """Hands out one counter's values from a reserved in-memory block"""
+    def __init__(self, collection, name, block_size=DEFAULT_BLOCK_SIZE):
+        self.collection = collection
+        self.name = name
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0  # exclusive
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _reserve_block(self):
+        counter = self.collection.find_one_and_update(
+            {'_id': self.name},
+            {'$inc': {'seq': self.block_size}, '$set': {'updated_at': datetime.now()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._end = counter['seq'] + 1
+        self._next = self._end - self.block_size
+
+    def next(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked (e.g. preloaded app server workers): the parent's block is not ours
+                self._pid = os.getpid()
+                self._next = self._end = 0
+            if self._next >= self._end:
+                self._reserve_block()
+            value = self._next
+            self._next += 1
+            return value
+
+
+def get_allocator(db, name, block_size=DEFAULT_BLOCK_SIZE):
+    """Process-wide allocator for a counter (services are built per request)"""
+    key = (id(db.client), db.name, name)
+    allocator = _allocators.get(key)
+    if allocator is None:
+        with _allocators_lock:
+            allocator = _allocators.get(key)
+            if allocator is None:
+                allocator = SequenceBlockAllocator(db['counters'], name, block_size)
+                _allocators[key] = allocator
+    return allocator
+
+
+def time_ordered_id(prefix=None):
+    """Unique ID that sorts by creation time, e.g. TXN-06F2K8Q3V1M0R4T7B9C2"""
+    value = int.from_bytes(ObjectId().binary, 'big')
+    chars = []
+    for _ in range(20):  # 96 bits -> 20 base32 digits
+        value, digit = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[digit])
+    encoded = ''.join(reversed(chars))
+    return f"{prefix}-{encoded}" if prefix else encoded
+
+
+def certificate_number(db):
+    """Certificate ID, e.g. CERT-20250114-0001234"""
+    return f"CERT-{datetime.now().strftime('%Y%m%d')}-{get_allocator(db, 'certificate_number').next():07d}"
@@ -0,0 +1,75 @@
+"""
+Pagination Utility
+Keyset ("cursor") pagination helpers.
+A cursor encodes the sort value and _id of the last row returned, so the
+next page is a range query on an index instead of a growing skip().
+"""
+import base64
+from bson import json_util
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(value, doc_id):
+    """Opaque cursor for the row after (value, doc_id)"""
+    raw = json_util.dumps([value, doc_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from encode_cursor
+    Returns: Tuple (sort value, _id)
+    Raises: ValueError if the cursor is malformed
+    """
+    try:
+        value, doc_id = json_util.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return value, doc_id
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def keyset_filter(field, value, doc_id, descending=True):
+    """Query for rows strictly after (value, doc_id) in (field, _id) order"""
+    op = '$lt' if descending else '$gt'
+    return {'$or': [
+        {field: {op: value}},
+        {field: value, '_id': {op: doc_id}}
+    ]}
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Clamp a page size from a query string"""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+def paginate(collection, query, sort_field, descending=True, limit=None, cursor=None, projection=None):
+    """
+    Fetch one page ordered by (sort_field, _id)
+    Args:
+        limit: Page size (None returns every remaining row)
+        cursor: Cursor from a previous page
+    Returns:
+        Tuple (documents, next cursor or None)
+    """
+    if cursor:
+        value, doc_id = decode_cursor(cursor)
+        query = {'$and': [query, keyset_filter(sort_field, value, doc_id, descending)]}
+
+    direction = -1 if descending else 1
+    results = collection.find(query, projection).sort([(sort_field, direction), ('_id', direction)])
+    if limit:
+        results = results.limit(limit + 1)
+    docs = list(results)
+
+    next_cursor = None
+    if limit and len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last['_id'])
+    return docs, next_cursor
@@ -0,0 +1,32 @@
+"""
+Server-Sent Events
+Streams text chunks to the browser as `token` events followed by `done`.
+"""
+import json
+from flask import Response
+
+
+def iter_sse(chunks):
+    """
+    Serialize text chunks as SSE events
+    The leading comment gets the response headers out before the first chunk
+    is ready. When the client disconnects the server closes this generator,
+    which closes `chunks` (and with it any upstream request).
+    """
+    try:
+        yield ': stream open\n\n'
+        for chunk in chunks:
+            yield f"event: token\ndata: {json.dumps({'content': chunk})}\n\n"
+        yield 'event: done\ndata: {}\n\n'
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
+def sse_response(chunks):
+    """Streaming text/event-stream response for an iterable of text chunks"""
+    response = Response(iter_sse(chunks), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
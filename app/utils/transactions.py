@@ -0,0 +1,39 @@
+"""
+Transaction Helpers
+Multi-document transactions are only available on replica sets / sharded
+clusters; standalone servers fall back to plain writes.
+"""
+from app.utils.logger import log_warning
+
+_support_cache = {}
+
+
+def supports_transactions(client):
+    """
+    Check (once per client) whether the server accepts multi-document transactions
+    Args:
+        client: pymongo MongoClient
+    """
+    key = id(client)
+    if key not in _support_cache:
+        try:
+            hello = client.admin.command('hello')
+            _support_cache[key] = bool(hello.get('setName')) or hello.get('msg') == 'isdbgrid'
+        except Exception as e:
+            log_warning(f"Could not detect transaction support: {e}")
+            _support_cache[key] = False
+    return _support_cache[key]
+
+
+def run_in_transaction(client, callback):
+    """
+    Run callback(session) inside a transaction, retrying transient errors
+    Falls back to callback(None) when transactions are unavailable.
+    Returns:
+        Whatever callback returns
+    """
+    if not supports_transactions(client):
+        return callback(None)
+
+    with client.start_session() as session:
+        return session.with_transaction(callback)
@@ -0,0 +1,106 @@
+"""
+Upload Parser
+Streams email lists out of CSV/JSON uploads without loading whole files,
+and streams result rows back out as NDJSON or CSV
+"""
+import csv
+import io
+import json
+
+
+def iter_csv_emails(lines):
+    """
+    Yield emails from CSV lines
+    Accepts an optional header row; the column named "email" is used if present,
+    otherwise the first column.
+    Args:
+        lines: Iterable of text lines (file object, request stream wrapper, list)
+    """
+    reader = csv.reader(lines)
+    column = 0
+    first = True
+
+    for row in reader:
+        if not row:
+            continue
+
+        if first:
+            first = False
+            header = [cell.strip().lower() for cell in row]
+            if 'email' in header:
+                column = header.index('email')
+                continue
+
+        if column < len(row):
+            yield row[column].strip()
+
+
+def iter_json_emails(data):
+    """
+    Yield emails from a JSON payload
+    Accepts ["a@x.com", ...], [{"email": "a@x.com"}, ...] or {"emails": [...]}
+    """
+    if isinstance(data, dict):
+        data = data.get('emails', [])
+
+    for item in data or []:
+        if isinstance(item, dict):
+            item = item.get('email', '')
+        yield str(item).strip()
+
+
+def iter_request_emails(request):
+    """
+    Yield emails from a Flask request
+    Supports multipart file upload (field "file"), raw text/csv body and JSON.
+    The CSV body is read line by line from the WSGI input stream.
+    """
+    content_type = request.content_type or ''
+
+    if 'multipart/form-data' in content_type:
+        upload = request.files.get('file')
+        if not upload:
+            return iter(())
+        text = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        if (upload.filename or '').lower().endswith('.json'):
+            return iter_json_emails(json.load(text))
+        return iter_csv_emails(text)
+
+    if 'application/json' in content_type:
+        return iter_json_emails(request.get_json(silent=True))
+
+    text = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    return iter_csv_emails(text)
+
+
+def iter_ndjson(rows, status_key='status'):
+    """
+    Serialize result rows as newline-delimited JSON
+    A final {"summary": {...}} line counts rows per status.
+    """
+    summary = {}
+    for row in rows:
+        status = row.get(status_key)
+        summary[status] = summary.get(status, 0) + 1
+        yield json.dumps(row, default=str) + '\n'
+
+    yield json.dumps({'summary': summary}) + '\n'
+
+
+def iter_csv(rows, columns):
+    """
+    Serialize dict rows as CSV, one line at a time
+    Args:
+        rows: Iterable of dictionaries
+        columns: List of (header, key) pairs
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow([header for header, _ in columns])
+    for row in rows:
+        writer.writerow(['' if row.get(key) is None else row.get(key) for _, key in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
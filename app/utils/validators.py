@@ -128,6 +128,27 @@ def validate_enrollment_data(data):
     required_fields = ['student_id', 'course_id']
     return validate_required_fields(data, required_fields)
 
+def validate_exam_question(question, number):
+    """
+    Validate a single exam / question bank question
+    Args:
+        question: Question dictionary
+        number: 1-based question number used in error messages
+    Returns: Tuple (is_valid, error_message)
+    """
+    marks = question.get('marks', 1)
+    if marks < 1 or marks > 100:
+        return False, f'Question {number}: Marks must be between 1 and 100'
+    
+    if not question.get('question'):
+        return False, f'Question {number}: Question text is required'
+    if not question.get('options') or len(question.get('options')) < 2:
+        return False, f'Question {number}: At least 2 options are required'
+    if question.get('correct_answer') is None:
+        return False, f'Question {number}: Correct answer must be specified'
+    
+    return True, "Question is valid"
+
 def sanitize_string(text, max_length=None):
     """
     Sanitize string input (remove dangerous characters)
@@ -0,0 +1,35 @@
+"""
+Item statistics backfill
+Rebuilds exam_item_stats from existing submissions in one streaming pass.
+Usage:
+    python tools/backfill_item_stats.py            # every exam
+    python tools/backfill_item_stats.py <exam_id>  # a single exam
+"""
+import argparse
+import os
+import sys
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.item_analysis_service import ItemAnalysisService
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild per-question exam statistics')
+    parser.add_argument('exam_id', nargs='?')
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    db = client[os.getenv('DATABASE_NAME', 'online_course_platform')]
+
+    count = ItemAnalysisService(db).rebuild(args.exam_id)
+    print(f"✅ Rebuilt item statistics for {count} exam(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Certificate render benchmark
+Compares the previous renderer (PNG template opened and re-embedded for
+every PDF) with the cached background (template scaled and JPEG-encoded
+once per process). Reports certificates/sec and average file size.
+Usage:
+    python tools/bench_certificate_render.py [--count 200]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import certificate_renderer
+
+
+def legacy_create_pdf(certificate_data, file_path):
+    """Renderer as it was before the background cache"""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.colors import black
+    from PIL import Image
+
+    c = canvas.Canvas(file_path, pagesize=A4)
+    width, height = A4
+
+    template_path = certificate_renderer.TEMPLATE_PATH
+    img = Image.open(template_path)
+    img_width, img_height = img.size
+    scale = min(width / img_width, height / img_height)
+    new_width = img_width * scale
+    new_height = img_height * scale
+    x = (width - new_width) / 2
+    y = (height - new_height) / 2
+    c.drawImage(template_path, x, y, width=new_width, height=new_height, preserveAspectRatio=True, mask='auto')
+
+    c.setFillColor(black)
+    c.setFont('Helvetica-Bold', 32)
+    c.drawCentredString(width/2, height * 0.45, certificate_data.get('student_name', '').upper())
+    c.setFont('Helvetica', 13)
+    c.drawCentredString(width/2, height * 0.38, '"Awarded in recognition of outstanding performance in the')
+    c.drawCentredString(width/2, height * 0.35, f"completion of the {certificate_data.get('course_title', '')} course on 2025.")
+    c.showPage()
+    c.save()
+    return True
+
+
+def run(label, render, count, out_dir):
+    sizes = 0
+    start = time.perf_counter()
+    for i in range(count):
+        path = os.path.join(out_dir, f"{label}-{i}.pdf")
+        render({
+            'certificate_id': f"BENCH-{i:06d}",
+            'student_name': f"Student {i}",
+            'course_title': 'Introduction to Benchmarking',
+            'issued_date': datetime.now()
+        }, path)
+        sizes += os.path.getsize(path)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<8} {count / elapsed:8.1f} certificates/sec   avg size {sizes / count / 1024:8.1f} KB")
+    return count / elapsed, sizes / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark certificate PDF rendering')
+    parser.add_argument('--count', type=int, default=200)
+    args = parser.parse_args()
+
+    if not certificate_renderer.REPORTLAB_AVAILABLE:
+        print("❌ reportlab is not installed")
+        return
+    if not os.path.exists(certificate_renderer.TEMPLATE_PATH):
+        print(f"❌ Template not found at {certificate_renderer.TEMPLATE_PATH}")
+        return
+
+    out_dir = tempfile.mkdtemp(prefix='cert-bench-')
+    try:
+        print(f"Rendering {args.count} certificates per variant")
+        legacy_rate, legacy_size = run('legacy', legacy_create_pdf, args.count, out_dir)
+
+        start = time.perf_counter()
+        certificate_renderer.get_background(certificate_renderer.A4)
+        print(f"  background prepared in {(time.perf_counter() - start) * 1000:.0f} ms (once per process)")
+        cached_rate, cached_size = run('cached', certificate_renderer.create_pdf, args.count, out_dir)
+
+        print(f"✅ {cached_rate / legacy_rate:.1f}x throughput, {legacy_size / cached_size:.1f}x smaller files")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Chat streaming benchmark
+Serves the app on a local port with Groq pointed at a fake streaming
+server, then compares /api/ai/chat time-to-first-byte and time-to-first-
+token with and without "stream": true. Also checks that closing the
+browser connection mid-reply cancels the upstream generation.
+Usage:
+    python tools/bench_chat_stream.py [--requests 10] [--first-token 0.3] [--tokens 100] [--token-delay 0.02]
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from check_llm_client import FakeLLMServer
+
+
+def post_chat(port, token, stream):
+    """Returns (time to first byte, time to first token, total time) in seconds"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    body = json.dumps({'message': 'What is recursion?', 'stream': stream})
+    start = time.perf_counter()
+    connection.request('POST', '/api/ai/chat', body=body, headers={
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json'
+    })
+    response = connection.getresponse()
+    first_byte = time.perf_counter() - start
+    first_token = None
+    if stream:
+        for line in response:
+            if first_token is None and line.startswith(b'event: token'):
+                first_token = time.perf_counter() - start
+    else:
+        response.read()
+        first_token = time.perf_counter() - start
+    total = time.perf_counter() - start
+    connection.close()
+    return first_byte, first_token, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure chat time-to-first-byte with and without streaming')
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--first-token', type=float, default=0.3, help='Fake model delay before the first token')
+    parser.add_argument('--tokens', type=int, default=100)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    args = parser.parse_args()
+
+    fake = FakeLLMServer(stream_tokens=args.tokens, token_delay=args.token_delay).start()
+    os.environ['GROQ_API_KEY'] = 'bench'
+    os.environ['GROQ_API_BASE'] = fake.url
+
+    from werkzeug.serving import make_server
+    from app import create_app
+    from app.services.llm_client import llm_client
+    from app.utils.jwt_helper import generate_token
+
+    app = create_app('testing')
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    token = generate_token({'_id': 'bench-user', 'role': 'student'})
+
+    results = {}
+    for stream in (False, True):
+        # Without streaming the whole completion is generated before the first byte
+        fake.latency = args.first_token + (0 if stream else args.tokens * args.token_delay)
+        samples = [post_chat(port, token, stream) for _ in range(args.requests)]
+        results[stream] = [statistics.median(column) * 1000 for column in zip(*samples)]
+
+    print(f"{'mode':<12}{'TTFB ms':>10}{'first token ms':>16}{'total ms':>10}")
+    for stream, (first_byte, first_token, total) in results.items():
+        print(f"{'stream' if stream else 'buffered':<12}{first_byte:>10.0f}{first_token:>16.0f}{total:>10.0f}")
+    print(f"✅ First token {results[False][1] / results[True][1]:.1f}x sooner with streaming")
+
+    # Cancellation: hang up after the first token, the upstream stream must be dropped
+    fake.latency = args.first_token
+    cancelled_before = fake.streams_cancelled
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    connection.request('POST', '/api/ai/chat', body=json.dumps({'message': 'cancel me', 'stream': True}),
+                       headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    for line in response:
+        if line.startswith(b'event: token'):
+            break
+    response.close()
+    connection.close()
+
+    deadline = time.time() + args.tokens * args.token_delay + 2
+    while fake.streams_cancelled == cancelled_before and time.time() < deadline:
+        time.sleep(0.05)
+    ok = fake.streams_cancelled > cancelled_before
+    if ok:
+        print(f"✅ Client disconnect cancelled the upstream stream ({llm_client.stats()['cancelled']} cancelled)")
+    else:
+        print("❌ Upstream stream kept generating after the client disconnected")
+
+    server.shutdown()
+    fake.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Enrollment throughput benchmark
+Enrolls N students into one course from a thread pool and reports
+enrollments/second. Every student is enrolled twice to exercise the
+unique-index duplicate path. Runs against a throwaway database.
+Usage:
+    python tools/bench_enrollment.py --students 2000 --workers 32
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from pymongo import MongoClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.enrollment_service import EnrollmentService
+from app.utils.transactions import supports_transactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark concurrent enrollments')
+    parser.add_argument('--uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=32)
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    db_name = f"bench_enrollment_{int(time.time())}"
+    db = client[db_name]
+
+    try:
+        now = datetime.utcnow()
+        course_id = db.courses.insert_one({
+            'title': 'Benchmark Course', 'price': 0, 'is_published': True,
+            'status': 'approved', 'students': [], 'total_enrollments': 0,
+            'created_at': now, 'updated_at': now
+        }).inserted_id
+        student_ids = db.users.insert_many([
+            {'name': f'Student {i}', 'email': f'bench{i}@example.com', 'role': 'student',
+             'enrolled_courses': [], 'is_active': True, 'created_at': now}
+            for i in range(args.students)
+        ]).inserted_ids
+
+        service = EnrollmentService(db)
+        attempts = [str(s) for s in student_ids] * 2
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(lambda s: service.enroll_student(s, str(course_id))[0], attempts))
+        elapsed = time.perf_counter() - start
+
+        course = db.courses.find_one({'_id': course_id})
+        print(f"transactions:       {supports_transactions(client)}")
+        print(f"attempts:           {len(attempts)} ({args.workers} workers)")
+        print(f"successful:         {sum(results)}")
+        print(f"enrollment docs:    {db.enrollments.count_documents({})}")
+        print(f"course counter:     {course['total_enrollments']}")
+        print(f"elapsed:            {elapsed:.2f}s")
+        print(f"enrollments/sec:    {sum(results) / elapsed:.0f}")
+    finally:
+        client.drop_database(db_name)
+
+
+if __name__ == '__main__':
+    main()
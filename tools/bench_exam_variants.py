@@ -0,0 +1,113 @@
+"""
+Question-bank variant benchmark
+Builds a bank exam in memory, then for N students generates each student's
+paper (the JSON the exam page receives), rebuilds the variant for grading
+and grades a simulated submission. Also grades all submissions in batches
+the way the regrade job does. No database writes are made.
+Usage:
+    python tools/bench_exam_variants.py --students 10000 --pool 2000 --draw 40
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import MongoClient
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.exam_snapshot_cache import build_snapshot
+from app.services.grading_service import AnswerKey, GradingService
+from app.services.question_bank_service import variant_question_indices
+
+
+def build_exam(pool_size, draw, topics):
+    """Bank exam with `topics` rules drawing `draw` questions in total"""
+    pool = [
+        {'id': str(ObjectId()), 'question': f'Question {i}?', 'options': ['A', 'B', 'C', 'D'],
+         'correct_answer': i % 4, 'marks': 1 + i % 3, 'topic': f'topic-{i % topics}',
+         'difficulty': ('easy', 'medium', 'hard')[i % 3], 'explanation': 'x' * 100}
+        for i in range(pool_size)
+    ]
+    per_rule = draw // topics
+    rules = [
+        {'bank_id': None, 'topic': f'topic-{t}', 'difficulty': None,
+         'count': per_rule + (1 if t < draw % topics else 0),
+         'pool': [i for i in range(pool_size) if i % topics == t]}
+        for t in range(topics)
+    ]
+    now = datetime.now()
+    return {
+        '_id': ObjectId(), 'course_id': ObjectId(), 'instructor_id': ObjectId(),
+        'title': 'Variant Benchmark', 'description': '', 'questions': [],
+        'question_pool': pool, 'sampling_rules': rules, 'questions_per_variant': draw,
+        'variant_seed': random.getrandbits(63), 'shuffle_questions': True,
+        'total_marks': draw * 2, 'passing_marks': draw * 1.4, 'passing_score_percent': 70,
+        'duration_minutes': 60, 'status': 'active', 'is_published': True,
+        'version': 1, 'created_at': now, 'updated_at': now
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-student exam variants')
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--pool', type=int, default=2000)
+    parser.add_argument('--draw', type=int, default=40)
+    parser.add_argument('--topics', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    exam = build_exam(args.pool, args.draw, args.topics)
+    student_ids = [str(ObjectId()) for _ in range(args.students)]
+    rng = random.Random(42)
+
+    t0 = time.perf_counter()
+    snapshot = build_snapshot(exam)
+    variants = snapshot.variants
+    print(f"snapshot build:      {(time.perf_counter() - t0) * 1000:.1f} ms ({args.pool} pool questions)")
+
+    t0 = time.perf_counter()
+    body_bytes = 0
+    for student_id in student_ids:
+        body_bytes += len(variants.student_json(student_id))
+    elapsed = time.perf_counter() - t0
+    print(f"student papers:      {args.students / elapsed:.0f}/s "
+          f"({elapsed / args.students * 1e6:.1f} us each, avg {body_bytes // args.students} bytes)")
+
+    # GradingService only needs collection handles; the client never connects here
+    grading_service = GradingService(MongoClient(connect=False)['bench_exam_variants'])
+
+    answer_maps = []
+    t0 = time.perf_counter()
+    for student_id in student_ids:
+        paper = variants.grading_exam(student_id)
+        answers = {str(i): (q['correct_answer'] if rng.random() < 0.7 else rng.randrange(4))
+                   for i, q in enumerate(paper['questions'])}
+        answer_maps.append(answers)
+        grading_service.grade_submission(paper, answers)
+    elapsed = time.perf_counter() - t0
+    print(f"rebuild + grade:     {args.students / elapsed:.0f}/s ({elapsed / args.students * 1e6:.1f} us each)")
+
+    key = AnswerKey(dict(variants.base, question_pool=variants.pool))
+    rules = variants.rules
+    passed = 0
+    t0 = time.perf_counter()
+    for start in range(0, args.students, args.batch_size):
+        ids = student_ids[start:start + args.batch_size]
+        matrix = np.array([variant_question_indices(variants.seed, s, rules) for s in ids], dtype=np.int64)
+        _, _, _, batch_passed = grading_service.grade_batch(key, answer_maps[start:start + args.batch_size], matrix)
+        passed += int(batch_passed.sum())
+    elapsed = time.perf_counter() - t0
+    print(f"batch regrade:       {args.students / elapsed:.0f}/s (batch size {args.batch_size})")
+    print(f"passed:              {passed}/{args.students}")
+
+    distinct = len({tuple(sorted(variants.indices_for(s))) for s in student_ids[:1000]})
+    print(f"distinct papers:     {distinct}/1000 sampled students")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Material retrieval benchmark
+Indexes synthetic course materials of increasing size and reports build
+time, memory-mapped load time and per-question retrieval latency. Each
+run plants distinctive facts in random materials and checks that asking
+about them retrieves the chunk that contains them.
+Usage:
+    python tools/bench_material_retrieval.py [--sizes 1000,10000,50000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_recommender import percentile
+from app.services.material_index import CHUNK_OVERLAP, CHUNK_WORDS, MaterialIndex
+
+
+def synthetic_materials(chunks, facts, rng):
+    """
+    Documents totalling about `chunks` chunks, with one distinctive fact
+    planted in each of `facts` documents
+    Returns:
+        (documents, [(question, fact id)])
+    """
+    words = [f"term{i}" for i in range(20000)]
+    weights = [1 / (i + 1) for i in range(len(words))]  # Zipf-like
+    words_per_document = 2000
+    count = max(1, chunks * (CHUNK_WORDS - CHUNK_OVERLAP) // words_per_document)
+    planted = set(rng.sample(range(count), min(facts, count)))
+    documents, questions = [], []
+    for number in range(count):
+        text = rng.choices(words, weights, k=words_per_document)
+        if number in planted:
+            fact_id = f"fact{number}"
+            position = rng.randrange(len(text))
+            text[position:position] = f"the {fact_id} protocol uses quorum{number} rebalancing".split()
+            # Common words in the question exercise long postings lists
+            common = ' '.join(rng.choices(words[:200], k=3))
+            questions.append((f"How does the {fact_id} protocol do rebalancing for {common}?", fact_id))
+        documents.append((f"material{number}", f"Lecture {number}", ' '.join(text)))
+    return documents, questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark course material retrieval')
+    parser.add_argument('--sizes', default='1000,10000,50000', help='Approximate chunks per course')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    ok = True
+    print(f"{'chunks':>8}{'build s':>9}{'MB':>7}{'load ms':>9}{'p50 ms':>8}{'p95 ms':>8}{'recall':>8}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        documents, questions = synthetic_materials(size, 50, rng)
+
+        start = time.perf_counter()
+        index = MaterialIndex.build(documents)
+        build_time = time.perf_counter() - start
+
+        root = tempfile.mkdtemp(prefix='material-bench-')
+        try:
+            index.save(root)
+            nbytes = sum(os.path.getsize(os.path.join(dirpath, name))
+                         for dirpath, _, names in os.walk(root) for name in names)
+            start = time.perf_counter()
+            mapped = MaterialIndex.load(root)
+            load_time = time.perf_counter() - start
+
+            mapped.search(questions[0][0])  # fault the pages in
+            timings, hits = [], 0
+            for i in range(args.queries):
+                question, fact_id = questions[i % len(questions)]
+                start = time.perf_counter()
+                results = mapped.search(question, top_k=args.top_k)
+                timings.append(time.perf_counter() - start)
+                hits += any(fact_id in chunk['text'] for chunk in results)
+            recall = hits / args.queries
+            ok = ok and recall >= 0.95
+            print(f"{len(mapped.chunks):>8}{build_time:>9.1f}{nbytes / 1024 / 1024:>7.1f}{load_time * 1000:>9.1f}"
+                  f"{percentile(timings, 0.5):>8.2f}{percentile(timings, 0.95):>8.2f}{recall:>8.0%}")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print("✅ Planted facts are retrieved" if ok else "❌ Retrieval missed planted facts")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Course recommender benchmark
+Builds the TF-IDF model for a synthetic catalog (default 100k courses) and
+compares per-request latency with the previous Python scoring loop
+(RecommendationService.get_enrollment_based_recommendations over the
+whole catalog). Also times saving, memory-mapped loading, incremental
+updates and compaction.
+Usage:
+    python tools/bench_recommender.py [--courses 100000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.course_recommender import CourseVectorModel
+from app.services.recommendation_service import RecommendationService
+
+LEVELS = ['Beginner', 'Intermediate', 'Advanced']
+
+
+def synthetic_catalog(count, seed=42):
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(5000)]
+    weights = [1 / (i + 1) for i in range(len(words))]  # Zipf-like
+    tags = [f"topic{i}" for i in range(300)]
+    categories = [f"category{i}" for i in range(30)]
+    now = datetime.utcnow()
+    for _ in range(count):
+        yield {
+            '_id': ObjectId(),
+            'title': ' '.join(rng.choices(words, weights, k=6)),
+            'description': ' '.join(rng.choices(words, weights, k=40)),
+            'tags': rng.sample(tags, rng.randint(3, 8)),
+            'category': rng.choice(categories),
+            'level': rng.choice(LEVELS),
+            'rating': round(rng.uniform(0, 5), 1),
+            'status': 'approved',
+            'is_published': True,
+            'updated_at': now
+        }
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the course recommender')
+    parser.add_argument('--courses', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--legacy-queries', type=int, default=5)
+    parser.add_argument('--changes', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    courses = list(synthetic_catalog(args.courses))
+    students = [rng.sample(courses, 5) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    model = CourseVectorModel.build(courses)
+    build_time = time.perf_counter() - start
+    nbytes = model.indptr.nbytes + model.indices.nbytes + model.data.nbytes + model.prior.nbytes
+    print(f"Build: {args.courses} courses in {build_time:.1f}s, {len(model.data)} nonzeros, "
+          f"{nbytes / 1024 / 1024:.1f} MB of arrays")
+
+    model_dir = tempfile.mkdtemp(prefix='recommender-bench-')
+    try:
+        start = time.perf_counter()
+        model.save(model_dir)
+        save_time = time.perf_counter() - start
+        start = time.perf_counter()
+        mapped = CourseVectorModel.load(model_dir)
+        load_time = time.perf_counter() - start
+        print(f"Save {save_time * 1000:.0f}ms, memory-mapped load {load_time * 1000:.0f}ms")
+
+        mapped.recommend([str(c['_id']) for c in students[0]])  # fault the pages in
+        timings = []
+        for enrolled in students:
+            start = time.perf_counter()
+            mapped.recommend([str(c['_id']) for c in enrolled], count=5)
+            timings.append(time.perf_counter() - start)
+        print(f"Vector model: p50 {percentile(timings, 0.5):.1f}ms, p95 {percentile(timings, 0.95):.1f}ms per request")
+
+        legacy = RecommendationService()
+        legacy_timings = []
+        for enrolled in students[:args.legacy_queries]:
+            start = time.perf_counter()
+            legacy.get_enrollment_based_recommendations(enrolled, courses, count=5)
+            legacy_timings.append(time.perf_counter() - start)
+        legacy_median = statistics.median(legacy_timings)
+        print(f"Python loop:  p50 {legacy_median * 1000:.1f}ms per request "
+              f"({legacy_median / statistics.median(timings):.0f}x slower)")
+
+        # Incremental: re-tag some courses, unpublish others
+        start = time.perf_counter()
+        for course in rng.sample(courses, args.changes):
+            if rng.random() < 0.1:
+                course['is_published'] = False
+            else:
+                course['tags'] = course['tags'] + ['trending']
+            mapped.apply(course)
+        apply_time = time.perf_counter() - start
+        timings = []
+        for enrolled in students:
+            start = time.perf_counter()
+            mapped.recommend([str(c['_id']) for c in enrolled], count=5)
+            timings.append(time.perf_counter() - start)
+        print(f"Applied {args.changes} changes in {apply_time * 1000:.0f}ms; with overlay "
+              f"p50 {percentile(timings, 0.5):.1f}ms, p95 {percentile(timings, 0.95):.1f}ms")
+
+        start = time.perf_counter()
+        compacted = mapped.compact()
+        print(f"Compaction: {time.perf_counter() - start:.2f}s ({compacted.stats()['courses']} courses)")
+
+        sample = [str(c['_id']) for c in students[0]]
+        same = mapped.recommend(sample) == compacted.recommend(sample)
+        print("✅ Compacted model gives the same recommendations" if same else
+              "❌ Compacted model disagrees with the overlay")
+    finally:
+        shutil.rmtree(model_dir, ignore_errors=True)
+    sys.exit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Skill matcher benchmark
+Indexes a synthetic catalog (default 100k courses) and compares
+per-request latency of the skill index with the previous substring scan
+over every course's text. Also checks the index against a brute-force
+phrase scan and times applying catalog changes.
+Usage:
+    python tools/bench_skill_matcher.py [--courses 100000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_recommender import percentile, synthetic_catalog
+from app.services.skill_matcher import SkillIndex, _course_postings, tokenize
+
+
+def legacy_match(target_skills, available_courses):
+    """The substring scan match_courses_to_skills used before the index"""
+    matched = []
+    for course in available_courses:
+        score = 0
+        course_text = f"{course.get('title', '')} {course.get('description', '')} {' '.join(course.get('tags', []))}".lower()
+        for skill in target_skills:
+            if skill.lower() in course_text:
+                score += 1
+        if score > 0:
+            matched.append({"course": course, "relevance_score": score})
+    matched.sort(key=lambda x: x['relevance_score'], reverse=True)
+    return matched[:10]
+
+
+def brute_force_counts(skills, courses):
+    """{course_id: skills matched} by scanning each course's token positions"""
+    counts = {}
+    for course in courses:
+        positions = {}
+        for token, position, _ in _course_postings(course):
+            positions[position] = token
+        matched = 0
+        for skill in skills:
+            tokens = tokenize(skill)
+            if any(all(positions.get(start + i) == token for i, token in enumerate(tokens))
+                   for start, token in positions.items() if token == tokens[0]):
+                matched += 1
+        if matched:
+            counts[str(course['_id'])] = matched
+    return counts
+
+
+def random_skills(rng, count):
+    """Mix of single words, tags and two-word phrases drawn from the synthetic vocabulary"""
+    skills = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            skills.append(f"word{rng.randint(0, 2000)}")
+        elif kind < 0.7:
+            skills.append(f"topic{rng.randint(0, 299)}")
+        else:
+            skills.append(f"word{rng.randint(0, 50)} word{rng.randint(0, 50)}")
+    return skills
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the skill matcher')
+    parser.add_argument('--courses', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--legacy-queries', type=int, default=5)
+    parser.add_argument('--changes', type=int, default=1000)
+    parser.add_argument('--verify-courses', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    courses = list(synthetic_catalog(args.courses))
+    queries = [random_skills(rng, rng.randint(1, 5)) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    index = SkillIndex.build(courses)
+    stats = index.stats()
+    print(f"Build: {args.courses} courses in {time.perf_counter() - start:.1f}s, {stats['postings']} postings, "
+          f"{stats['bytes'] / 1024 / 1024:.1f} MB of arrays")
+
+    timings = []
+    for skills in queries:
+        start = time.perf_counter()
+        index.match(skills)
+        timings.append(time.perf_counter() - start)
+    print(f"Skill index:   p50 {percentile(timings, 0.5):.2f}ms, p95 {percentile(timings, 0.95):.2f}ms per request")
+
+    legacy_timings = []
+    for skills in queries[:args.legacy_queries]:
+        start = time.perf_counter()
+        legacy_match(skills, courses)
+        legacy_timings.append(time.perf_counter() - start)
+    legacy_median = statistics.median(legacy_timings)
+    print(f"Substring scan: p50 {legacy_median * 1000:.1f}ms per request "
+          f"({legacy_median / statistics.median(timings):.0f}x slower)")
+
+    # Correctness against a brute-force phrase scan on a smaller catalog
+    sample = courses[:args.verify_courses]
+    small = SkillIndex.build(sample)
+    ok = True
+    for skills in queries[:50]:
+        expected = brute_force_counts(skills, sample)
+        got = {course_id: matched for course_id, matched, _ in small.match(skills, count=len(sample))}
+        if got != expected:
+            ok = False
+            print(f"❌ Mismatch for {skills}: {len(got)} vs {len(expected)} courses")
+            break
+
+    # Incremental: re-title some courses, unpublish others
+    start = time.perf_counter()
+    changed = []
+    for course in rng.sample(courses, args.changes):
+        course = dict(course)
+        if rng.random() < 0.1:
+            course['is_published'] = False
+        else:
+            course['title'] = 'machine learning ' + course['title']
+        changed.append(course)
+    index.apply(changed)
+    apply_time = time.perf_counter() - start
+    timings = []
+    for skills in queries:
+        start = time.perf_counter()
+        index.match(skills + ['machine learning'])
+        timings.append(time.perf_counter() - start)
+    print(f"Applied {args.changes} changes in {apply_time * 1000:.0f}ms; with overlay "
+          f"p50 {percentile(timings, 0.5):.2f}ms, p95 {percentile(timings, 0.95):.2f}ms")
+
+    retitled = {str(c['_id']) for c in changed if c['is_published']}
+    top = index.match(['machine learning'], count=args.changes)
+    if {course_id for course_id, _, _ in top} != retitled:
+        ok = False
+        print("❌ Overlay matches disagree with the applied changes")
+
+    print("✅ Index matches agree with a brute-force phrase scan" if ok else "❌ Index matches are wrong")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Course neighbors builder
+Builds "students who took this also took" neighbor lists from enrollment
+co-occurrence into the course_neighbors collection. Run a full build
+nightly and --incremental every few minutes to pick up new enrollments.
+Usage:
+    python tools/build_course_neighbors.py [--top-k 20] [--min-support 2]
+    python tools/build_course_neighbors.py --incremental
+"""
+import argparse
+import os
+import sys
+import time
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.course_neighbors import CourseNeighborService, MIN_SUPPORT, TOP_K
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build course neighbor lists from enrollments')
+    parser.add_argument('--incremental', action='store_true', help='Only courses with new enrollments')
+    parser.add_argument('--top-k', type=int, default=TOP_K)
+    parser.add_argument('--min-support', type=int, default=MIN_SUPPORT)
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    db = client[os.getenv('DATABASE_NAME', 'online_course_platform')]
+    service = CourseNeighborService(db)
+
+    start = time.perf_counter()
+    if args.incremental:
+        success, result = service.refresh(args.top_k, args.min_support)
+    else:
+        success, result = service.build(
+            args.top_k, args.min_support,
+            progress=lambda students, pairs: print(f"  {students} students, {pairs} course pairs")
+        )
+
+    if success:
+        print(f"✅ {result} in {time.perf_counter() - start:.1f}s")
+    else:
+        print(f"❌ {result}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
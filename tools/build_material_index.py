@@ -0,0 +1,58 @@
+"""
+Course material index builder
+Chunks and vectorizes course materials (text content and uploaded
+documents) into per-course indexes under MATERIAL_INDEX_DIR (default
+data/material_index) for the AI chat assistant. Courses whose materials
+have not changed since their last build are skipped unless --force.
+Usage:
+    python tools/build_material_index.py [--force]
+    python tools/build_material_index.py --course <course_id>
+"""
+import argparse
+import os
+import sys
+import time
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.material_index import INDEX_DIR, build_course_index
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index course materials for chat retrieval')
+    parser.add_argument('--course', help='Only this course')
+    parser.add_argument('--force', action='store_true', help='Rebuild unchanged courses too')
+    parser.add_argument('--index-dir', default=INDEX_DIR)
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    db = client[os.getenv('DATABASE_NAME', 'online_course_platform')]
+
+    course_ids = [args.course] if args.course else [str(c['_id']) for c in db.courses.find({}, {'_id': 1})]
+    start = time.perf_counter()
+    built = skipped = failed = chunks = 0
+    for course_id in course_ids:
+        try:
+            index = build_course_index(db, course_id, args.index_dir, force=args.force)
+        except Exception as e:
+            print(f"❌ {course_id}: {e}")
+            failed += 1
+            continue
+        if index is None:
+            skipped += 1
+        else:
+            built += 1
+            chunks += index.stats()['chunks']
+
+    print(f"{'✅' if not failed else '❌'} Indexed {built} courses ({chunks} chunks), {skipped} unchanged, "
+          f"{failed} failed in {time.perf_counter() - start:.1f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Course recommender builder
+Builds the TF-IDF course vector model from the published catalog and
+saves it under RECOMMENDER_MODEL_DIR (default data/recommender), where
+the app memory-maps it. Run a full build nightly; --incremental folds in
+courses changed since the last build without re-vectorizing the rest.
+Usage:
+    python tools/build_recommender.py
+    python tools/build_recommender.py --incremental
+    python tools/build_recommender.py --stats
+"""
+import argparse
+import os
+import sys
+import time
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.course_recommender import (
+    MODEL_DIR, CourseVectorModel, apply_catalog_changes, iter_published_courses
+)
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the course recommender model')
+    parser.add_argument('--incremental', action='store_true', help='Apply catalog changes to the current model')
+    parser.add_argument('--stats', action='store_true', help='Show the current model and exit')
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    args = parser.parse_args()
+
+    if args.stats:
+        model = CourseVectorModel.load(args.model_dir)
+        print(model.stats() if model else "❌ No model built yet")
+        return
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    db = client[os.getenv('DATABASE_NAME', 'online_course_platform')]
+
+    start = time.perf_counter()
+    model = CourseVectorModel.load(args.model_dir, mmap=False) if args.incremental else None
+    if model is not None:
+        changed = apply_catalog_changes(db, model)
+        if not changed:
+            print(f"✅ Model {model.version} is up to date")
+            return
+        model = model.compact()
+        print(f"Applied {changed} changed courses")
+    else:
+        if args.incremental:
+            print("No saved model, running a full build")
+        model = CourseVectorModel.build(iter_published_courses(db))
+
+    version = model.save(args.model_dir)
+    stats = model.stats()
+    print(f"✅ Saved model {version}: {stats['courses']} courses, {stats['nonzeros']} nonzeros "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
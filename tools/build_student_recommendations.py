@@ -0,0 +1,49 @@
+"""
+Student recommendations builder
+Precomputes the ranked recommendation list of every active student into
+the student_recommendations collection using a process pool. Run it
+nightly after tools/build_recommender.py and tools/build_course_neighbors.py.
+Usage:
+    python tools/build_student_recommendations.py [--processes 8] [--batch-size 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.student_recommendations import BATCH_SIZE, StudentRecommendationService
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute recommendation lists for all active students')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (0 = run in this process)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Students per worker task')
+    args = parser.parse_args()
+
+    mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+    db = MongoClient(mongo_uri)[os.getenv('DATABASE_NAME', 'online_course_platform')]
+    service = StudentRecommendationService(db)
+
+    start = time.perf_counter()
+    success, result = service.build(
+        args.processes, args.batch_size, mongo_uri,
+        progress=lambda students, written: print(f"  {students} students, {written} lists written")
+    )
+
+    if success:
+        print(f"✅ {result} in {time.perf_counter() - start:.1f}s")
+    else:
+        print(f"❌ {result}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Bulk cohort enrollment
+Usage:
+    python tools/bulk_enroll.py <course_id> cohort.csv
+    python tools/bulk_enroll.py <course_id> cohort.json
+    cat cohort.csv | python tools/bulk_enroll.py <course_id> -
+Prints one JSON line per row followed by a summary line.
+"""
+import argparse
+import json
+import os
+import sys
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.enrollment_service import EnrollmentService, BULK_ENROLL_BATCH_SIZE
+from app.utils.upload_parser import iter_csv_emails, iter_json_emails, iter_ndjson
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Enroll a cohort of students by email')
+    parser.add_argument('course_id')
+    parser.add_argument('source', help='CSV or JSON file of emails, or - for CSV on stdin')
+    parser.add_argument('--batch-size', type=int, default=BULK_ENROLL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    db = client[os.getenv('DATABASE_NAME', 'online_course_platform')]
+    enrollment_service = EnrollmentService(db)
+
+    if args.source == '-':
+        emails = iter_csv_emails(sys.stdin)
+        handle = None
+    else:
+        handle = open(args.source, encoding='utf-8-sig', newline='')
+        if args.source.lower().endswith('.json'):
+            emails = iter_json_emails(json.load(handle))
+        else:
+            emails = iter_csv_emails(handle)
+
+    try:
+        rows = enrollment_service.bulk_enroll(args.course_id, emails, args.batch_size)
+        for line in iter_ndjson(rows):
+            sys.stdout.write(line)
+    finally:
+        if handle:
+            handle.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Certificate worker
+Renders queued certificate PDFs in a process pool (the emails are sent by
+tools/email_dispatcher.py). Run one or more of these next to the web servers.
+Usage:
+    python tools/certificate_worker.py [--processes 4] [--batch-size 16] [--once]
+    python tools/certificate_worker.py --requeue-failed
+"""
+import argparse
+import os
+import sys
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.certificate_queue import CertificateWorker, CertificateJobQueue
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render queued certificate PDFs')
+    parser.add_argument('--processes', type=int, default=None, help='Render processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=None, help='Jobs claimed per batch')
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+    parser.add_argument('--requeue-failed', action='store_true', help='Re-queue failed jobs and exit')
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    db = client[os.getenv('DATABASE_NAME', 'online_course_platform')]
+
+    if args.requeue_failed:
+        queue = CertificateJobQueue(db)
+        failed = [job['certificate_id'] for job in queue.job_collection.find({'status': 'failed'}, {'certificate_id': 1})]
+        queue.enqueue(failed)
+        print(f"✅ Re-queued {len(failed)} failed certificate jobs")
+        return
+
+    worker = CertificateWorker(db, args.processes, args.batch_size, args.poll_interval)
+    if args.once:
+        total = 0
+        try:
+            while True:
+                processed = worker.run_once()
+                if not processed:
+                    break
+                total += processed
+        finally:
+            worker.shutdown()
+        print(f"✅ Processed {total} certificate jobs")
+        return
+
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        worker.stop()
+        worker.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Email delivery check
+Runs the outbox dispatcher against a local aiosmtpd server and a throwaway
+database: plain messages must arrive once, "+retry" recipients get a 451
+on the first attempt and must arrive on the retry, "+reject" recipients get
+a 550 and must end up failed without a retry.
+Requires: pip install aiosmtpd
+Usage:
+    python tools/check_email_delivery.py [--messages 200] [--connections 4]
+"""
+import argparse
+import os
+import sys
+import time
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import email_outbox
+from app.services.email_outbox import EmailDispatcher, EmailOutbox
+
+load_dotenv()
+
+TEST_DB = 'email_delivery_check'
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.received = []
+        self.deferred = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if '+reject' in address:
+            return '550 5.1.1 No such user'
+        if '+retry' in address and address not in self.deferred:
+            self.deferred.add(address)
+            return '451 4.3.0 Try again later'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.extend(envelope.rcpt_tos)
+        return '250 Message accepted for delivery'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check outbox delivery against a local SMTP server')
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        print("❌ aiosmtpd is not installed (pip install aiosmtpd)")
+        sys.exit(1)
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    client.drop_database(TEST_DB)
+    db = client[TEST_DB]
+
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=args.port)
+    controller.start()
+    email_outbox.RETRY_BASE_SECONDS = 0  # retry immediately
+
+    try:
+        outbox = EmailOutbox(db)
+        recipients = [
+            f"student{i}+retry@example.com" if i % 10 == 1 else
+            f"student{i}+reject@example.com" if i % 10 == 2 else
+            f"student{i}@example.com"
+            for i in range(args.messages)
+        ]
+        outbox.enqueue_many([
+            EmailOutbox.build(to, 'Delivery check', f"Message {i}", dedupe_key=f"check:{i}")
+            for i, to in enumerate(recipients)
+        ])
+        # Queuing the same events again must not duplicate them
+        outbox.enqueue_many([
+            EmailOutbox.build(to, 'Delivery check', f"Message {i}", dedupe_key=f"check:{i}")
+            for i, to in enumerate(recipients)
+        ])
+
+        dispatcher = EmailDispatcher(
+            db, host='127.0.0.1', port=args.port, username='', connections=args.connections, rate_per_second=0
+        )
+        start = time.perf_counter()
+        while dispatcher.run_once():
+            pass
+        elapsed = time.perf_counter() - start
+        dispatcher.shutdown()
+
+        expected = [to for to in recipients if '+reject' not in to]
+        statuses = {row['_id']: row['count'] for row in db['email_outbox'].aggregate([
+            {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+        ])}
+        print(f"Dispatched {args.messages} messages in {elapsed:.2f}s over "
+              f"{dispatcher.pool.connections_opened} SMTP connections: {statuses}")
+
+        ok = True
+        if sorted(handler.received) != sorted(expected):
+            print(f"❌ Received {len(handler.received)} messages, expected {len(expected)} (each exactly once)")
+            ok = False
+        else:
+            print(f"✅ All {len(expected)} deliverable messages arrived exactly once")
+        if statuses.get('failed', 0) != sum('+reject' in to for to in recipients):
+            print("❌ Rejected recipients were not marked failed")
+            ok = False
+        else:
+            print("✅ Rejected recipients marked failed")
+    finally:
+        controller.stop()
+        client.drop_database(TEST_DB)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
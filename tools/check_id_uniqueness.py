@@ -0,0 +1,96 @@
+"""
+ID uniqueness check
+Allocates certificate numbers and transaction IDs from several processes
+and threads at once against a throwaway database and verifies that no ID
+is handed out twice.
+Usage:
+    python tools/check_id_uniqueness.py [--processes 4] [--threads 8] [--per-thread 2000]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.id_service import IdService
+
+load_dotenv()
+
+TEST_DB = 'id_uniqueness_check'
+
+
+def allocate(threads, per_thread, block_size):
+    """Runs in a child process: allocate from `threads` threads sharing one IdService"""
+    db = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))[TEST_DB]
+    id_service = IdService(db)
+    numbers, transactions = [], []
+    lock = threading.Lock()
+
+    def work():
+        local_numbers = [id_service.next_sequence('check', block_size) for _ in range(per_thread)]
+        local_transactions = [id_service.transaction_id() for _ in range(per_thread)]
+        with lock:
+            numbers.extend(local_numbers)
+            transactions.extend(local_transactions)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return numbers, transactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check ID uniqueness under concurrent allocation')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--per-thread', type=int, default=2000)
+    parser.add_argument('--block-size', type=int, default=100)
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    client.drop_database(TEST_DB)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        futures = [
+            pool.submit(allocate, args.threads, args.per_thread, args.block_size)
+            for _ in range(args.processes)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    numbers = [n for result in results for n in result[0]]
+    transactions = [t for result in results for t in result[1]]
+    expected = args.processes * args.threads * args.per_thread
+    counter = client[TEST_DB]['counters'].find_one({'_id': 'check'})
+    round_trips = counter['seq'] // args.block_size if counter else 0
+
+    print(f"Allocated {len(numbers)} sequence numbers and {len(transactions)} transaction IDs in {elapsed:.2f}s")
+    print(f"  counter round trips: {round_trips} ({round_trips / max(len(numbers), 1):.2%} of allocations)")
+
+    ok = True
+    if len(numbers) != expected or len(set(numbers)) != len(numbers):
+        print(f"❌ Sequence numbers: {len(numbers) - len(set(numbers))} duplicates")
+        ok = False
+    else:
+        print("✅ Sequence numbers unique")
+    if len(set(transactions)) != len(transactions):
+        print(f"❌ Transaction IDs: {len(transactions) - len(set(transactions))} duplicates")
+        ok = False
+    else:
+        print("✅ Transaction IDs unique")
+
+    client.drop_database(TEST_DB)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
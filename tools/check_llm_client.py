@@ -0,0 +1,242 @@
+"""
+LLM client check
+Runs the shared LLM client against a local fake OpenAI-compatible server:
+- sequential calls must reuse pooled keep-alive connections
+- injected 429/503 responses must be retried transparently
+- in-flight requests must never exceed the concurrency limit
+- a failing upstream must trip the circuit breaker, which must stop
+  sending requests and recover after the reset timeout
+Usage:
+    python tools/check_llm_client.py [--calls 200] [--threads 32] [--concurrency 4]
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.llm_client import CircuitBreaker, LLMClient, LLMError, LLMUnavailableError
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """
+    OpenAI-compatible /chat/completions with injectable failures and latency
+    Streaming requests get `stream_tokens` deltas, one every `token_delay` seconds.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.02, stream_tokens=50, token_delay=0.02):
+        super().__init__(('127.0.0.1', port), FakeLLMHandler)
+        self.latency = latency
+        self.stream_tokens = stream_tokens
+        self.token_delay = token_delay
+        self.streams_completed = 0
+        self.streams_cancelled = 0
+        self.fail_every = 0      # every Nth request gets 429/503
+        self.fail_all = False    # every request gets 500
+        self.requests = 0
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/chat/completions"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.connections = set()
+            self.max_in_flight = 0
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes; don't let Nagle hold the body
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, number, body, prompt):
+        server = self.server
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_event(data):
+            payload = f"data: {data}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(payload):x}\r\n".encode('ascii') + payload + b"\r\n")
+            self.wfile.flush()
+
+        tokens = [f"echo: {prompt}"] + [f" token{i}" for i in range(1, server.stream_tokens)]
+        try:
+            for i, token in enumerate(tokens):
+                write_event(json.dumps({
+                    'id': f"chatcmpl-{number}",
+                    'object': 'chat.completion.chunk',
+                    'model': body.get('model'),
+                    'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]
+                }))
+                time.sleep(server.token_delay)
+            write_event(json.dumps({
+                'id': f"chatcmpl-{number}",
+                'object': 'chat.completion.chunk',
+                'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+                'x_groq': {'usage': {'prompt_tokens': 10, 'completion_tokens': len(tokens),
+                                     'total_tokens': 10 + len(tokens)}}
+            }))
+            write_event('[DONE]')
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client hung up mid-generation
+            with server.lock:
+                server.streams_cancelled += 1
+            self.close_connection = True
+            return
+        with server.lock:
+            server.streams_completed += 1
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with server.lock:
+            server.requests += 1
+            number = server.requests
+            server.connections.add(self.client_address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.latency)
+            if server.fail_all:
+                return self._send_json(500, {'error': {'message': 'upstream down'}})
+            if server.fail_every and number % server.fail_every == 0:
+                if number % (2 * server.fail_every) == 0:
+                    return self._send_json(429, {'error': {'message': 'rate limited'}}, {'Retry-After': '0'})
+                return self._send_json(503, {'error': {'message': 'overloaded'}})
+            prompt = body['messages'][-1]['content']
+            if body.get('stream'):
+                return self._send_stream(number, body, prompt)
+            self._send_json(200, {
+                'id': f"chatcmpl-{number}",
+                'object': 'chat.completion',
+                'model': body.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': f"echo: {prompt}"},
+                             'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15}
+            })
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+def ask(client, i):
+    return client.chat([{'role': 'user', 'content': f"question {i}"}], model='fake-model')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the pooled LLM client against a fake server')
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.02, help='Fake server latency (seconds)')
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=args.latency).start()
+    ok = True
+
+    def check(condition, passed, failed):
+        nonlocal ok
+        print(f"✅ {passed}" if condition else f"❌ {failed}")
+        ok = ok and condition
+
+    # 1. Keep-alive: sequential calls share one pooled connection
+    client = LLMClient(api_key='test', base_url=server.url, max_concurrency=args.concurrency,
+                       max_connections=args.concurrency, backoff_base=0.01)
+    start = time.perf_counter()
+    for i in range(args.calls):
+        ask(client, i)
+    elapsed = time.perf_counter() - start
+    check(len(server.connections) == 1,
+          f"{args.calls} sequential calls over 1 connection ({elapsed / args.calls * 1000:.1f}ms/call)",
+          f"{args.calls} sequential calls opened {len(server.connections)} connections")
+
+    # 2. Retries and bounded concurrency under load with injected 429/503s
+    server.reset()
+    server.fail_every = 7
+    with ThreadPoolExecutor(args.threads) as pool:
+        results = list(pool.map(lambda i: ask(client, i), range(args.calls)))
+    server.fail_every = 0
+    stats = client.stats()
+    check(all(r.content == f"echo: question {i}" for i, r in enumerate(results)),
+          f"All {args.calls} concurrent calls succeeded ({stats['retries']} retries on 429/503)",
+          "Some concurrent calls returned wrong content")
+    check(server.max_in_flight <= args.concurrency,
+          f"At most {server.max_in_flight} requests in flight (limit {args.concurrency})",
+          f"{server.max_in_flight} requests in flight, limit was {args.concurrency}")
+    check(len(server.connections) <= args.concurrency,
+          f"{len(server.connections)} pooled connections for {args.threads} threads",
+          f"{len(server.connections)} connections opened for a pool of {args.concurrency}")
+    check(stats['total_tokens'] == 15 * 2 * args.calls,
+          f"Token usage recorded ({stats['total_tokens']} tokens, p50 {stats['latency_ms']['p50']}ms, "
+          f"p95 {stats['latency_ms']['p95']}ms)",
+          f"Token usage recorded as {stats['total_tokens']}")
+
+    # 3. Circuit breaker: stop calling a failing upstream, then recover
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0.5)
+    client = LLMClient(api_key='test', base_url=server.url, max_retries=1, backoff_base=0.01, breaker=breaker)
+    server.reset()
+    server.fail_all = True
+    failures = rejected = 0
+    for i in range(50):
+        try:
+            ask(client, i)
+        except LLMUnavailableError:
+            rejected += 1
+        except LLMError:
+            failures += 1
+    check(breaker.state == 'open' and server.requests <= breaker.failure_threshold,
+          f"Circuit opened after {server.requests} upstream failures; {rejected} calls rejected without a request",
+          f"Upstream received {server.requests} requests while failing (state {breaker.state})")
+
+    server.fail_all = False
+    time.sleep(breaker.reset_timeout)
+    try:
+        ask(client, 0)
+        recovered = breaker.state == 'closed'
+    except LLMError:
+        recovered = False
+    check(recovered, "Circuit closed again after a successful probe", f"Circuit did not recover ({breaker.state})")
+
+    server.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Email dispatcher
+Delivers queued `email_outbox` messages over pooled SMTP connections.
+SMTP settings come from the environment (SMTP_HOST, SMTP_PORT,
+SMTP_USERNAME, SMTP_PASSWORD, SMTP_USE_TLS, MAIL_FROM); flags override them.
+Usage:
+    python tools/email_dispatcher.py [--connections 4] [--rate 10] [--once]
+    python tools/email_dispatcher.py --smtp-host localhost --smtp-port 8025 --once
+    python tools/email_dispatcher.py --requeue-failed
+"""
+import argparse
+import os
+import sys
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.email_outbox import EmailDispatcher, EmailOutbox
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deliver queued outbox emails')
+    parser.add_argument('--smtp-host')
+    parser.add_argument('--smtp-port', type=int)
+    parser.add_argument('--connections', type=int, default=None, help='Pooled SMTP connections / sender threads')
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--rate', type=float, default=None, help='Messages per second (0 = unlimited)')
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    parser.add_argument('--once', action='store_true', help='Send everything due now and exit')
+    parser.add_argument('--requeue-failed', action='store_true', help='Re-queue failed messages and exit')
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    db = client[os.getenv('DATABASE_NAME', 'online_course_platform')]
+
+    if args.requeue_failed:
+        print(f"✅ Re-queued {EmailOutbox(db).requeue_failed()} failed messages")
+        return
+
+    dispatcher = EmailDispatcher(
+        db, host=args.smtp_host, port=args.smtp_port, connections=args.connections,
+        batch_size=args.batch_size, rate_per_second=args.rate, poll_interval=args.poll_interval
+    )
+    if args.once:
+        try:
+            while dispatcher.run_once():
+                pass
+        finally:
+            dispatcher.shutdown()
+        print(f"✅ Sent {dispatcher.sent} messages, {dispatcher.failed} failed attempts "
+              f"({dispatcher.pool.connections_opened} SMTP connections opened)")
+        return
+
+    try:
+        dispatcher.run_forever()
+    except KeyboardInterrupt:
+        dispatcher.stop()
+        dispatcher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Bulk certificate issuance
+Issues certificates to every passed, uncertified submission of an exam or
+course, then (optionally) renders the PDFs across all CPU cores.
+Usage:
+    python tools/issue_certificates.py --exam-id <id> --admin-id <id> [--render]
+    python tools/issue_certificates.py --course-id <id> --admin-id <id>
+    python tools/issue_certificates.py --resume <run_id> [--render]
+    python tools/issue_certificates.py --status <run_id>
+"""
+import argparse
+import os
+import sys
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.certificate_service import CertificateService, BULK_BATCH_SIZE
+from app.services.certificate_queue import CertificateWorker
+
+load_dotenv()
+
+
+def print_progress(run):
+    print(f"  issued {run['issued']:>7}   skipped {run['skipped']:>5}   last submission {run['last_submission_id']}")
+
+
+def render_all(db, processes):
+    worker = CertificateWorker(db, processes)
+    total = 0
+    try:
+        while True:
+            processed = worker.run_once()
+            if not processed:
+                break
+            total += processed
+            print(f"  rendered {total:>7}")
+    finally:
+        worker.shutdown()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Issue certificates in bulk')
+    scope = parser.add_mutually_exclusive_group(required=True)
+    scope.add_argument('--exam-id')
+    scope.add_argument('--course-id')
+    scope.add_argument('--resume', metavar='RUN_ID', help='Continue an interrupted run')
+    scope.add_argument('--status', metavar='RUN_ID', help='Show progress of a run and exit')
+    parser.add_argument('--admin-id', help='Admin recorded as approver (required for new runs)')
+    parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument('--render', action='store_true', help='Render the queued PDFs before exiting')
+    parser.add_argument('--processes', type=int, default=None, help='Render processes (default: CPU count)')
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    db = client[os.getenv('DATABASE_NAME', 'online_course_platform')]
+    certificate_service = CertificateService(db)
+
+    if args.status:
+        success, result = certificate_service.get_bulk_issue_progress(args.status)
+        if not success:
+            print(f"❌ {result}")
+            sys.exit(1)
+        for key, value in result.items():
+            print(f"  {key}: {value}")
+        return
+
+    run_id = args.resume
+    if not run_id:
+        if not args.admin_id:
+            parser.error('--admin-id is required for a new run')
+        success, run_id = certificate_service.start_bulk_issue(args.admin_id, args.exam_id, args.course_id)
+        if not success:
+            print(f"❌ {run_id}")
+            sys.exit(1)
+    print(f"Bulk run {run_id}")
+
+    success, result = certificate_service.run_bulk_issue(run_id, args.batch_size, progress=print_progress)
+    if not success:
+        print(f"❌ {result}")
+        print(f"   Resume with: python tools/issue_certificates.py --resume {run_id}")
+        sys.exit(1)
+    print(f"✅ Issued {result['issued']} certificates ({result['skipped']} skipped, {result['remaining']} still uncertified)")
+
+    if args.render:
+        rendered = render_all(db, args.processes)
+        print(f"✅ Rendered {rendered} certificate PDFs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Exam autosave load test
+Simulates N examinees answering an exam at the same time: each student sends
+one autosave delta per question through PUT /api/student/exams/<id>/draft and
+then submits with use_draft. Reports autosave throughput and latency, how
+many Mongo writes the draft buffer needed, and checks every submission was
+graded from its draft. Runs against a throwaway database.
+Usage:
+    python tools/load_exam_autosave.py --students 3000 --questions 20 --workers 128
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.exam_draft_service import exam_draft_buffer
+from app.utils.jwt_helper import generate_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate concurrent exam autosave traffic')
+    parser.add_argument('--uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--students', type=int, default=3000)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=128)
+    args = parser.parse_args()
+
+    db_name = f"bench_exam_autosave_{int(time.time())}"
+    client = MongoClient(args.uri)
+    db = client[db_name]
+
+    try:
+        now = datetime.now()
+        exam_id = db.exams.insert_one({
+            'course_id': ObjectId(), 'instructor_id': ObjectId(),
+            'title': 'Autosave Load Test', 'description': '',
+            'questions': [
+                {'question': f'Question {i}?', 'options': ['A', 'B', 'C', 'D'],
+                 'correct_answer': i % 4, 'marks': 1}
+                for i in range(args.questions)
+            ],
+            'total_marks': args.questions, 'passing_marks': args.questions * 0.7,
+            'duration_minutes': 60, 'status': 'active', 'is_published': True,
+            'version': 1, 'created_at': now, 'updated_at': now
+        }).inserted_id
+
+        app = create_app('testing')
+        app.db = db
+        tokens = [
+            generate_token({'_id': ObjectId(), 'email': f'student{i}@example.com', 'role': 'student', 'name': f'S{i}'})
+            for i in range(args.students)
+        ]
+        url = f'/api/student/exams/{exam_id}'
+
+        def take_exam(i):
+            test_client = app.test_client()
+            headers = {'Authorization': f'Bearer {tokens[i]}'}
+            latencies = []
+            errors = 0
+            for q in range(args.questions):
+                t0 = time.perf_counter()
+                response = test_client.put(f'{url}/draft', headers=headers,
+                                           json={'answers': {str(q): q % 4}, 'seq': q + 1})
+                latencies.append(time.perf_counter() - t0)
+                errors += response.status_code != 200
+            response = test_client.post(f'{url}/submit', headers=headers, json={'use_draft': True})
+            marks = response.get_json().get('result', {}).get('marks_obtained')
+            return latencies, errors, marks
+
+        stats_before = exam_draft_buffer.stats()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(take_exam, range(args.students)))
+        elapsed = time.perf_counter() - started
+        exam_draft_buffer.flush()
+        stats = exam_draft_buffer.stats()
+
+        latencies = sorted(l for r in results for l in r[0])
+        errors = sum(r[1] for r in results)
+        full_marks = sum(1 for r in results if r[2] == args.questions)
+        pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+        writes = stats['documents_written'] - stats_before['documents_written']
+        flushes = stats['flushes'] - stats_before['flushes']
+
+        print(f"examinees:        {args.students} ({args.workers} workers, {args.questions} questions)")
+        print(f"autosaves:        {len(latencies)} ({errors} errors)")
+        print(f"throughput:       {len(latencies) / elapsed:.0f} autosaves/s")
+        print(f"latency p50:      {pct(0.50):.2f} ms")
+        print(f"latency p99:      {pct(0.99):.2f} ms")
+        print(f"draft writes:     {writes} documents in {flushes} bulk writes")
+        print(f"full marks:       {full_marks}/{args.students} (graded from drafts)")
+        print(f"drafts left:      {db.exam_drafts.count_documents({})}")
+    finally:
+        client.drop_database(db_name)
+
+
+if __name__ == '__main__':
+    main()
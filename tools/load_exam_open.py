@@ -0,0 +1,96 @@
+"""
+"Exam opens" load test
+Simulates N students starting the same exam at once through the Flask
+route /api/student/exams/<id> and reports latency percentiles, throughput
+and how many times the exam was actually loaded from Mongo.
+Runs against a throwaway database.
+Usage:
+    python tools/load_exam_open.py --students 5000 --workers 256
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.exam_snapshot_cache import exam_snapshot_cache
+from app.utils.jwt_helper import generate_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate concurrent exam starts')
+    parser.add_argument('--uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=256)
+    parser.add_argument('--questions', type=int, default=50)
+    args = parser.parse_args()
+
+    db_name = f"bench_exam_open_{int(time.time())}"
+    client = MongoClient(args.uri)
+    db = client[db_name]
+
+    try:
+        now = datetime.now()
+        exam_id = db.exams.insert_one({
+            'course_id': ObjectId(), 'instructor_id': ObjectId(),
+            'title': 'Load Test Exam', 'description': '',
+            'questions': [
+                {'question': f'Question {i}?', 'options': ['A', 'B', 'C', 'D'],
+                 'correct_answer': i % 4, 'marks': 2, 'explanation': 'x' * 200}
+                for i in range(args.questions)
+            ],
+            'total_marks': args.questions * 2, 'passing_marks': args.questions,
+            'duration_minutes': 60, 'status': 'active', 'is_published': True,
+            'version': 1, 'created_at': now, 'updated_at': now
+        }).inserted_id
+
+        app = create_app('testing')
+        app.db = db
+        token = generate_token({'_id': ObjectId(), 'email': 'load@example.com', 'role': 'student', 'name': 'Load'})
+        headers = {'Authorization': f'Bearer {token}'}
+        url = f'/api/student/exams/{exam_id}'
+
+        exam_snapshot_cache.invalidate(str(exam_id))
+        start_gate = threading.Barrier(min(args.workers, args.students))
+        local = threading.local()
+
+        def start_exam(i):
+            if not getattr(local, 'client', None):
+                local.client = app.test_client()
+                try:
+                    start_gate.wait(timeout=10)
+                except threading.BrokenBarrierError:
+                    pass
+            t0 = time.perf_counter()
+            response = local.client.get(url, headers=headers)
+            return time.perf_counter() - t0, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(start_exam, range(args.students)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(r[0] for r in results)
+        ok = sum(1 for r in results if r[1] == 200)
+        pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        print(f"exam starts:   {args.students} ({args.workers} workers, {args.questions} questions)")
+        print(f"200 responses: {ok}")
+        print(f"throughput:    {args.students / elapsed:.0f} req/s")
+        print(f"latency p50:   {pct(0.50):.2f} ms")
+        print(f"latency p99:   {pct(0.99):.2f} ms")
+        print(f"cache stats:   {exam_snapshot_cache.stats()}")
+    finally:
+        client.drop_database(db_name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Bulk regrade
+Regrades every submission of an exam against its current answer key.
+Usage:
+    python tools/regrade_exam.py <exam_id> [--batch-size 1000]
+"""
+import argparse
+import os
+import sys
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.grading_service import GradingService, REGRADE_BATCH_SIZE
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regrade all submissions of an exam')
+    parser.add_argument('exam_id')
+    parser.add_argument('--batch-size', type=int, default=REGRADE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    db = client[os.getenv('DATABASE_NAME', 'online_course_platform')]
+
+    success, result = GradingService(db).regrade_exam(args.exam_id, args.batch_size)
+    if not success:
+        print(f"❌ {result}")
+        sys.exit(1)
+
+    print(f"✅ Regraded {result['processed']} submissions "
+          f"({result['changed']} changed, {result['passed']} passed, {result['failed']} failed)")
+
+
+if __name__ == '__main__':
+    main()